@@ -4,28 +4,43 @@ sys.path.insert(0, '/home/jbonn/ot-ns/pylibs')
 
 import os
 os.environ["PATH"] += os.pathsep + "/home/imerir/go/bin"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Principal"))
 from otns.cli import OTNS  # ou from otns.OTNS selon votre version
+from Topology import TopologySpec, Row, FedLine, compile_topology, build, labelled, wait_for_nodes
+from Layout import check_layout
+from Class_ReplayCache import ReplayCache
+from Ping import ping_burst
+from LatencyMatrix import latency_profile
 import time
 import matplotlib.pyplot as plt
 from datetime import datetime
 
 
 RADIO_RANGE = 150
+SEED = 1                               # Graine OTNS : même graine => même état, rejouable depuis le cache
+CACHE_DIR = "replay_cache"             # Journaux de rejeu des réseaux déjà formés
 
 
-def scenario_incremental_ping():
-    ns = OTNS()                        # Démarre OTNS en arrière-plan
-
+def line_spec(num_routers=16, num_fed=20, spacing=150, base_y=400):
+    """
+    Ligne de routeurs, chacun avec num_fed FED au-dessus (décalés d'une
+    unité chacun) et un FED en dessous.
+    """
+    feds = (FedLine(num_fed, offset=(0, -spacing), step=(0, 1), name="top"),
+            FedLine(1, offset=(0, spacing), name="bottom"))
+    return TopologySpec(parts=(Row(y=base_y, num_routers=num_routers, delta_x=spacing,
+                                   start_x=spacing, first=feds, intermediate=feds, last=feds),),
+                        radio_range=RADIO_RANGE)
 
-    ns.web()                           # Lance la visualisation web (si disponible)
-    ns.go(1, speed=4)                  # Avance le temps de simulation pour assurer le démarrage
 
+def scenario_incremental_ping():
     num_routers = 16                 # Nombre total de routeurs à générer
     num_fed = 20
     spacing = 150                      # Espacement horizontal entre les routeurs et décalage vertical pour FEDs
     base_y = 400                       # Coordonnée Y pour les routeurs
     ping_delays = []                   # Liste pour stocker les délais de ping (en secondes)
     router_counts = []                 # Liste pour stocker le nombre de routeurs correspondant
+    convergence_times = []             # Temps simulé de convergence après chaque ajout (s)
 
     first_router_bottom_fed = None     # Source pour les tests ping (FED inférieur du premier routeur)
     last_router_top_fed = None         # Destination pour les tests ping (FED supérieur du routeur actuel)
@@ -38,58 +53,62 @@ def scenario_incremental_ping():
     #         duration -= 1
     
     def ping(src: int, dst: int, count: int = 10, interval: float = 1):
-        """Envoie 'count' pings depuis src vers dst avec un intervalle donné."""
-        for _ in range(count):
-            ns.ping(src, dst)
-            ns.go(interval)
-
-    for i in range(num_routers):
-        # Calcule la position pour le routeur actuel
-        router_x = (i + 1) * spacing
-        router_y = base_y
-
-        # Ajoute le nœud routeur
-        router_id = ns.add("router", x=router_x, y=router_y, radio_range=RADIO_RANGE)
-
-        # Génère plusieurs nœuds FED en haut du routeur.
-        # Par exemple, on va créer num_fed_top nœuds avec un décalage vertical de 5 unités entre chacun.
-        fed_top_ids = []
-        for j in range(num_fed):
-            # Le premier FED est placé à (router_y - spacing)
-            offset = j  
-            fed_id = ns.add("fed", x=router_x, y=router_y - spacing + offset, radio_range=RADIO_RANGE)
-            fed_top_ids.append(fed_id)
-
-        # Pour le FED inférieur, on en ajoute un seul
-        fed_bottom_id = ns.add("fed", x=router_x, y=router_y + spacing, radio_range=RADIO_RANGE)
-
-        # Pour le premier routeur, on stocke son FED inférieur comme source de ping
-        if i == 0:
-            first_router_bottom_fed = fed_bottom_id
+        """Envoie 'count' pings depuis src vers dst avec un intervalle donné ; retourne les échos reçus."""
+        records = ping_burst(ns, [(src, dst)], count=count, interval=interval)
+        return [record for record in records if not record.lost]
+
+    # Ligne décrite une seule fois
+    spec = line_spec(num_routers, num_fed, spacing, base_y)
+    nodes = compile_topology(spec)
+    # Graphe de connectivité de la ligne complète vérifié avant le premier ajout
+    check_layout(nodes)
+    first_router_bottom_fed = labelled(nodes)["0:r0:bottom0"]
+
+    # Démarre OTNS en arrière-plan ; les commandes sont enregistrées pour
+    # pouvoir rejouer plus tard les étapes déjà mesurées (même spec, même graine)
+    ns = ReplayCache(CACHE_DIR).recorder(OTNS(otns_args=["-seed", str(SEED)]), spec, SEED)
+    restored = ns.restore(upto=num_routers - 1)
+    for stage, data in restored:
+        convergence_times.append(data["convergence"])
+        if data["delay"] is not None:
+            router_counts.append(stage + 1)
+            ping_delays.append(data["delay"])
+
+    ns.web()                           # Lance la visualisation web (si disponible)
+    if not restored:
+        ns.go(1, speed=4)              # Avance le temps de simulation pour assurer le démarrage
+
+    first_stage = restored[-1][0] + 1 if restored else 0
+    for i in range(first_stage, num_routers):
+        group = [node for node in nodes if node.group == i]
+        build(ns, group, check=False)
+        for node in group:
+            ns.node_cmd(node.id, "thread start")
+
+        ids = labelled(group)
+        fed_top_ids = [ids[f"0:r{i}:top{j}"] for j in range(num_fed)]
+        fed_bottom_id = ids[f"0:r{i}:bottom0"]
 
         # Pour le routeur actuel, on utilise par exemple le dernier FED du haut comme destination de ping
         last_router_top_fed = fed_bottom_id
 
-        # Démarre le protocole Thread sur le routeur, tous les FED du haut et le FED inférieur
-        ns.node_cmd(router_id, "thread start")
-        for fed_top_id in fed_top_ids:
-            ns.node_cmd(fed_top_id, "thread start")
-        ns.node_cmd(fed_bottom_id, "thread start")
 
-
-        # Avance le temps de simulation pour permettre au réseau de converger
-        ns.go(duration=40, speed=1000)
+        # Avance le temps de simulation jusqu'à la convergence des nœuds déjà créés
+        convergence_times.append(wait_for_nodes(ns, [node for node in nodes if node.group <= i],
+                                                speed=1000))
+        if convergence_times[-1] is None:
+                                       # Étape non convergée : pas de mesure de délai
+            ns.checkpoint(i, {"convergence": None, "delay": None})
+            continue
 
         if i == 0:
             print (f"ici on ping({first_router_bottom_fed}, {fed_top_ids[0]})")
-            ping(first_router_bottom_fed, last_router_top_fed)
-            TabPing = ns.pings()
+            TabPing = ping(first_router_bottom_fed, last_router_top_fed)
         
         else:
                                        # Effectue un test ping: 1 ping avec un intervalle de 1 seconde
             print (f"ici on ping({first_router_bottom_fed}, {last_router_top_fed})")
-            ping(first_router_bottom_fed, last_router_top_fed)
-            TabPing = ns.pings()
+            TabPing = ping(first_router_bottom_fed, last_router_top_fed)
             # print(f"Résultats des pings: {TabPing}")
 
                                        # Récupère les résultats de ping mis à jour
@@ -97,6 +116,7 @@ def scenario_incremental_ping():
         new_count = len(TabPing)
         if new_count == 0:
                                        # Aucun résultat de ping disponible pour l'instant
+            ns.checkpoint(i, {"convergence": convergence_times[-1], "delay": None})
             continue
         # else:
         #     ItemPing = TabPing[new_count - 1]
@@ -109,7 +129,7 @@ def scenario_incremental_ping():
 
         else:
             # Exclure le premier résultat (index 0) et calculer la moyenne des délais des autres
-            delays = [item[3] for item in TabPing[1:]]
+            delays = [item.rtt for item in TabPing[1:]]
             if delays:
                 avg_delay = sum(delays) / len(delays)
             else:
@@ -118,17 +138,67 @@ def scenario_incremental_ping():
 
             router_counts.append(i + 1)
             ping_delays.append(avg_delay)
+            ns.checkpoint(i, {"convergence": convergence_times[-1], "delay": avg_delay})
 
 
 
+    print(f"Temps de convergence (s simulées) : {convergence_times}")
     ns.close()  
 
     return ping_delays
+
+
+def scenario_profile(num_routers=16, num_fed=20, count=10):
+    """
+    Même courbe que scenario_incremental_ping, en une seule construction :
+    la ligne complète est créée et converge une fois, puis le FED inférieur
+    du premier routeur pingue le FED inférieur de chaque autre routeur en
+    une seule rafale. Retourne un LatencyProfile (délai et perte par nombre
+    de sauts).
+    """
+    spec = line_spec(num_routers, num_fed)
+    nodes = compile_topology(spec)
+    check_layout(nodes)
+    ids = labelled(nodes)
+    src = ids["0:r0:bottom0"]
+    targets = [ids[f"0:r{i}:bottom0"] for i in range(1, num_routers)]
+
+    ns = OTNS()
+    build(ns, nodes, check=False)
+    for node in nodes:
+        ns.node_cmd(node.id, "thread start")
+    convergence_time = wait_for_nodes(ns, nodes, speed=1000)
+    print(f"Temps de convergence (s simulées) : {convergence_time if convergence_time is not None else 'non convergé'}")
+
+    profile = latency_profile(ns, src, targets, nodes, count=count)
+    ns.close()
+    return profile
    
 
     
 
 if __name__ == "__main__":
+    # Usage : python Line_Topologie.py [profile]
+    if len(sys.argv) > 1 and sys.argv[1] == "profile":
+        # Mode profil : une seule construction, délai et perte en fonction du nombre de sauts
+        profile = scenario_profile()
+        for hops, distance, delay, p95, loss in zip(profile.hops, profile.distance, profile.rtt,
+                                                   profile.p95, profile.loss):
+            print(f"{hops:.0f} sauts ({distance:.0f} m) : délai {delay:.2f} ms, "
+                  f"p95 {p95:.2f} ms, perte {loss:.0%}")
+
+        plt.figure(figsize=(8, 5))
+        plt.plot(profile.hops, profile.rtt, marker='o', linestyle='-', color='blue')
+        plt.xlabel("Nombre de sauts")
+        plt.ylabel("Délai de Ping (ms)")
+        plt.title("Délai de Ping en fonction du nombre de sauts")
+        plt.grid(True)
+        plt.tight_layout()
+        timestamp = datetime.now().strftime("%H_%M_%S")
+        plt.savefig(f"/home/imerir/ot-ns/Graphes_radio/profile_ping_hops_{timestamp}.png")
+        plt.show()
+        sys.exit(0)
+
     # Exécute la simulation une seule fois et récupère les délais
     ping_delays = scenario_incremental_ping()
     
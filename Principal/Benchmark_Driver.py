@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Banc de mesure de la couche pilote : aller-retour send_cmd, débit d'ajout de
+nœuds, coût d'analyse des réponses, débit du TeeLogger et relevé des rafales
+de ping. Par défaut il tourne contre le remplaçant local Fake_Otns.py avec
+une latence fixe, pour mesurer notre propre surcoût indépendamment d'OTNS.
+
+Toute la série est répétée --repeat fois : chaque mesure est la médiane des
+répétitions, avec sa dispersion (écart interquartile rapporté à la médiane,
+en %). Les résultats sont écrits en JSON ; avec --baseline, chaque médiane
+est comparée à une exécution de référence et les régressions sont données
+en %. Seules les mesures dont la dispersion, ici et dans la référence, reste
+sous le seuil peuvent échouer : les autres sont signalées comme bruitées.
+
+Usage :
+    python Benchmark_Driver.py [--out resultats.json] [--baseline reference.json]
+                               [--save-baseline reference.json] [--threshold 10]
+                               [--repeat 5] [--latency MS] [--otns "commande"] [--quick]
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+import pexpect
+
+from Utils import send_cmd, send_many, extract_node_id, parse_nodes
+from Topology import TopologySpec, row, build
+from Ping import ping_burst
+from Class_TeeLogger import TeeLogger
+
+FAKE_OTNS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Fake_Otns.py")
+ADDR_RE = re.compile(r"([0-9a-fA-F:]{20,})")
+
+
+def metric(value, unit, higher_is_better=True):
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+
+
+def summarize(samples):
+    """Une mesure par répétition -> médiane, dispersion (IQR / médiane, %) et échantillons."""
+    first = samples[0]
+    values = [sample["value"] for sample in samples]
+    median = statistics.median(values)
+    if len(values) > 1 and median:
+        q1, _, q3 = statistics.quantiles(values, n=4, method="inclusive")
+        spread = (q3 - q1) / abs(median) * 100
+    else:
+        spread = None
+    return {"value": median, "spread": spread, "samples": values,
+            "unit": first["unit"], "higher_is_better": first["higher_is_better"]}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def spawn(otns_cmd):
+    proc = pexpect.spawn(otns_cmd, encoding="utf-8", timeout=30)
+    proc.expect(">")
+    return proc
+
+
+#------------------------------------------------------------------------------------------
+# Mesures
+
+def bench_send_cmd(proc, n):
+    """Latence aller-retour d'une commande simple via send_cmd."""
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(n):
+            start = time.perf_counter()
+            send_cmd(proc, "speed")
+            latencies.append((time.perf_counter() - start) * 1000)
+    return {"send_cmd.p50_ms": metric(percentile(latencies, 50), "ms", False),
+            "send_cmd.p95_ms": metric(percentile(latencies, 95), "ms", False),
+            "send_cmd.cmds_per_s": metric(n / (sum(latencies) / 1000), "cmd/s")}
+
+
+def bench_node_add(proc, num_routers):
+    """Débit d'ajout de nœuds d'une ligne (ex-generate_row_topology, via build)."""
+    send_many(proc, ["clear"])
+    spec = TopologySpec(parts=(row(row_y=250, num_routers=num_routers, fed_total=6, delta_x=150,
+                                   pattern_first=[2, 4], pattern_intermediate=[1, 5],
+                                   pattern_last=[2, 4]),))
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        nodes = build(proc, spec, check=False)
+    elapsed = time.perf_counter() - start
+    send_many(proc, ["clear"])
+    return {"node_add.nodes_per_s": metric(len(nodes) / elapsed, "nœuds/s")}
+
+
+def bench_parse(n):
+    """Coût d'analyse : extract_node_id, adresses IPv6 et sortie "nodes"."""
+    add_output = "add router x 500 y 250\r\n42\r\nDone\r\n"
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(n):
+            extract_node_id(add_output)
+    extract_rate = n / (time.perf_counter() - start)
+
+    ipaddr_output = "\n".join(["fdde:ad00:beef:0:0:ff:fe00:fc00", "fdde:ad00:beef:0:0:ff:fe00:400",
+                               "fdde:ad00:beef:0:5dc0:1c4f:e1cf:28e4", "fe80:0:0:0:ecf6:1e8b:8a70:3f8b"])
+    start = time.perf_counter()
+    for _ in range(n):
+        ADDR_RE.findall(ipaddr_output)
+    addr_rate = n / (time.perf_counter() - start)
+
+    nodes_output = "\n".join(f"id={i}\textaddr={i:016x}\trloc16={i:04x}\tx={i}\ty={i}\t"
+                             f"state=router\tfailed=false" for i in range(1, 501))
+    rounds = max(1, n // 500)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        parse_nodes(nodes_output)
+    nodes_rate = rounds * 500 / (time.perf_counter() - start)
+    return {"parse.extract_node_id_per_s": metric(extract_rate, "op/s"),
+            "parse.ipaddr_per_s": metric(addr_rate, "op/s"),
+            "parse.nodes_lines_per_s": metric(nodes_rate, "lignes/s")}
+
+
+class SlowConsole(io.StringIO):
+    """
+    Console lente (terminal) : chaque ligne coûte `delay` secondes, quel que
+    soit le découpage des écritures (le TeeLogger écrit par lots).
+    """
+
+    def __init__(self, delay=100e-6):
+        super().__init__()
+        self.delay = delay
+
+    def write(self, data):
+        time.sleep(self.delay * data.count("\n"))
+        return super().write(data)
+
+
+def _tee_elapsed(directory, console, n, line):
+    """Durée (s) d'écriture de n lignes jusqu'au vidage complet (sync) du fichier et de la console."""
+    with contextlib.redirect_stdout(console):
+        logger = TeeLogger(filename=os.path.join(directory, "bench.txt"))
+        start = time.perf_counter()
+        for _ in range(n):
+            logger.write(line)
+        logger.sync()
+        elapsed = time.perf_counter() - start
+        logger.close()
+    return elapsed
+
+
+def bench_tee_logger(n):
+    """Débit d'écriture du TeeLogger, console en mémoire puis console lente."""
+    line = "[2025-01-01 12:00:00] node 12: role changed to router (partition 0x4a5b6c7d)\n"
+    with tempfile.TemporaryDirectory() as directory:
+        rate = n / _tee_elapsed(directory, io.StringIO(), n, line)
+        # Coût fixe de la console par ligne : la durée jusqu'au vidage ne dépend
+        # que de ce coût et du surcoût du logger, pas de la taille des lots
+        drain = _tee_elapsed(directory, SlowConsole(), max(1, n // 20), line)
+    return {"tee_logger.lines_per_s": metric(rate, "lignes/s"),
+            "tee_logger.mb_per_s": metric(rate * len(line.encode()) / 1e6, "Mo/s"),
+            "tee_logger.slow_console_drain_ms": metric(drain * 1000, "ms", False)}
+
+
+def bench_ping_burst(proc, num_pairs, count):
+    """Rafale de ping sur num_pairs paires puis relevé de tous les échos."""
+    send_many(proc, ["clear"] + [f"add router x {100 + 50 * i} y 100 id {i + 1}"
+                                 for i in range(2 * num_pairs)] + ["go 20"])
+    pairs = [(i + 1, num_pairs + i + 1) for i in range(num_pairs)]
+    start = time.perf_counter()
+    records = ping_burst(proc, pairs, count=count, interval=1)
+    elapsed = time.perf_counter() - start
+    send_many(proc, ["clear"])
+    return {"ping_burst.echoes_per_s": metric(len(records) / elapsed, "échos/s"),
+            "ping_burst.ms": metric(elapsed * 1000, "ms", False)}
+
+
+#------------------------------------------------------------------------------------------
+# Comparaison à une référence
+
+def compare(results, baseline, threshold):
+    """
+    Affiche l'écart de chaque médiane à la référence ; retourne les
+    régressions > seuil des mesures assez stables (dispersion < seuil ici et
+    dans la référence ; une référence sans dispersion ne compte que l'actuelle).
+    """
+    regressions = []
+    print(f"\n{'mesure':<34}{'référence':>14}{'actuel':>14}{'écart':>10}{'dispersion':>12}")
+    for name, current in sorted(results.items()):
+        reference = baseline.get(name)
+        if reference is None or not reference["value"]:
+            print(f"{name:<34}{'-':>14}{current['value']:>14.3f}{'':>10}")
+            continue
+        change = (current["value"] - reference["value"]) / reference["value"] * 100
+        regression = -change if current["higher_is_better"] else change
+        spreads = [s for s in (current.get("spread"), reference.get("spread")) if s is not None]
+        spread = max(spreads, default=0.0)
+        if regression <= threshold:
+            flag = ""
+        elif spread >= threshold:
+            flag = "  bruitée (non bloquante)"
+        else:
+            flag = "  RÉGRESSION"
+            regressions.append((name, regression))
+        print(f"{name:<34}{reference['value']:>14.3f}{current['value']:>14.3f}{change:>+9.1f}%"
+              f"{spread:>11.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de mesure de la couche pilote")
+    parser.add_argument("--otns", default=None, help="commande OTNS (défaut : remplaçant local)")
+    parser.add_argument("--latency", type=float, default=1.0, help="latence du remplaçant (ms)")
+    parser.add_argument("--out", default="benchmark_driver.json")
+    parser.add_argument("--baseline", default=None, help="résultats de référence (JSON)")
+    parser.add_argument("--save-baseline", default=None, help="enregistre ces résultats comme référence")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="régression tolérée et dispersion maximale d'une mesure bloquante (%%)")
+    parser.add_argument("--repeat", type=int, default=5, help="répétitions de toute la série")
+    parser.add_argument("--quick", action="store_true", help="tailles réduites")
+    args = parser.parse_args()
+
+    otns_cmd = args.otns or f"{sys.executable} {FAKE_OTNS} --latency {args.latency} --seed 1"
+    scale = 0.1 if args.quick else 1
+
+    samples = {}
+    for repetition in range(max(1, args.repeat)):
+        run = {}
+        proc = spawn(otns_cmd)
+        try:
+            run.update(bench_send_cmd(proc, int(200 * scale) or 1))
+            run.update(bench_node_add(proc, int(100 * scale) or 1))
+            run.update(bench_ping_burst(proc, int(50 * scale) or 1, 10))
+        finally:
+            proc.sendline("exit")
+            proc.close()
+        run.update(bench_parse(int(20000 * scale)))
+        run.update(bench_tee_logger(int(200000 * scale)))
+        for name, value in run.items():
+            samples.setdefault(name, []).append(value)
+    results = {name: summarize(values) for name, values in samples.items()}
+
+    report = {"timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+              "python": platform.python_version(), "platform": platform.platform(),
+              "otns_cmd": otns_cmd, "results": results}
+    for path in filter(None, (args.out, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    for name, value in sorted(results.items()):
+        spread = f"±{value['spread']:.1f} %" if value["spread"] is not None else ""
+        print(f"{name:<34}{value['value']:>14.3f} {value['unit']:<10}{spread}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} régression(s) au-delà de {args.threshold:.0f} %")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Compare le débit d'ajout de nœuds entre l'envoi commande par commande
+(send_cmd) et l'envoi en lot (send_many).
+
+Usage : python Benchmark_Send_Many.py [nb_noeuds] [commande_otns]
+
+Sans OTNS, le remplaçant local mesure le surcoût du pilote seul :
+    python Benchmark_Send_Many.py 500 "python Fake_Otns.py --latency 1"
+"""
+import contextlib
+import io
+import sys
+import time
+
+import pexpect
+
+from Utils import send_cmd, send_many
+
+
+def add_cmds(num_nodes, spacing=20):
+    """Commandes d'ajout de routeurs sur une grille carrée."""
+    side = max(1, int(num_nodes ** 0.5))
+    return [f"add router x {100 + (n % side) * spacing} y {100 + (n // side) * spacing}"
+            for n in range(num_nodes)]
+
+
+def bench_per_command(proc, cmds):
+    """Un aller-retour par commande (chemin historique)."""
+    start = time.perf_counter()
+    # Les traces de send_cmd ne font pas partie de la mesure
+    with contextlib.redirect_stdout(io.StringIO()):
+        for cmd in cmds:
+            send_cmd(proc, cmd)
+    return time.perf_counter() - start
+
+
+def bench_batch(proc, cmds):
+    """Toutes les commandes en un seul lot."""
+    start = time.perf_counter()
+    send_many(proc, cmds)
+    return time.perf_counter() - start
+
+
+def main():
+    num_nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    otns_cmd = sys.argv[2] if len(sys.argv) > 2 else "otns"
+
+    proc = pexpect.spawn(otns_cmd, encoding="utf-8", timeout=30)
+    proc.expect(">")
+    cmds = add_cmds(num_nodes)
+
+    results = {}
+    for name, bench in (("send_cmd", bench_per_command), ("send_many", bench_batch)):
+        send_many(proc, ["clear"])
+        elapsed = bench(proc, cmds)
+        results[name] = elapsed
+        print(f"{name:>10} : {num_nodes} nœuds en {elapsed:.3f} s "
+              f"({num_nodes / elapsed:.1f} nœuds/s)")
+
+    print(f"Accélération : x{results['send_cmd'] / results['send_many']:.1f}")
+    proc.sendline("exit")
+    proc.close()
+
+
+if __name__ == "__main__":
+    main()
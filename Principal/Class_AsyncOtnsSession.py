@@ -0,0 +1,183 @@
+import asyncio
+import collections
+import re
+
+from Utils import CommandResult, CommandError, CommandTimeout, ANSI_ESCAPE_RE
+
+#==============================================================================================
+# Class_AsyncOtnsSession.py
+#==============================================================================================
+
+# Sorties non sollicitées courantes, à passer à AsyncOtnsSession.subscribe()
+PING_REPLY_PATTERN = r"(\d+) bytes from ([0-9a-fA-F:]+): icmp_seq=(\d+) hlim=(\d+) time=(\d+)ms"
+ROLE_CHANGE_PATTERN = r"[Nn]ode\s*<?(\d+)>?.*?[Rr]ole.*?\b(disabled|detached|child|router|leader)\s*$"
+# Lignes asynchrones : jamais comptées dans la réponse de la commande en cours
+UNSOLICITED_PATTERNS = (PING_REPLY_PATTERN, ROLE_CHANGE_PATTERN)
+
+DONE_RE = re.compile(r"^Done$")
+ERROR_RE = re.compile(r"^Error(?: (\d+))?: ?(.*)$")
+
+
+class AsyncOtnsSession:
+    """
+    Session OTNS pilotée par asyncio, avec une seule tâche de lecture.
+
+    Plusieurs appelants peuvent attendre `cmd()` en même temps : les commandes
+    sont écrites dans l'ordre d'appel et les réponses (terminées par "Done" ou
+    "Error ...") leur sont rendues dans le même ordre. Les lignes reçues hors
+    réponse, ou reconnues par `unsolicited` (réponses de ping, changements de
+    rôle...) même pendant une réponse, sont distribuées aux abonnés de
+    `subscribe()`. Une boucle asyncio peut ainsi piloter plusieurs
+    simulations, sans thread par tube.
+
+    Après un timeout, la réponse en retard décalerait toutes les suivantes :
+    la session est alors marquée désynchronisée, les commandes en attente
+    échouent et les suivantes sont refusées (CommandError) jusqu'à un
+    nouveau start().
+    """
+
+    def __init__(self, program="otns", args=(), cwd=None, unsolicited=UNSOLICITED_PATTERNS):
+        self.program = program
+        self.args = list(args)
+        self.cwd = cwd
+        self.proc = None
+        self._reader = None
+        self._pending = collections.deque()  # [cmd, lignes, future, écho vu]
+        self._subscribers = []               # (regex ou None, asyncio.Queue)
+        self._unsolicited = [re.compile(pattern) for pattern in unsolicited]
+        self._broken = None                  # raison de la désynchronisation
+
+    async def start(self):
+        """Lance le processus et la tâche de lecture."""
+        self._broken = None
+        self.proc = await asyncio.create_subprocess_exec(
+            self.program, *self.args, cwd=self.cwd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT)
+        self._reader = asyncio.create_task(self._read_loop())
+        return self
+
+    async def cmd(self, cmd, timeout=30):
+        """
+        Envoie une commande et attend sa réponse complète.
+        Retourne un CommandResult ou lève CommandError / CommandTimeout.
+        """
+        if self.proc is None or self._reader.done():
+            raise CommandError(cmd, "session OTNS fermée")
+        if self._broken is not None:
+            raise CommandError(cmd, self._broken)
+        future = asyncio.get_running_loop().create_future()
+        # Évite l'avertissement "exception never retrieved" si l'appelant a
+        # abandonné l'attente (timeout) avant l'arrivée de la réponse.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        # Pas d'await entre l'ajout en file et l'écriture : l'ordre des
+        # réponses reste celui des commandes.
+        self._pending.append([cmd, [], future, False])
+        self.proc.stdin.write(cmd.encode() + b"\n")
+        await self.proc.stdin.drain()
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self._desync(f"session désynchronisée après le timeout de '{cmd}'")
+            raise CommandTimeout(cmd, f"pas de réponse après {timeout} s") from None
+
+    def _desync(self, reason):
+        """Plus aucune réponse n'est attribuable : commandes en attente en échec, lignes publiées."""
+        self._broken = reason
+        while self._pending:
+            cmd, _, future, _ = self._pending.popleft()
+            if not future.done():
+                future.set_exception(CommandError(cmd, reason))
+
+    def subscribe(self, pattern=None, maxsize=0):
+        """
+        Retourne une asyncio.Queue qui recevra les `re.Match` des lignes
+        correspondant à `pattern`, ou toutes les lignes hors réponse si
+        `pattern` vaut None.
+        """
+        queue = asyncio.Queue(maxsize)
+        regex = re.compile(pattern) if pattern is not None else None
+        self._subscribers.append((regex, queue))
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers = [(r, q) for r, q in self._subscribers if q is not queue]
+
+    def _publish(self, line, unsolicited):
+        for regex, queue in self._subscribers:
+            if regex is None:
+                if unsolicited:
+                    self._offer(queue, line)
+            else:
+                match = regex.search(line)
+                if match:
+                    self._offer(queue, match)
+
+    @staticmethod
+    def _offer(queue, item):
+        # Un abonné lent ne doit pas bloquer la lecture : on perd l'événement.
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            pass
+
+    async def _read_loop(self):
+        try:
+            while True:
+                raw = await self.proc.stdout.readline()
+                if not raw:
+                    break
+                line = ANSI_ESCAPE_RE.sub("", raw.decode("utf-8", errors="replace"))
+                line = line.replace("\r", "").lstrip("> ").rstrip()
+                if line:
+                    self._dispatch(line)
+        finally:
+            while self._pending:
+                cmd, _, future, _ = self._pending.popleft()
+                if not future.done():
+                    future.set_exception(CommandError(cmd, "OTNS s'est arrêté"))
+
+    def _dispatch(self, line):
+        if not self._pending or any(regex.search(line) for regex in self._unsolicited):
+            self._publish(line, unsolicited=True)
+            return
+        head = self._pending[0]
+        cmd, lines, future, echoed = head
+        if not echoed and line == cmd:
+            head[3] = True
+            return
+        self._publish(line, unsolicited=False)
+        error = ERROR_RE.match(line)
+        if DONE_RE.match(line):
+            self._pending.popleft()
+            if not future.done():
+                future.set_result(CommandResult(cmd, lines))
+        elif error:
+            self._pending.popleft()
+            if not future.done():
+                code = error.group(1)
+                future.set_exception(CommandError(cmd, error.group(2).strip(),
+                                                  code=int(code) if code else None, lines=lines))
+        else:
+            lines.append(line)
+
+    async def close(self, timeout=5):
+        """Demande l'arrêt d'OTNS et attend la fin du processus."""
+        if self.proc is None:
+            return
+        if self.proc.returncode is None:
+            try:
+                self.proc.stdin.write(b"exit\n")
+                await self.proc.stdin.drain()
+                await asyncio.wait_for(self.proc.wait(), timeout)
+            except (asyncio.TimeoutError, ConnectionResetError, BrokenPipeError):
+                self.proc.kill()
+                await self.proc.wait()
+        await self._reader
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
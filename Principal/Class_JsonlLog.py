@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import gzip
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:                    # compression zstd optionnelle, gzip sinon
+    zstandard = None
+
+#==============================================================================================
+# Class_JsonlLog.py
+#==============================================================================================
+#
+#   log = JsonlLog("logs", prefix="testping", max_bytes=64 << 20, keep=20)
+#   log.log("ping", sim_time=12.5, src=1, dst=11, rtt=23.0)
+#   tee = TeeLogger(file_obj=log)          # ou : chaque ligne de texte devient un enregistrement
+#   ...
+#   log.close()
+#   for record in read_window("logs", "testping", start=t0, end=t1): ...
+#
+# Le segment actif est un fichier .jsonl en clair. À la rotation (taille ou
+# âge), il est compressé bloc par bloc (un bloc ≈ block_bytes de texte) :
+# chaque bloc est une trame zstd / un membre gzip indépendant, si bien que le
+# fichier compressé reste un .zst / .gz ordinaire mais qu'un bloc peut être
+# décompressé seul. L'index <prefix>.index.jsonl donne pour chaque bloc son
+# segment, sa position et sa longueur compressées et ses bornes en temps
+# réel (t) et simulé (sim).
+
+EXTENSIONS = {"zstd": ".zst", "gzip": ".gz"}
+
+
+def _compress(data, compression):
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(data, compression):
+    if compression == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class JsonlLog:
+    """
+    Journal structuré JSONL avec rotation par taille (max_bytes) et/ou par
+    âge (max_age, secondes), compression des segments tournés en tâche de
+    fond et index latéral. `keep` borne le nombre de segments compressés
+    conservés (les plus anciens sont supprimés) : une boucle sans fin ne
+    remplit plus le disque.
+
+    Chaque enregistrement porte "t" (horloge murale, s) et, si connu, "sim"
+    (temps simulé, s). L'objet se comporte aussi comme un fichier texte
+    (write/flush) : chaque ligne complète devient {"event": "line", "text": ...}.
+    """
+
+    def __init__(self, directory, prefix="otns_log", max_bytes=64 << 20, max_age=None,
+                 compression="auto", keep=None, block_bytes=1 << 20):
+        if compression == "auto":
+            compression = "zstd" if zstandard is not None else "gzip"
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("la compression zstd nécessite zstandard (pip install zstandard)")
+        if compression not in EXTENSIONS:
+            raise ValueError(f"compression inconnue : {compression!r}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.name = os.path.join(directory, f"{prefix}.jsonl")       # pour TeeLogger(file_obj=...)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compression = compression
+        self.keep = keep
+        self.block_bytes = block_bytes
+        self.sim_time = None           # Dernier temps simulé connu, repris par défaut
+
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._compressors = []
+        self._partial = ""
+        # Numérotation reprise après les segments déjà présents (run précédent)
+        pattern = re.compile(rf"{re.escape(prefix)}_(\d+)\.jsonl")
+        self._number = max((int(m.group(1)) for m in map(pattern.match, os.listdir(directory)) if m),
+                           default=0)
+        self._file = None
+        self._open_segment()
+
+    #------------------------------------------------------------------------------------------
+    # Écriture
+
+    def _open_segment(self):
+        self._number += 1
+        self._path = os.path.join(self.directory, f"{self.prefix}_{self._number:05d}.jsonl")
+        self._file = open(self._path, "wb", buffering=1 << 20)
+        self._opened = time.time()
+        self._size = 0
+        self._blocks = []              # [début, fin, t0, t1, sim0, sim1, nombre]
+
+    def log(self, event, sim_time=None, **fields):
+        """Ajoute un enregistrement ; `sim_time` (s) met à jour le temps simulé courant."""
+        if sim_time is not None:
+            self.sim_time = sim_time
+        record = {"t": round(time.time(), 6), "sim": self.sim_time, "event": event}
+        record.update(fields)
+        self._append([record])
+
+    def write(self, data):
+        """Interface fichier : chaque ligne de texte complète devient un enregistrement."""
+        if isinstance(data, bytes):
+            data = data.decode("utf-8", errors="replace")
+        lines = (self._partial + data).split("\n")
+        self._partial = lines.pop()
+        now = round(time.time(), 6)
+        self._append([{"t": now, "sim": self.sim_time, "event": "line", "text": line.rstrip("\r")}
+                      for line in lines if line.strip()])
+        return len(data)
+
+    def _append(self, records):
+        if not records:
+            return
+        with self._lock:
+            if self._file is None:
+                raise ValueError("I/O operation on closed JsonlLog")
+            data = "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n"
+                           for r in records).encode("utf-8")
+            t0, t1 = records[0]["t"], records[-1]["t"]
+            sims = [r["sim"] for r in records if r.get("sim") is not None]
+            block = self._blocks[-1] if self._blocks else None
+            if block is None or block[1] - block[0] >= self.block_bytes:
+                block = [self._size, self._size, t0, t1, None, None, 0]
+                self._blocks.append(block)
+            block[1] += len(data)
+            block[3] = t1
+            if sims:
+                block[4] = min(sims) if block[4] is None else min(block[4], min(sims))
+                block[5] = max(sims) if block[5] is None else max(block[5], max(sims))
+            block[6] += len(records)
+            self._file.write(data)
+            self._size += len(data)
+            if self._size >= self.max_bytes or (self.max_age is not None
+                                                and time.time() - self._opened >= self.max_age):
+                self._rotate()
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def _rotate(self):
+        """Ferme le segment actif et le confie à un thread de compression."""
+        self._file.close()
+        path, blocks = self._path, self._blocks
+        self._compressors = [t for t in self._compressors if t.is_alive()]
+        thread = threading.Thread(target=self._compress_segment, args=(path, blocks),
+                                  name="JsonlLog", daemon=False)
+        thread.start()
+        self._compressors.append(thread)
+        self._open_segment()
+
+    def _compress_segment(self, path, blocks):
+        target = path + EXTENSIONS[self.compression]
+        entries = []
+        with open(path, "rb") as src, open(target + ".tmp", "wb") as dst:
+            for start, end, t0, t1, sim0, sim1, count in blocks:
+                src.seek(start)
+                frame = _compress(src.read(end - start), self.compression)
+                entries.append({"segment": os.path.basename(target), "offset": dst.tell(),
+                                "length": len(frame), "compression": self.compression,
+                                "t0": t0, "t1": t1, "sim0": sim0, "sim1": sim1, "records": count})
+                dst.write(frame)
+        os.replace(target + ".tmp", target)
+        os.remove(path)
+        with self._index_lock:
+            with open(os.path.join(self.directory, f"{self.prefix}.index.jsonl"), "a") as index:
+                index.writelines(json.dumps(e) + "\n" for e in entries)
+            self._prune()
+
+    def _prune(self):
+        if self.keep is None:
+            return
+        segments = sorted(p for p in glob.glob(os.path.join(self.directory, f"{self.prefix}_*.jsonl?*"))
+                          if not p.endswith(".tmp"))
+        removed = {os.path.basename(old) for old in segments[:-self.keep]}
+        if not removed:
+            return
+        for old in removed:
+            os.remove(os.path.join(self.directory, old))
+        # L'index ne garde que les blocs des segments restants (réécrit d'un bloc)
+        index_path = os.path.join(self.directory, f"{self.prefix}.index.jsonl")
+        if not os.path.exists(index_path):
+            return
+        with open(index_path) as index:
+            kept = [line for line in index
+                    if line.strip() and json.loads(line)["segment"] not in removed]
+        with open(index_path + ".tmp", "w") as index:
+            index.writelines(kept)
+        os.replace(index_path + ".tmp", index_path)
+
+    def close(self):
+        """Tourne le segment actif (compressé et indexé) et attend la fin des compressions."""
+        if self._file is None:
+            return
+        if self._partial.strip():
+            self.write("\n")
+        with self._lock:
+            if self._size:
+                self._rotate()
+            self._file.close()
+            os.remove(self._path)
+            self._file = None
+        for thread in self._compressors:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+#==============================================================================================
+# Lecture d'une fenêtre
+#==============================================================================================
+
+def _overlaps(low, high, start, end):
+    if low is None or high is None:
+        return start is None and end is None
+    return (start is None or high >= start) and (end is None or low <= end)
+
+
+def _in_window(value, start, end):
+    if start is None and end is None:
+        return True
+    return value is not None and (start is None or value >= start) and (end is None or value <= end)
+
+
+def read_window(directory, prefix="otns_log", start=None, end=None, sim_start=None, sim_end=None):
+    """
+    Enregistrements dont le temps réel est dans [start, end] et le temps
+    simulé dans [sim_start, sim_end] (bornes None : pas de limite). Seuls les
+    blocs compressés dont l'index recoupe la fenêtre sont lus ; les segments
+    encore en clair (run en cours ou interrompu) sont parcourus en entier.
+    """
+    index_path = os.path.join(directory, f"{prefix}.index.jsonl")
+    entries = []
+    if os.path.exists(index_path):
+        with open(index_path) as index:
+            entries = [json.loads(line) for line in index if line.strip()]
+    handles = {}
+    try:
+        for entry in entries:
+            if not (_overlaps(entry["t0"], entry["t1"], start, end)
+                    and _overlaps(entry["sim0"], entry["sim1"], sim_start, sim_end)):
+                continue
+            path = os.path.join(directory, entry["segment"])
+            if path not in handles:
+                if not os.path.exists(path):           # supprimé par `keep`
+                    continue
+                handles[path] = open(path, "rb")
+            handle = handles[path]
+            handle.seek(entry["offset"])
+            data = _decompress(handle.read(entry["length"]), entry["compression"])
+            yield from _filter(data.splitlines(), start, end, sim_start, sim_end)
+    finally:
+        for handle in handles.values():
+            handle.close()
+
+    for path in sorted(glob.glob(os.path.join(directory, f"{prefix}_*.jsonl"))):
+        with open(path, "rb") as plain:
+            yield from _filter(plain, start, end, sim_start, sim_end)
+
+
+def _filter(lines, start, end, sim_start, sim_end):
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if _in_window(record.get("t"), start, end) and _in_window(record.get("sim"), sim_start, sim_end):
+            yield record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extrait une fenêtre d'un journal JsonlLog")
+    parser.add_argument("directory")
+    parser.add_argument("--prefix", default="otns_log")
+    parser.add_argument("--start", type=float, default=None, help="temps réel (epoch, s)")
+    parser.add_argument("--end", type=float, default=None)
+    parser.add_argument("--sim-start", type=float, default=None, help="temps simulé (s)")
+    parser.add_argument("--sim-end", type=float, default=None)
+    args = parser.parse_args()
+    for record in read_window(args.directory, args.prefix, args.start, args.end,
+                              args.sim_start, args.sim_end):
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
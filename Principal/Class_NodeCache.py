@@ -0,0 +1,170 @@
+import collections
+import re
+
+from Utils import is_ns, get_node_roles, send_cmd, send_many, CommandError
+
+#==============================================================================================
+# Class_NodeCache.py
+#==============================================================================================
+
+ADDR_RE = re.compile(r"([0-9a-fA-F:]{20,})")
+
+# Types d'adresses qui ne changent pas tant que le nœud existe ; les autres
+# (RLOC, ALOC, liste complète) suivent le rôle et le parent du nœud.
+STABLE_ADDR_TYPES = ("mleid", "linklocal")
+
+
+class NodeCache:
+    """
+    Cache des adresses et des rôles placé devant OTNS (processus pexpect ou
+    instance otns.cli.OTNS).
+
+    Chaque nœud a un numéro de génération, incrémenté quand le nœud est
+    ajouté, supprimé, effacé par "clear" ou change de rôle : ses entrées
+    sont alors retirées du cache. Les rôles sont relus en bloc (une seule
+    commande "nodes") après chaque "go". Un "go" périme aussi les adresses
+    qui dépendent du parent (RLOC, ALOC, liste complète), qu'un changement
+    de parent modifie sans changer le rôle ; ML-EID et link-local restent
+    servies depuis le cache jusqu'à la suppression du nœud.
+
+    Avec une instance OTNS, la classe se comporte comme un mandataire :
+    add/delete/go sont interceptés, tout le reste est délégué.
+    """
+
+    def __init__(self, proc_or_ns):
+        self._target = proc_or_ns
+        self._generation = collections.defaultdict(int)
+        self._addrs = {}            # (id, type) -> (génération, liste d'adresses)
+        self._roles = None          # {id: rôle}, None si périmé (après "go")
+        self._last_roles = {}
+        self.hits = 0
+        self.misses = 0
+
+    #------------------------------------------------------------------------------------------
+    # Invalidation
+
+    def invalidate(self, node_id=None):
+        """Périme un nœud (ou tous les nœuds si `node_id` vaut None)."""
+        if node_id is None:
+            self._generation.clear()
+            self._addrs.clear()
+            self._last_roles = {}
+        else:
+            self._generation[node_id] += 1
+            for key in [key for key in self._addrs if key[0] == node_id]:
+                del self._addrs[key]
+            self._last_roles.pop(node_id, None)
+        self._roles = None
+
+    def _expire(self):
+        """Le temps simulé avance : rôles à relire, adresses liées au parent périmées."""
+        self._roles = None
+        for key in [key for key in self._addrs if key[1] not in STABLE_ADDR_TYPES]:
+            del self._addrs[key]
+
+    def on_role_change(self, node_id, role=None):
+        """À brancher sur un événement de changement de rôle."""
+        self.invalidate(int(node_id))
+
+    def observe(self, cmd, output=None):
+        """
+        Met à jour le cache d'après une commande texte envoyée à OTNS
+        ("add ...", "del 1 2", "clear", "go ...") et sa sortie éventuelle.
+        """
+        words = cmd.split()
+        if not words:
+            return
+        if words[0] == "add":
+            if "id" in words[:-1]:
+                self.invalidate(int(words[words.index("id") + 1]))
+            elif output is not None and str(output).strip().isdigit():
+                self.invalidate(int(str(output).strip()))
+            else:
+                self._roles = None
+        elif words[0] in ("del", "delete"):
+            for word in words[1:]:
+                if word.isdigit():
+                    self.invalidate(int(word))
+        elif words[0] == "clear":
+            self.invalidate()
+        elif words[0] == "go":
+            self._expire()
+
+    #------------------------------------------------------------------------------------------
+    # Requêtes servies depuis le cache
+
+    def roles(self):
+        """Rôle de tous les nœuds ; relu en bloc seulement si le cache est périmé."""
+        if self._roles is not None:
+            self.hits += 1
+            return self._roles
+        self.misses += 1
+        roles = get_node_roles(self._target)
+        for node_id, role in roles.items():
+            previous = self._last_roles.get(node_id)
+            if previous is not None and previous != role:
+                self.invalidate(node_id)
+        self._roles = self._last_roles = roles
+        return roles
+
+    def get_state(self, node_id):
+        return self.roles().get(node_id, "unknown")
+
+    def get_ipaddrs(self, node_id, addr_type=None):
+        """Adresses IPv6 d'un nœud, toutes ou du type `addr_type` ("rloc", "mleid", "linklocal"...)."""
+        key = (node_id, addr_type)
+        generation = self._generation[node_id]
+        cached = self._addrs.get(key)
+        if cached is not None and cached[0] == generation:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        if is_ns(self._target):
+            addrs = list(self._target.get_ipaddrs(node_id, addr_type))
+        else:
+            # "ipaddr rloc", "ipaddr mleid"... : le filtrage est fait par la CLI du nœud
+            ipaddr = f"ipaddr {addr_type}" if addr_type else "ipaddr"
+            output = send_many(self._target, [f'node {node_id} "{ipaddr}"'])[0]
+            addrs = ADDR_RE.findall(output)
+        self._addrs[key] = (generation, addrs)
+        return addrs
+
+    #------------------------------------------------------------------------------------------
+    # Commandes qui modifient le réseau
+
+    def send_cmd(self, cmd, timeout=5):
+        """send_cmd (processus pexpect) qui tient le cache à jour."""
+        try:
+            output = send_cmd(self._target, cmd, timeout=timeout)
+        except CommandError:
+            self.observe(cmd)
+            raise
+        self.observe(cmd, output)
+        return output
+
+    def add(self, *args, **kwargs):
+        node_id = self._target.add(*args, **kwargs)
+        self.invalidate(node_id)
+        return node_id
+
+    def delete(self, *node_ids):
+        self._target.delete(*node_ids)
+        for node_id in node_ids:
+            self.invalidate(node_id)
+
+    def go(self, *args, **kwargs):
+        self._expire()
+        return self._target.go(*args, **kwargs)
+
+    #------------------------------------------------------------------------------------------
+    # Délégation du reste de l'API OTNS
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def __setattr__(self, name, value):
+        # `ns.speed = 4` doit atteindre l'instance OTNS, pas le mandataire.
+        if name.startswith("_") or name in ("hits", "misses"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._target, name, value)
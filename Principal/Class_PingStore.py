@@ -0,0 +1,231 @@
+import csv
+import glob
+import os
+
+import numpy as np
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:                    # export Parquet optionnel
+    pyarrow = None
+
+#==============================================================================================
+# Class_PingStore.py
+#==============================================================================================
+
+# Colonnes et types ; dst vaut -1 quand seule l'adresse de destination est connue
+COLUMNS = (
+    ("src", np.int32),
+    ("dst", np.int32),
+    ("seq", np.int32),
+    ("send_time", np.float64),         # instant simulé d'envoi (s), NaN si inconnu
+    ("rtt", np.float64),               # ms, NaN si perdu
+    ("lost", np.bool_),
+    ("size", np.int32),                # taille de la topologie (nombre de routeurs...)
+    ("rep", np.int32),                 # numéro de répétition
+)
+PERCENTILES = (50, 95, 99)
+
+
+class PingStore:
+    """
+    Résultats de ping stockés en colonnes NumPy, pour des millions d'échos.
+
+    Les échos sont ajoutés en bloc (`append`), depuis des PingRecord de
+    ping_burst ou des 4-uplets bruts de ns.pings(). `ingest` lit une liste
+    qui grandit et n'en traite que la partie nouvelle grâce à un curseur par
+    source. `stats` calcule par groupe (taille, répétition...) la moyenne, les
+    percentiles et le taux de perte sans boucle Python. `export` n'écrit que
+    les lignes pas encore exportées, en CSV ou en Parquet (pyarrow).
+    """
+
+    def __init__(self, capacity=1024):
+        self._columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in COLUMNS}
+        self._length = 0
+        self._cursors = {}             # source -> nombre de lignes déjà ingérées
+        self._exported = {}            # chemin -> nombre de lignes déjà exportées
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, name):
+        """Vue (sans copie) sur une colonne."""
+        return self._columns[name][:self._length]
+
+    def _reserve(self, extra):
+        needed = self._length + extra
+        capacity = len(self._columns["src"])
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._length] = column[:self._length]
+            self._columns[name] = grown
+
+    #------------------------------------------------------------------------------------------
+    # Ingestion
+
+    def append_columns(self, **values):
+        """Ajoute des lignes colonne par colonne ; les scalaires sont diffusés."""
+        count = max((np.size(v) for v in values.values() if np.ndim(v) > 0), default=1)
+        self._reserve(count)
+        start, end = self._length, self._length + count
+        defaults = {"dst": -1, "seq": -1, "send_time": np.nan, "rtt": np.nan,
+                    "lost": False, "size": 0, "rep": 0}
+        for name, _ in COLUMNS:
+            self._columns[name][start:end] = values.get(name, defaults.get(name, 0))
+        self._length = end
+        return count
+
+    def append(self, rows, size=0, rep=0, t0=np.nan, interval=1, loss_after=None):
+        """
+        Ajoute des PingRecord (src, dst, seq, rtt, lost) ou des 4-uplets
+        (src, adresse, taille, délai ms) de ns.pings(). Pour des PingRecord,
+        l'instant d'envoi vaut t0 + seq * interval. Un délai >= `loss_after`
+        ms est compté perdu. Retourne le nombre de lignes ajoutées.
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+        if hasattr(rows[0], "lost"):
+            src = np.array([row.src for row in rows])
+            dst = np.array([row.dst if isinstance(row.dst, int) else -1 for row in rows])
+            seq = np.array([row.seq for row in rows])
+            lost = np.array([row.lost for row in rows], dtype=bool)
+            rtt = np.array([np.nan if row.lost else row.rtt for row in rows], dtype=np.float64)
+            send_time = t0 + seq * interval
+        else:
+            src = np.array([row[0] for row in rows])
+            rtt = np.array([row[3] for row in rows], dtype=np.float64)
+            dst, seq, send_time = -1, -1, t0
+            lost = np.zeros(len(rows), dtype=bool)
+        if loss_after is not None:
+            lost = lost | (rtt >= loss_after)
+            rtt = np.where(lost, np.nan, rtt)
+        return self.append_columns(src=src, dst=dst, seq=seq, send_time=send_time,
+                                   rtt=rtt, lost=lost, size=size, rep=rep)
+
+    def ingest(self, rows, source="default", **kwargs):
+        """
+        Ajoute seulement les lignes de `rows` arrivées depuis le dernier appel
+        pour la même `source` (liste de résultats qui ne fait que grandir).
+        """
+        cursor = self._cursors.get(source, 0)
+        added = self.append(rows[cursor:], **kwargs)
+        self._cursors[source] = cursor + len(rows[cursor:])
+        return added
+
+    @classmethod
+    def concat(cls, stores):
+        merged = cls()
+        for store in stores:
+            merged.append_columns(**{name: store[name] for name, _ in COLUMNS})
+        return merged
+
+    #------------------------------------------------------------------------------------------
+    # Statistiques
+
+    def stats(self, by=("size",), skip_first=False, percentiles=PERCENTILES):
+        """
+        Statistiques par groupe des colonnes `by` : dict de tableaux avec les
+        clés de groupe, "count", "received", "loss", "mean" et "pN" (ms).
+        Avec `skip_first`, l'écho de séquence 0 de chaque rafale est ignoré.
+        """
+        keep = np.ones(self._length, dtype=bool)
+        if skip_first:
+            keep &= self["seq"] != 0
+        rtt = self["rtt"][keep]
+        lost = self["lost"][keep]
+        if not keep.any():
+            return {name: np.empty(0) for name in (*by, "count", "received", "loss", "mean",
+                                                   *(f"p{q}" for q in percentiles))}
+
+        # Chaque colonne de regroupement est codée, puis les codes sont
+        # combinés en une seule clé entière (plus rapide que np.unique(axis=0)).
+        levels, codes = zip(*(np.unique(self[name][keep], return_inverse=True) for name in by))
+        dims = tuple(len(level) for level in levels)
+        combined = np.ravel_multi_index(tuple(code.reshape(-1) for code in codes), dims)
+        present, group = np.unique(combined, return_inverse=True)
+        group = group.reshape(-1)
+        n_groups = len(present)
+        unique = np.column_stack([level[index] for level, index
+                                  in zip(levels, np.unravel_index(present, dims))])
+        count = np.bincount(group, minlength=n_groups)
+        received = ~lost & ~np.isnan(rtt)
+        n_received = np.bincount(group[received], minlength=n_groups)
+        total = np.bincount(group[received], weights=rtt[received], minlength=n_groups)
+
+        result = {name: unique[:, k] for k, name in enumerate(by)}
+        result["count"] = count
+        result["received"] = n_received
+        result["loss"] = 1 - n_received / count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result["mean"] = total / n_received
+        for q, values in zip(percentiles, _group_percentiles(group[received], rtt[received],
+                                                             n_groups, percentiles)):
+            result[f"p{q}"] = values
+        return result
+
+    #------------------------------------------------------------------------------------------
+    # Export
+
+    def export(self, path):
+        """
+        Écrit les lignes pas encore exportées vers `path` : ajout en fin de
+        fichier pour un CSV, nouveau fichier part-NNNNN.parquet dans le
+        répertoire `path` pour Parquet. Retourne le nombre de lignes écrites.
+        """
+        start = self._exported.get(path, 0)
+        if start >= self._length:
+            return 0
+        chunk = {name: self[name][start:] for name, _ in COLUMNS}
+        if path.endswith(".parquet"):
+            if pyarrow is None:
+                raise ImportError("l'export Parquet nécessite pyarrow (pip install pyarrow)")
+            os.makedirs(path, exist_ok=True)
+            part = len(glob.glob(os.path.join(path, "part-*.parquet")))
+            pyarrow.parquet.write_table(pyarrow.table(chunk),
+                                        os.path.join(path, f"part-{part:05d}.parquet"))
+        else:
+            new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+            with open(path, "a", newline="") as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(name for name, _ in COLUMNS)
+                writer.writerows(zip(*(chunk[name].tolist() for name, _ in COLUMNS)))
+        self._exported[path] = self._length
+        return self._length - start
+
+    @classmethod
+    def read_csv(cls, path, rep=None):
+        """Relit un export CSV ; `rep` remplace la colonne de répétition si donné."""
+        store = cls()
+        data = np.genfromtxt(path, delimiter=",", names=True, dtype=None, encoding="utf-8")
+        data = np.atleast_1d(data)
+        if len(data) == 0:
+            return store
+        columns = {name: data[name] for name, _ in COLUMNS}
+        columns["lost"] = np.char.lower(columns["lost"].astype(str)) == "true"
+        if rep is not None:
+            columns["rep"] = rep
+        store.append_columns(**columns)
+        return store
+
+
+def _group_percentiles(group, values, n_groups, percentiles):
+    """Percentiles (interpolation linéaire, comme np.percentile) de chaque groupe."""
+    order = np.lexsort((values, group))
+    values = values[order]
+    counts = np.bincount(group, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    present = counts > 0
+    for q in percentiles:
+        result = np.full(n_groups, np.nan)
+        pos = starts[present] + q / 100 * (counts[present] - 1)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.ceil(pos).astype(np.int64)
+        result[present] = values[lo] + (values[hi] - values[lo]) * (pos - lo)
+        yield result
@@ -0,0 +1,216 @@
+import glob
+import hashlib
+import json
+import os
+
+from Utils import get_node_roles
+
+#==============================================================================================
+# Class_ReplayCache.py
+#==============================================================================================
+#
+# OTNS est un simulateur à événements discrets : avec la même graine (-seed)
+# et la même suite de commandes aux mêmes instants simulés, il retrouve
+# exactement le même état. Plutôt que de refaire la formation du réseau à
+# chaque exécution, on enregistre le journal des commandes (add, node_cmd,
+# ping, delete, go) et on le rejoue à vitesse maximale. Les commandes
+# "save"/"load" d'OTNS ne conservent que la topologie, pas l'état Thread
+# (rôles, partitions), d'où le rejeu.
+#
+#   cache = ReplayCache("replay_cache")
+#   ns = cache.recorder(OTNS(otns_args=["-seed", str(SEED)]), spec, SEED)
+#   restored = ns.restore()              # [(étape, données), ...] déjà en cache
+#   for stage in range(len(restored), num_stages):
+#       ...                              # construction + convergence + mesure
+#       ns.checkpoint(stage, data)
+
+# Vitesse de simulation pendant le rejeu (le temps simulé ne dépend pas de la vitesse)
+REPLAY_SPEED = 1000000
+
+
+class ReplayError(RuntimeError):
+    """L'état rejoué diffère de l'état enregistré."""
+
+
+class ReplayCache:
+    """
+    Répertoire de journaux de rejeu, un fichier JSON par couple
+    (TopologySpec, graine). Chaque journal porte des points de reprise
+    ("checkpoints") numérotés par étape : position dans le journal, rôles de
+    tous les nœuds et données libres du script (mesures) à cette étape.
+    """
+
+    def __init__(self, directory="replay_cache"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(spec, seed):
+        return hashlib.sha1(f"{spec!r}|{seed}".encode()).hexdigest()[:16]
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key):
+        try:
+            with open(self.path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, key, entry):
+        tmp = self.path(key) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, self.path(key))
+
+    def discard(self, key):
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def entries(self, seed):
+        """Tous les journaux enregistrés avec la graine `seed`."""
+        for path in glob.glob(os.path.join(self.directory, "*.json")):
+            try:
+                with open(path) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if entry.get("seed") == seed:
+                yield os.path.splitext(os.path.basename(path))[0], entry
+
+    def best_prefix(self, own_key, seed, nodes, upto=None):
+        """
+        (clé, journal, étape) du point de reprise le plus avancé réutilisable
+        pour `nodes` : celui du journal `own_key` en priorité, sinon celui
+        d'une autre spec de même graine dont les nœuds des étapes 0..k sont
+        identiques (passage de N à N+1 routeurs).
+        """
+        best = (None, None, -1)
+        candidates = sorted(self.entries(seed), key=lambda item: item[0] != own_key)
+        for key, entry in candidates:
+            for stage in sorted((int(s) for s in entry["checkpoints"]), reverse=True):
+                if stage <= best[2] or (upto is not None and stage > upto):
+                    continue
+                if _stage_nodes(entry["nodes"], stage) == _stage_nodes(nodes, stage):
+                    best = (key, entry, stage)
+                    break
+        return best
+
+    def recorder(self, ns, spec, seed, nodes=None):
+        """Mandataire d'enregistrement placé devant une instance OTNS."""
+        if nodes is None:
+            from Topology import compile_topology
+            nodes = compile_topology(spec)
+        return ReplayRecorder(self, ns, spec, seed, nodes)
+
+
+def _stage_nodes(nodes, stage):
+    return [list(node) for node in nodes if node[5] <= stage]
+
+
+class ReplayRecorder:
+    """
+    Enregistre les commandes qui modifient la simulation et délègue tout le
+    reste à l'instance OTNS. `restore()` rejoue le plus long préfixe en
+    cache, `checkpoint()` enregistre un point de reprise.
+    """
+
+    def __init__(self, cache, ns, spec, seed, nodes):
+        self._cache = cache
+        self._target = ns
+        self._key = cache.key(spec, seed)
+        self._entry = {"spec": repr(spec), "seed": seed,
+                       "nodes": [list(node) for node in nodes],
+                       "log": [], "checkpoints": {}}
+
+    def _log(self, method, *args, **kwargs):
+        self._entry["log"].append([method, list(args), kwargs])
+
+    #------------------------------------------------------------------------------------------
+    # Rejeu et points de reprise
+
+    def restore(self, upto=None):
+        """
+        Rejoue le plus long préfixe en cache (étape <= `upto`) et retourne
+        [(étape, données), ...] pour les étapes rejouées ; [] si rien n'est en
+        cache. Lève ReplayError si les rôles obtenus diffèrent de ceux
+        enregistrés (le journal fautif est supprimé).
+        """
+        if self._entry["log"]:
+            raise ReplayError("restore() doit être appelé avant toute commande")
+        nodes = self._entry["nodes"]
+        key, entry, stage = self._cache.best_prefix(self._key, self._entry["seed"], nodes, upto)
+        if entry is None:
+            return []
+        checkpoint = entry["checkpoints"][str(stage)]
+        log = entry["log"][:checkpoint["log_index"]]
+        print(f"[Rejeu] {len(log)} commandes jusqu'à l'étape {stage} (journal {key})")
+
+        self._target.speed = REPLAY_SPEED
+        for method, args, kwargs in log:
+            getattr(self._target, method)(*args, **kwargs)
+        # Les réponses de ping rejouées ne concernent pas les mesures à venir
+        self._target.pings()
+
+        roles = {str(node_id): role for node_id, role in get_node_roles(self._target).items()}
+        if roles != checkpoint["roles"]:
+            self._cache.discard(key)
+            raise ReplayError(f"état rejoué différent de l'état enregistré à l'étape {stage} "
+                              f"(journal {key} supprimé)")
+
+        self._entry["log"] = [list(item) for item in log]
+        self._entry["checkpoints"] = {s: c for s, c in entry["checkpoints"].items()
+                                      if int(s) <= stage}
+        return [(int(s), c["data"]) for s, c in sorted(self._entry["checkpoints"].items(),
+                                                        key=lambda item: int(item[0]))]
+
+    def checkpoint(self, stage, data=None):
+        """Enregistre l'état courant (rôles) comme point de reprise de l'étape `stage`."""
+        roles = {str(node_id): role for node_id, role in get_node_roles(self._target).items()}
+        self._entry["checkpoints"][str(stage)] = {
+            "log_index": len(self._entry["log"]), "roles": roles, "data": data}
+        self._cache.save(self._key, self._entry)
+
+    #------------------------------------------------------------------------------------------
+    # Commandes enregistrées
+
+    def add(self, *args, **kwargs):
+        node_id = self._target.add(*args, **kwargs)
+        # L'id attribué est imposé au rejeu pour retrouver les mêmes nœuds
+        kwargs["id"] = node_id
+        self._log("add", *args, **kwargs)
+        return node_id
+
+    def delete(self, *node_ids):
+        self._target.delete(*node_ids)
+        self._log("delete", *node_ids)
+
+    def node_cmd(self, node_id, cmd):
+        output = self._target.node_cmd(node_id, cmd)
+        self._log("node_cmd", node_id, cmd)
+        return output
+
+    def ping(self, *args, **kwargs):
+        self._target.ping(*args, **kwargs)
+        self._log("ping", *args, **kwargs)
+
+    def go(self, duration, speed=None):
+        # Seul le temps simulé compte pour le rejeu, pas la vitesse
+        result = self._target.go(duration, speed=speed)
+        self._log("go", duration)
+        return result
+
+    #------------------------------------------------------------------------------------------
+    # Délégation du reste de l'API OTNS
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._target, name, value)
@@ -0,0 +1,170 @@
+import atexit
+import os
+import threading
+import time
+
+#==============================================================================================
+# Class_RunLog.py
+#==============================================================================================
+#
+#   from Class_RunLog import log_and_print
+#   log_and_print("Topologie générée.", log_file)      # même signature qu'avant
+#
+# log_to_file rouvrait le fichier en mode ajout à chaque message. Ici chaque
+# fichier a un seul descripteur par processus, ouvert en O_APPEND : un lot de
+# lignes est écrit en un seul os.write, si bien que plusieurs threads (même
+# RunLog) et plusieurs processus (un RunLog chacun) peuvent écrire dans le
+# même journal sans mélanger leurs lignes. fsync est fait au plus toutes les
+# `fsync_interval` secondes, puis à la fermeture.
+
+
+class RunLog:
+    """
+    Journal de run persistant : log() horodate la ligne et l'ajoute à une
+    liste bornée, un thread d'écriture la vide par lots.
+    """
+
+    def __init__(self, filename, fsync_interval=1.0, queue_size=10000):
+        self.filename = filename
+        self.fsync_interval = fsync_interval
+        self.queue_size = queue_size
+        self._fd = os.open(filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._cond = threading.Condition()
+        self._pending = []
+        self._waiters = []
+        self._stopping = False
+        self._closed = False
+        self._error = None
+        self._last_fsync = time.monotonic()
+        self._dirty = False            # Écrit mais pas encore fsync
+        self._ts_second = None
+        self._ts_prefix = ""
+        self._thread = threading.Thread(target=self._run, name="RunLog", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _prefix(self):
+        second = int(time.time())
+        if second != self._ts_second:
+            self._ts_second = second
+            self._ts_prefix = time.strftime("[%Y-%m-%d %H:%M:%S] ", time.localtime(second))
+        return self._ts_prefix
+
+    def log(self, message):
+        """Ajoute une ligne horodatée ; bloque seulement si la file est pleine."""
+        if self._error is not None:
+            raise self._error
+        if self._closed:
+            raise ValueError(f"journal fermé : {self.filename}")
+        with self._cond:
+            line = f"{self._prefix()}{message}\n"
+            while len(self._pending) >= self.queue_size and self._thread.is_alive():
+                self._cond.wait()
+            self._pending.append(line)
+            if len(self._pending) == 1:
+                self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._waiters and not self._stopping:
+                    if not self._dirty:
+                        self._cond.wait()
+                        continue
+                    # Lignes écrites mais pas encore synchronisées : réveil à l'échéance du fsync
+                    remaining = self.fsync_interval - (time.monotonic() - self._last_fsync)
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending, []
+                waiters, self._waiters = self._waiters, []
+                stopping = self._stopping
+                self._cond.notify_all()
+            try:
+                if batch:
+                    data = "".join(batch).encode("utf-8")
+                    while data:
+                        data = data[os.write(self._fd, data):]
+                    self._dirty = True
+                if self._dirty and (
+                        waiters or stopping
+                        or time.monotonic() - self._last_fsync >= self.fsync_interval):
+                    os.fsync(self._fd)
+                    self._dirty = False
+                    self._last_fsync = time.monotonic()
+            except OSError as e:
+                self._error = e
+            for done in waiters:
+                done.set()
+            if stopping:
+                return
+
+    def sync(self):
+        """Attend que toutes les lignes déjà journalisées soient écrites et synchronisées."""
+        if self._closed or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        with self._cond:
+            self._waiters.append(done)
+            self._cond.notify_all()
+        done.wait()
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        if self._closed:
+            return
+        try:
+            self.sync()
+        finally:
+            self._closed = True
+            if self._thread.is_alive():
+                with self._cond:
+                    self._stopping = True
+                    self._cond.notify_all()
+                self._thread.join()
+            atexit.unregister(self.close)
+            os.close(self._fd)
+
+
+#------------------------------------------------------------------------------------------
+# Façade : un RunLog par fichier et par processus
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def _after_fork():
+    # L'enfant n'hérite pas des threads d'écriture : il ouvrira ses propres journaux
+    global _logs_lock
+    _logs.clear()
+    _logs_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def run_log(filename="log_file.txt", **kwargs):
+    """RunLog partagé de ce processus pour `filename` (créé au premier appel)."""
+    path = os.path.abspath(filename)
+    with _logs_lock:
+        log = _logs.get(path)
+        if log is None or log._closed:
+            log = _logs[path] = RunLog(path, **kwargs)
+        return log
+
+
+def log_to_file(message, filename="log_file.txt"):
+    """Write a message to a log file with timestamp."""
+    try:
+        run_log(filename).log(message)
+        return True
+    except Exception as e:
+        print(f"ERREUR: Impossible d'écrire dans le fichier log {filename}: {e}")
+        return False
+
+
+def log_and_print(message, filename="log_file.txt"):
+    print(message)
+    log_to_file(message, filename)
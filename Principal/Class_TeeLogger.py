@@ -1,21 +1,41 @@
 import sys
+import time
+import atexit
 import datetime
+import re
+import threading
 
 #==============================================================================================
 # Class_TeeLogger.py
 #==============================================================================================
 
+class TeeLogger:
+    """
+    Recopie la sortie (pexpect ou sys.stdout) dans un fichier et, en option,
+    sur la console.
 
+    write() ne fait que découper, filtrer et horodater les lignes puis les
+    ajoute à une liste bornée (queue_size blocs) ; un thread d'écriture
+    récupère toute la liste d'un coup et l'écrit en un seul lot. Le
+    processus surveillé n'attend donc plus le disque ni le terminal, sauf si
+    la file est pleine (contre-pression plutôt que perte de lignes).
+
+    - filter_patterns : motifs regex des lignes à ne pas journaliser,
+      compilés une seule fois en une alternative ;
+    - timestamps : préfixe "[AAAA-MM-JJ HH:MM:SS] " (calculé une fois par seconde) ;
+    - console : recopie sur la console (False : fichier seulement) ;
+    - console_rate : nombre maximal de lignes affichées par seconde, le
+      surplus n'est écrit que dans le fichier et un résumé est affiché.
+    """
 
-class TeeLogger:
-    
     @staticmethod
     def generate_log_filename(prefix="otns_log"):
         """Generate a log filename with current timestamp: prefix_YYYYMMDD_HHMMSS.txt"""
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         return f"{prefix}_{timestamp}.txt"
-                                        
-    def __init__(self, file_obj=None, filename=None):
+
+    def __init__(self, file_obj=None, filename=None, filter_patterns=None, timestamps=False,
+                 console=True, console_rate=None, queue_size=4096):
         """
         Initialize TeeLogger with either an existing file object or a filename.
         If neither is provided, it creates a file with timestamp in the name.
@@ -28,27 +48,197 @@ class TeeLogger:
             if filename is None:
                 filename = self.generate_log_filename()
             self.filename = filename
-            self.file_obj = open(filename, "w")
+            self.file_obj = open(filename, "w", buffering=1 << 20)
             self.should_close = True
+
+        # Console capturée maintenant : sys.stdout peut ensuite être redirigé vers ce logger
+        self.console = None
+        if console:
+            self.console = sys.stdout if not isinstance(sys.stdout, TeeLogger) else sys.__stdout__
+        self.console_rate = console_rate
+        self.filter = re.compile("|".join(f"(?:{p})" for p in filter_patterns)) if filter_patterns else None
+        self.timestamps = timestamps
+
+        self._partial = ""             # Début de ligne en attente (filtrage : ligne entière requise)
+        self._at_line_start = True
+        self._ts_second = None
+        self._ts_prefix = ""
+        self._cond = threading.Condition()
+        self._pending = []             # Blocs en attente d'écriture, échangés d'un coup par le thread
+        self._waiters = []             # Événements des sync() en cours
+        self._stopping = False
+        self.queue_size = queue_size
+        self._error = None
+        self._closed = False
+        self._shown = 0                # Lignes affichées dans la seconde courante
+        self._hidden = 0               # Lignes non affichées (console_rate) depuis le dernier résumé
+        self._window = None
+
+        self._thread = threading.Thread(target=self._run, name="TeeLogger", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
         print(f"Logging to: {self.filename}")
-                                        
+
+    #------------------------------------------------------------------------------------------
+    # Côté producteur
+
+    def _prefix(self):
+        second = int(time.time())
+        if second != self._ts_second:
+            self._ts_second = second
+            self._ts_prefix = time.strftime("[%Y-%m-%d %H:%M:%S] ", time.localtime(second))
+        return self._ts_prefix
+
     def write(self, data):
         # Si data est en bytes, le décoder en utf-8 (avec remplacement en cas d'erreur)
         if isinstance(data, bytes):
             data = data.decode("utf-8", errors="replace")
-        sys.stdout.write(data)
-        self.file_obj.write(data)
-    
+        if not data:
+            return 0
+        if self._error is not None:
+            raise self._error
+        if self._closed:
+            raise ValueError("I/O operation on closed TeeLogger")
+
+        with self._cond:
+            if self.filter is None and not self.timestamps:
+                chunk = data
+            elif self.filter is None:
+                chunk = self._stamp(data)
+            else:
+                chunk = self._filter_lines(data)
+            if chunk:
+                while len(self._pending) >= self.queue_size and self._thread.is_alive():
+                    self._cond.wait()          # Contre-pression : le disque ne suit pas
+                self._pending.append(chunk)
+                if len(self._pending) == 1:
+                    self._cond.notify_all()
+        return len(data)
+
+    def _stamp(self, data):
+        """Horodate chaque début de ligne, y compris une ligne commencée dans un appel précédent."""
+        prefix = self._prefix()
+        lines = data.splitlines(keepends=True)
+        head = prefix if self._at_line_start else ""
+        self._at_line_start = data.endswith(("\n", "\r"))
+        return head + prefix.join(lines)
+
+    def _filter_lines(self, data):
+        """Lignes complètes non filtrées ; la fin de ligne incomplète attend l'appel suivant."""
+        lines = (self._partial + data).splitlines(keepends=True)
+        self._partial = ""
+        if lines and not lines[-1].endswith(("\n", "\r")):
+            self._partial = lines.pop()
+        search = self.filter.search
+        kept = [line for line in lines if not search(line)]
+        if not kept:
+            return ""
+        if self.timestamps:
+            prefix = self._prefix()
+            return prefix + prefix.join(kept)
+        return "".join(kept)
+
+    #------------------------------------------------------------------------------------------
+    # Thread d'écriture
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._waiters and not self._stopping:
+                    self._cond.wait()
+                batch, self._pending = self._pending, []
+                waiters, self._waiters = self._waiters, []
+                stopping = self._stopping
+                self._cond.notify_all()        # Réveille les producteurs bloqués (file pleine)
+            try:
+                if batch:
+                    text = "".join(batch)
+                    self.file_obj.write(text)
+                    if self.console is not None:
+                        self._mirror(text)
+                # Plus rien en attente (ou sync demandé) : on vide les tampons
+                if waiters or stopping or not self._pending:
+                    self.file_obj.flush()
+                    if self.console is not None:
+                        self._summarize(force=bool(waiters))
+                        self.console.flush()
+            except Exception as e:          # Remonté au prochain write()/flush()
+                self._error = e
+            for done in waiters:
+                done.set()
+            if stopping:
+                return
+
+    def _mirror(self, text):
+        if self.console_rate is None:
+            self.console.write(text)
+            return
+        self._summarize()
+        lines = text.splitlines(keepends=True)
+        room = max(0, self.console_rate - self._shown)
+        if room:
+            self.console.write("".join(lines[:room]))
+            self._shown += min(room, len(lines))
+        self._hidden += max(0, len(lines) - room)
+
+    def _summarize(self, force=False):
+        """Nouvelle seconde (ou vidage) : affiche le nombre de lignes masquées et remet le quota à zéro."""
+        second = int(time.monotonic())
+        if second == self._window and not force:
+            return
+        if self._hidden:
+            self.console.write(f"[TeeLogger] {self._hidden} lignes non affichées "
+                               f"(voir {self.filename})\n")
+            self._hidden = 0
+        if second != self._window:
+            self._window = second
+            self._shown = 0
+
+    #------------------------------------------------------------------------------------------
+    # Vidage et fermeture
+
     def flush(self):
-        sys.stdout.flush()
-        self.file_obj.flush()
-        
+        """
+        Non bloquant : pexpect l'appelle après chaque bloc lu, le thread
+        d'écriture vide lui-même les tampons dès que la file est vide.
+        """
+        if self._error is not None:
+            raise self._error
+
+    def sync(self):
+        """Attend que tout ce qui a été écrit soit sur disque (et sur la console)."""
+        if self._closed or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        with self._cond:
+            line, self._partial = self._partial, ""
+            if line and (self.filter is None or not self.filter.search(line)):
+                self._pending.append((self._prefix() if self.timestamps else "") + line)
+            self._waiters.append(done)
+            self._cond.notify_all()
+        done.wait()
+        if self._error is not None:
+            raise self._error
+
     def close(self):
-        """Close the file if we opened it"""
-        if self.should_close and self.file_obj is not None:
-            self.file_obj.close()
-            self.file_obj = None
-            
+        """Vide la file, arrête le thread d'écriture et ferme le fichier si on l'a ouvert."""
+        if self._closed:
+            return
+        try:
+            self.sync()
+        finally:
+            self._closed = True
+            if self._thread.is_alive():
+                with self._cond:
+                    self._stopping = True
+                    self._cond.notify_all()
+                self._thread.join()
+            atexit.unregister(self.close)
+            if self.should_close and self.file_obj is not None:
+                self.file_obj.close()
+                self.file_obj = None
+
     def __del__(self):
         """Ensure file is closed on garbage collection"""
-        self.close()
\ No newline at end of file
+        if getattr(self, "_thread", None) is not None:
+            self.close()
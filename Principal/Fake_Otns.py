@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Simulateur de remplacement d'OTNS (ou d'un shell ot-cli-ftd de conteneur)
+pour mesurer et tester la couche pilote hors ligne, sans otns ni docker.
+
+Il parle le même protocole : invite "> ", réponses terminées par "Done" ou
+"Error ...". Le réseau simulé est volontairement simple (rôles attribués
+après un délai simulé, RTT proportionnel au nombre de sauts estimé) et
+déterministe pour une graine donnée.
+
+Usage :
+    python Fake_Otns.py [--mode otns|ftd] [--latency MS] [--jitter MS]
+                        [--volume N] [--error-rate P] [--hang-rate P]
+                        [--loss-rate P] [--exit-after N] [--seed N] [--node-id N]
+
+Exemples :
+    python Benchmark_Send_Many.py 500 "python Fake_Otns.py --latency 1"
+    pexpect.spawn("python Fake_Otns.py --mode ftd --node-id 2")   # comme "docker attach ot-node2"
+"""
+import argparse
+import math
+import random
+import shlex
+import sys
+import threading
+import time
+
+PROMPT = "> "
+DEFAULT_RADIO_RANGE = 220
+PER_HOP_MS = 10.0                      # RTT simulé par saut
+LEADER_DELAY = 5                       # s simulées avant qu'un nœud démarré prenne un rôle
+ROUTER_DELAY = 15                      # s simulées avant qu'un routeur quitte le rôle "child"
+
+
+class FakeCli:
+    """Boucle commande / réponse commune aux deux modes."""
+
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.out = sys.stdout
+        self.lock = threading.Lock()
+        self.commands = 0
+
+    #------------------------------------------------------------------------------------------
+    # Sortie
+
+    def write(self, text):
+        with self.lock:
+            self.out.write(text)
+            self.out.flush()
+
+    def respond(self, lines=(), error=None):
+        """Écrit la réponse d'une commande, avec latence, bruit et fautes injectées."""
+        delay = self.args.latency + self.rng.uniform(-self.args.jitter, self.args.jitter)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if self.rng.random() < self.args.hang_rate:
+            # Réponse perdue : ni "Done" ni "Error", seulement l'invite
+            self.write(PROMPT)
+            return
+        if error is None and self.rng.random() < self.args.error_rate:
+            error = self.injected_error()
+        body = [f"[D] fake-otns: trace {k}" for k in range(self.args.volume)]
+        body.extend(lines)
+        body.append(error if error is not None else "Done")
+        self.write("\n".join(body) + "\n" + PROMPT)
+
+    def injected_error(self):
+        return "Error: injected fault"
+
+    #------------------------------------------------------------------------------------------
+    # Boucle principale
+
+    def run(self):
+        self.write(PROMPT)
+        for raw in sys.stdin:
+            line = raw.strip()
+            if not line:
+                self.write(PROMPT)
+                continue
+            self.commands += 1
+            if line == "exit":
+                self.write("Done\n")
+                return
+            try:
+                self.dispatch(line)
+            except (ValueError, IndexError, KeyError) as exc:
+                self.respond(error=f"Error: {exc or 'invalid command'}")
+            if self.args.exit_after and self.commands >= self.args.exit_after:
+                # Plantage simulé : fin du processus sans "exit"
+                sys.exit(3)
+
+    def dispatch(self, line):
+        raise NotImplementedError
+
+
+#==============================================================================================
+# Mode OTNS
+
+class FakeOtns(FakeCli):
+    """Interface en ligne de commande d'OTNS (simulation de plusieurs nœuds)."""
+
+    def __init__(self, args):
+        super().__init__(args)
+        self.nodes = {}                # id -> dict(type, x, y, rr, started, start_time)
+        self.next_id = 1
+        self.now = 0.0                 # temps simulé (s)
+        self.speed = 1
+        self.selected = None           # nœud sélectionné par "node N" sans commande
+        self.pending_pings = []        # (instant de réponse, src, adresse, taille, délai ms)
+        self.ping_results = []
+
+    #------------------------------------------------------------------------------------------
+    # Modèle de réseau
+
+    def leader(self):
+        """Premier nœud démarré (le plus petit id à égalité)."""
+        started = [i for i, n in self.nodes.items() if n["started"]]
+        return min(started, key=lambda i: (self.nodes[i]["start_time"], i)) if started else None
+
+    def role(self, node_id, leader=None):
+        node = self.nodes[node_id]
+        if not node["started"]:
+            return "disabled"
+        age = self.now - node["start_time"]
+        if age < LEADER_DELAY:
+            return "detached"
+        if node_id == (leader if leader is not None else self.leader()):
+            return "leader"
+        if node["type"] in ("router", "reed", "br") and age >= ROUTER_DELAY:
+            return "router"
+        return "child"
+
+    def rloc16(self, node_id):
+        return f"{(node_id << 10) & 0xfc00 if self.nodes[node_id]['type'] == 'router' else node_id:04x}"
+
+    def addresses(self, node_id):
+        return [f"fdde:ad00:beef:0:0:ff:fe00:{self.rloc16(node_id)}",
+                f"fdde:ad00:beef:0:{node_id:x}:{node_id * 7 % 0xffff:x}:1:{node_id:x}",
+                f"fe80:0:0:0:{node_id:x}:0:0:{node_id:x}"]
+
+    def hops(self, src, dst):
+        a, b = self.nodes[src], self.nodes[dst]
+        reach = min(a["rr"], b["rr"])
+        return max(1, math.ceil(math.hypot(a["x"] - b["x"], a["y"] - b["y"]) / reach))
+
+    def resolve(self, dst):
+        if dst.isdigit():
+            return int(dst), self.addresses(int(dst))[0]
+        for node_id in self.nodes:
+            if dst in self.addresses(node_id):
+                return node_id, dst
+        return None, dst
+
+    #------------------------------------------------------------------------------------------
+    # Commandes
+
+    def dispatch(self, line):
+        words = shlex.split(line)
+        cmd, rest = words[0], words[1:]
+        handler = getattr(self, f"cmd_{cmd}", None)
+        if handler is None:
+            if self.selected is not None:
+                return self.node_command(self.selected, line)
+            return self.respond(error=f"Error: unknown command: {cmd}")
+        return handler(rest)
+
+    def cmd_add(self, rest):
+        node_type = rest[0]
+        options = dict(zip(rest[1::2], rest[2::2]))
+        node_id = int(options.get("id", self.next_id))
+        if node_id in self.nodes:
+            return self.respond(error=f"Error: node {node_id} already exists")
+        self.nodes[node_id] = {"type": node_type,
+                               "x": float(options.get("x", 0)), "y": float(options.get("y", 0)),
+                               "rr": float(options.get("rr", DEFAULT_RADIO_RANGE)),
+                               "started": True, "start_time": self.now}
+        self.next_id = max(self.next_id, node_id + 1)
+        self.respond([str(node_id)])
+
+    def cmd_del(self, rest):
+        for word in rest:
+            if int(word) not in self.nodes:
+                return self.respond(error=f"Error: node {word} not found")
+            del self.nodes[int(word)]
+        self.respond()
+
+    def cmd_clear(self, rest):
+        self.nodes.clear()
+        self.selected = None
+        self.respond()
+
+    def cmd_nodes(self, rest):
+        leader = self.leader()
+        self.respond([f"id={i}\textaddr={i:016x}\trloc16={self.rloc16(i)}\tx={n['x']:.0f}\t"
+                      f"y={n['y']:.0f}\tstate={self.role(i, leader)}\tfailed=false"
+                      for i, n in sorted(self.nodes.items())])
+
+    def cmd_partitions(self, rest):
+        leader = self.leader()
+        attached = [i for i in sorted(self.nodes)
+                    if self.role(i, leader) in ("leader", "router", "child")]
+        lines = []
+        if attached:
+            lines.append(f"partition=4a5b6c7d\tnodes={','.join(map(str, attached))}")
+        self.respond(lines)
+
+    def cmd_speed(self, rest):
+        if rest:
+            self.speed = rest[0]
+            return self.respond()
+        self.respond([f"speed={self.speed}"])
+
+    def cmd_time(self, rest):
+        self.respond([str(int(self.now * 1e6))])
+
+    def cmd_go(self, rest):
+        duration = float(rest[0]) if rest and rest[0] != "ever" else 1.0
+        self.now += duration
+        due = [p for p in self.pending_pings if p[0] <= self.now]
+        self.pending_pings = [p for p in self.pending_pings if p[0] > self.now]
+        self.ping_results.extend(p[1:] for p in sorted(due))
+        self.respond()
+
+    def cmd_ping(self, rest):
+        src = int(rest[0])
+        options = dict(zip(rest[2::2], rest[3::2]))
+        count = int(options.get("count", 1))
+        interval = float(options.get("interval", 1))
+        datasize = int(options.get("datasize", 4))
+        dst_id, dst_addr = self.resolve(rest[1])
+        for k in range(count):
+            if dst_id is None or dst_id not in self.nodes or self.rng.random() < self.args.loss_rate:
+                continue
+            delay = self.hops(src, dst_id) * PER_HOP_MS + self.rng.uniform(0, self.args.jitter)
+            reply_at = self.now + k * interval + delay / 1000
+            self.pending_pings.append((reply_at, src, dst_addr, datasize, delay))
+        self.respond()
+
+    def cmd_pings(self, rest):
+        results, self.ping_results = self.ping_results, []
+        self.respond([f"node={src} dst={dst} datasize={size} delay={delay:.3f}ms"
+                      for src, dst, size, delay in results])
+
+    def cmd_node(self, rest):
+        node_id = int(rest[0])
+        if node_id not in self.nodes:
+            return self.respond(error=f"Error: node {node_id} not found")
+        if len(rest) == 1:
+            self.selected = node_id
+            return self.respond()
+        self.node_command(node_id, " ".join(rest[1:]))
+
+    def cmd_web(self, rest):
+        self.respond()
+
+    cmd_title = cmd_web
+
+    def node_command(self, node_id, cmd):
+        words = cmd.split()
+        if words[0] == "state":
+            return self.respond([self.role(node_id)])
+        if words[0] == "ipaddr":
+            return self.respond(self.addresses(node_id))
+        if words[0] == "rloc16":
+            return self.respond([self.rloc16(node_id)])
+        if words[:2] == ["thread", "start"]:
+            node = self.nodes[node_id]
+            if not node["started"]:
+                node["started"], node["start_time"] = True, self.now
+        elif words[:2] == ["thread", "stop"]:
+            self.nodes[node_id]["started"] = False
+        self.respond()
+
+
+#==============================================================================================
+# Mode ot-cli-ftd (shell d'un conteneur)
+
+class FakeFtd(FakeCli):
+    """Un seul nœud OpenThread, comme "docker attach ot-nodeN"."""
+
+    def __init__(self, args):
+        super().__init__(args)
+        self.node_id = args.node_id
+        self.reset()
+
+    def reset(self):
+        self.up = False
+        self.dataset = False
+        self.joined = False
+        self.started = False
+        self.commissioner = False
+
+    def injected_error(self):
+        return self.rng.choice(("Error 3: NoBufs", "Error 13: InvalidState", "Error 7: InvalidArgs"))
+
+    def later(self, seconds, line):
+        """Sortie non sollicitée, comme "Join success" ou les réponses de ping async."""
+        timer = threading.Timer(seconds, self.write, args=(line + "\n",))
+        timer.daemon = True
+        timer.start()
+
+    def dispatch(self, line):
+        words = line.split()
+        if words[0] == "factoryreset":
+            self.reset()
+            return self.write(PROMPT)
+        if words[:3] == ["dataset", "init", "new"] or words[:3] == ["dataset", "commit", "active"]:
+            self.dataset = True
+            return self.respond()
+        if words[:2] == ["ifconfig", "up"]:
+            self.up = True
+            return self.respond()
+        if words[:2] == ["thread", "start"]:
+            if not self.up:
+                return self.respond(error="Error 13: InvalidState")
+            self.started = True
+            return self.respond()
+        if words[0] == "state":
+            if not self.started:
+                state = "disabled"
+            elif self.node_id == 1 and self.dataset:
+                state = "leader"
+            elif self.joined or self.dataset:
+                state = "child"
+            else:
+                state = "detached"
+            return self.respond([state])
+        if words[0] == "eui64":
+            return self.respond([f"18b43000000{self.node_id:05x}"])
+        if words[0] == "extaddr":
+            return self.respond([f"{self.node_id:016x}"])
+        if words[0] == "rloc16":
+            return self.respond([f"{self.node_id << 10:04x}"])
+        if words[0] == "ipaddr":
+            return self.respond([f"fdde:ad00:beef:0:0:ff:fe00:{self.node_id << 10:04x}",
+                                 f"fe80:0:0:0:{self.node_id:x}:0:0:{self.node_id:x}"])
+        if words[:2] == ["commissioner", "start"]:
+            self.commissioner = True
+            self.later(0.05, "Commissioner: active")
+            return self.respond(["Commissioner: petitioning"])
+        if words[:3] == ["commissioner", "joiner", "add"]:
+            if not self.commissioner:
+                return self.respond(error="Error 13: InvalidState")
+            return self.respond()
+        if words[:2] == ["joiner", "start"]:
+            if not self.up:
+                return self.respond(error="Error 13: InvalidState")
+            self.joined = True
+            self.later(0.1, "Join success")
+            return self.respond()
+        if words[0] == "ping":
+            if words[1] == "async":
+                addr, count = words[2], int(words[4]) if len(words) > 4 else 1
+                for k in range(count):
+                    self.later(0.01 * (k + 1), f"16 bytes from {addr}: icmp_seq={k + 1} hlim=64 "
+                                               f"time={self.rng.randint(5, 40)}ms")
+                return self.respond()
+            addr = words[1]
+            return self.respond([f"16 bytes from {addr}: icmp_seq=1 hlim=64 "
+                                 f"time={self.rng.randint(5, 40)}ms",
+                                 "1 packets transmitted, 1 packets received. Packet loss = 0.0%."])
+        self.respond()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remplaçant local d'OTNS / ot-cli-ftd")
+    parser.add_argument("--mode", choices=("otns", "ftd"), default="otns")
+    parser.add_argument("--latency", type=float, default=0, help="latence de réponse (ms)")
+    parser.add_argument("--jitter", type=float, default=0, help="gigue (ms, uniforme ±)")
+    parser.add_argument("--volume", type=int, default=0, help="lignes de trace par réponse")
+    parser.add_argument("--error-rate", type=float, default=0, help="probabilité d'erreur injectée")
+    parser.add_argument("--hang-rate", type=float, default=0, help="probabilité de réponse perdue")
+    parser.add_argument("--loss-rate", type=float, default=0, help="probabilité de perte d'un écho")
+    parser.add_argument("--exit-after", type=int, default=0, help="plantage après N commandes")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--node-id", type=int, default=1, help="numéro du nœud (mode ftd)")
+    args, _ = parser.parse_known_args()
+
+    cli = FakeOtns(args) if args.mode == "otns" else FakeFtd(args)
+    try:
+        cli.run()
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+import collections
+import sys
+
+import numpy as np
+
+from Layout import DEFAULT_RADIO_RANGE, ROUTER_TYPES, unit_disk_edges
+from Ping import ping_burst
+from Class_PingStore import PingStore
+
+#==============================================================================================
+# LatencyMatrix.py : matrice RTT / perte de toutes les paires d'un ensemble de nœuds
+#==============================================================================================
+#
+#   nodes = build(ns, spec)
+#   wait_for_convergence(ns)
+#   m = latency_matrix(ns, node_ids(nodes, "router"), nodes=nodes, count=3)
+#   m.rtt[i, j], m.loss[i, j], m.hops[i, j]     # i, j : indices dans m.ids
+#
+# Les sondes sont groupées en vagues : dans une vague, aucun nœud n'apparaît
+# deux fois et les segments src -> dst de deux sondes (leurs relais sont le
+# long du segment) sont à plus de `separation` l'un de l'autre, pour qu'elles
+# ne se gênent pas sur le canal radio.
+
+LatencyMatrix = collections.namedtuple("LatencyMatrix", ["ids", "rtt", "loss", "hops", "store"])
+
+# Profil délai / perte d'une source vers une suite de cibles, trié par nombre de sauts
+LatencyProfile = collections.namedtuple("LatencyProfile",
+                                        ["targets", "hops", "distance", "rtt", "p95", "loss", "store"])
+
+
+#------------------------------------------------------------------------------------------
+# Choix des paires
+
+def all_pairs(ids):
+    """Toutes les paires ordonnées (src, dst), src != dst."""
+    return [(a, b) for a in ids for b in ids if a != b]
+
+
+def sample_pairs(ids, per_stratum, positions=None, strata=5, seed=0):
+    """
+    Échantillon stratifié de paires quand N² est trop grand : les paires sont
+    réparties en `strata` classes de distance (quantiles ; classes au hasard
+    sans positions) et au plus `per_stratum` paires sont tirées par classe.
+    """
+    ids = np.asarray(ids)
+    rng = np.random.default_rng(seed)
+    src, dst = np.nonzero(~np.eye(len(ids), dtype=bool))
+    if positions is None:
+        stratum = rng.integers(0, strata, len(src))
+    else:
+        xy = np.asarray([positions[i] for i in ids.tolist()], dtype=float)
+        distance = np.hypot(*(xy[src] - xy[dst]).T)
+        edges = np.quantile(distance, np.linspace(0, 1, strata + 1)[1:-1])
+        stratum = np.searchsorted(edges, distance, side="right")
+    chosen = []
+    for s in range(strata):
+        members = np.flatnonzero(stratum == s)
+        if len(members) > per_stratum:
+            members = rng.choice(members, per_stratum, replace=False)
+        chosen.extend(members.tolist())
+    chosen.sort()
+    return list(zip(ids[src[chosen]].tolist(), ids[dst[chosen]].tolist()))
+
+
+def _point_segment_distance(p, a, b):
+    """Distance du point `p` aux segments [a, b] (tableaux (M, 2))."""
+    ab = b - a
+    t = np.clip(np.einsum("ij,ij->i", p - a, ab) / np.maximum(np.einsum("ij,ij->i", ab, ab), 1e-12), 0, 1)
+    return np.hypot(*(a + t[:, None] * ab - p).T)
+
+
+def _cross(o, a, b):
+    return (a[..., 0] - o[..., 0]) * (b[..., 1] - o[..., 1]) - (a[..., 1] - o[..., 1]) * (b[..., 0] - o[..., 0])
+
+
+def segment_distances(a, b, c, d):
+    """Distance du segment [a, b] à chacun des segments [c, d] ((M, 2)) ; 0 s'ils se croisent."""
+    dist = np.minimum.reduce([_point_segment_distance(a, c, d), _point_segment_distance(b, c, d),
+                              _point_segment_distance(c, a[None, :], b[None, :]),
+                              _point_segment_distance(d, a[None, :], b[None, :])])
+    crossing = (_cross(a, b, c) * _cross(a, b, d) < 0) & (_cross(c, d, a) * _cross(c, d, b) < 0)
+    return np.where(crossing, 0.0, dist)
+
+
+def plan_waves(pairs, positions=None, separation=None, max_per_wave=None):
+    """
+    Répartit les paires en vagues sans interférence (coloration gloutonne) :
+    un nœud au plus une fois par vague et, si les positions sont connues,
+    segments src -> dst de deux sondes distants d'au moins `separation`.
+    Les paires les plus longues, les plus contraintes, sont placées d'abord.
+    """
+    pairs = list(pairs)
+    spatial = positions is not None and bool(separation)
+    if positions is not None:
+        pairs.sort(key=lambda pair: -np.hypot(*np.subtract(positions[pair[0]], positions[pair[1]])))
+    waves = []              # [paires, nœuds utilisés, débuts des segments, fins des segments]
+    for src, dst in pairs:
+        if spatial:
+            a = np.asarray(positions[src], dtype=float)
+            b = np.asarray(positions[dst], dtype=float)
+        for wave in waves:
+            wave_pairs, used, starts, ends = wave
+            if src in used or dst in used:
+                continue
+            if max_per_wave is not None and len(wave_pairs) >= max_per_wave:
+                continue
+            if spatial and (segment_distances(a, b, np.asarray(starts), np.asarray(ends))
+                            < separation).any():
+                continue
+            break
+        else:
+            wave = [[], set(), [], []]
+            waves.append(wave)
+        wave[0].append((src, dst))
+        wave[1].update((src, dst))
+        if spatial:
+            wave[2].append(a)
+            wave[3].append(b)
+    return [wave[0] for wave in waves]
+
+
+#------------------------------------------------------------------------------------------
+# Nombre de sauts
+
+def hop_matrix(ids, nodes):
+    """
+    Nombre de sauts estimé entre les nœuds `ids`, d'après le graphe de
+    connectivité prévu de `nodes` (PlannedNode) : seuls les routeurs relaient,
+    un end device passe par un routeur à portée. inf si aucun chemin.
+
+    Un parcours en largeur par extrémité, sur les listes d'adjacence (CSR) :
+    mémoire et temps en O(E x (N + liens)), sans matrice N x N.
+    """
+    nodes = list(nodes)
+    index = {node.id: k for k, node in enumerate(nodes)}
+    xy = np.array([(node.x, node.y) for node in nodes], dtype=float)
+    ranges = np.array([node.radio_range or DEFAULT_RADIO_RANGE for node in nodes], dtype=float)
+    is_router = np.array([node.type in ROUTER_TYPES for node in nodes])
+    n = len(nodes)
+
+    # Liens orientés utiles : deux end devices ne se relaient pas
+    i, j = unit_disk_edges(xy, ranges)
+    src = np.concatenate((i, j))
+    dst = np.concatenate((j, i))
+    keep = is_router[src] | is_router[dst]
+    src, dst = src[keep], dst[keep]
+    order = np.argsort(src, kind="stable")
+    neighbours = dst[order]
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(src, minlength=n))))
+
+    ends = np.array([index[node_id] for node_id in ids], dtype=np.int64)
+    result = np.full((len(ends), len(ends)), np.inf)
+    for k, start in enumerate(ends.tolist()):
+        dist = np.full(n, np.inf)
+        dist[start] = 0
+        frontier = np.array([start])
+        hops = 0
+        while len(frontier):
+            hops += 1
+            first, last = indptr[frontier], indptr[frontier + 1]
+            counts = last - first
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            reached = np.unique(neighbours[np.repeat(first, counts) + offsets])
+            reached = reached[np.isinf(dist[reached])]
+            dist[reached] = hops
+            frontier = reached[is_router[reached]]     # seuls les routeurs relaient
+        result[k] = dist[ends]
+    return result
+
+
+def hops_from_rtt(rtt):
+    """Estimation sans topologie : RTT rapporté au RTT des paires les plus proches (5e percentile)."""
+    finite = rtt[np.isfinite(rtt) & (rtt > 0)]
+    if len(finite) == 0:
+        return np.full(rtt.shape, np.nan)
+    one_hop = np.percentile(finite, 5)
+    return np.where(np.isfinite(rtt), np.maximum(1, np.round(rtt / one_hop)), np.nan)
+
+
+#------------------------------------------------------------------------------------------
+# Mesure
+
+def latency_matrix(proc_or_ns, ids, nodes=None, pairs=None, count=3, interval=1,
+                   separation=None, max_per_wave=None, sample=None, seed=0, size=0, rep=0):
+    """
+    Mesure la matrice N x N du RTT moyen (ms) et du taux de perte entre les
+    nœuds `ids`, vague par vague (une rafale ping_burst par vague).
+
+    `nodes` (PlannedNode de toute la topologie) donne les positions pour
+    l'espacement des vagues (`separation` vaut par défaut une portée
+    radio) et le nombre de sauts prévu ; sans `nodes`, il est estimé d'après
+    le RTT. `pairs` restreint les paires mesurées ; `sample` tire au plus
+    `sample` paires par classe de distance (sample_pairs). Les paires non
+    mesurées valent NaN. Tous les échos sont aussi conservés dans un PingStore.
+    """
+    ids = list(ids)
+    positions = None
+    if nodes is not None:
+        positions = {node.id: (node.x, node.y) for node in nodes}
+        if separation is None:
+            separation = max(node.radio_range or DEFAULT_RADIO_RANGE for node in nodes)
+    if pairs is None:
+        pairs = sample_pairs(ids, sample, positions, seed=seed) if sample else all_pairs(ids)
+
+    waves = plan_waves(pairs, positions, separation, max_per_wave)
+    print(f"[Matrice] {len(pairs)} paires en {len(waves)} vagues")
+    store = PingStore()
+    for wave in waves:
+        store.append(ping_burst(proc_or_ns, wave, count=count, interval=interval),
+                     size=size, rep=rep)
+
+    n = len(ids)
+    rtt = np.full((n, n), np.nan)
+    loss = np.full((n, n), np.nan)
+    np.fill_diagonal(rtt, 0)
+    np.fill_diagonal(loss, 0)
+    stats = store.stats(by=("src", "dst"))
+    if len(stats["count"]):
+        position = {node_id: k for k, node_id in enumerate(ids)}
+        row = np.array([position[s] for s in stats["src"].tolist()])
+        col = np.array([position[d] for d in stats["dst"].tolist()])
+        rtt[row, col] = stats["mean"]
+        loss[row, col] = stats["loss"]
+
+    hops = hop_matrix(ids, nodes) if nodes is not None else hops_from_rtt(rtt)
+    return LatencyMatrix(ids, rtt, loss, hops, store)
+
+
+def latency_profile(proc_or_ns, src, targets, nodes, count=10, interval=1, skip_first=True):
+    """
+    Délai et perte de `src` vers chaque nœud de `targets` en une seule
+    rafale (ping_burst de toutes les paires à la fois), sur un réseau déjà
+    formé : remplace la reconstruction routeur par routeur pour obtenir la
+    courbe délai / distance. Le nombre de sauts et la distance viennent du
+    graphe prévu de `nodes`. Avec `skip_first`, le premier écho de chaque
+    cible est ignoré, comme dans les scripts incrémentaux.
+    """
+    targets = list(targets)
+    store = PingStore()
+    store.append(ping_burst(proc_or_ns, [(src, dst) for dst in targets],
+                            count=count, interval=interval))
+    stats = store.stats(by=("dst",), skip_first=skip_first)
+
+    rtt = np.full(len(targets), np.nan)
+    p95 = np.full(len(targets), np.nan)
+    loss = np.ones(len(targets))
+    position = {node_id: k for k, node_id in enumerate(targets)}
+    index = np.array([position[d] for d in stats["dst"].tolist()], dtype=np.int64)
+    if len(index):
+        rtt[index] = stats["mean"]
+        p95[index] = stats["p95"]
+        loss[index] = stats["loss"]
+
+    hops = hop_matrix([src] + targets, nodes)[0, 1:]
+    xy = {node.id: (node.x, node.y) for node in nodes}
+    distance = np.array([np.hypot(xy[dst][0] - xy[src][0], xy[dst][1] - xy[src][1])
+                         for dst in targets])
+    order = np.lexsort((distance, hops))
+    return LatencyProfile([targets[k] for k in order.tolist()], hops[order], distance[order],
+                          rtt[order], p95[order], loss[order], store)
+
+
+def main():
+    """
+    Usage : python LatencyMatrix.py [nb_routeurs] [espacement] [portée]
+
+    Construit une ligne de routeurs, attend la convergence puis mesure la
+    matrice de tous les routeurs ; résultat dans latency_matrix.npz.
+    """
+    sys.path.insert(0, '/home/jbonn/ot-ns/pylibs')
+    from otns.cli import OTNS
+    from Topology import TopologySpec, Row, build, node_ids, wait_for_nodes
+
+    num_routers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    spacing = int(sys.argv[2]) if len(sys.argv) > 2 else 150
+    radio_range = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    ns = OTNS()
+    nodes = build(ns, TopologySpec(parts=(Row(y=500, num_routers=num_routers, delta_x=spacing,
+                                              start_x=spacing),), radio_range=radio_range))
+    wait_for_nodes(ns, nodes, speed=1000)
+    m = latency_matrix(ns, node_ids(nodes, "router"), nodes=nodes)
+    ns.close()
+
+    np.savez("latency_matrix.npz", ids=m.ids, rtt=m.rtt, loss=m.loss, hops=m.hops)
+    with np.printoptions(precision=1, suppress=True, linewidth=160):
+        print("RTT (ms) :\n", m.rtt)
+        print("Perte :\n", m.loss)
+        print("Sauts :\n", m.hops)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import collections
+
+import numpy as np
+
+#==============================================================================================
+# Layout.py : calcul vectorisé des coordonnées et graphe de connectivité prévu
+#==============================================================================================
+
+# Portée radio utilisée par OTNS quand un nœud est ajouté sans "rr"
+DEFAULT_RADIO_RANGE = 220
+
+# Types de nœuds capables de router (les autres doivent avoir un parent à portée)
+ROUTER_TYPES = ("router", "reed", "br")
+
+LayoutReport = collections.namedtuple(
+    "LayoutReport", ["num_links", "partitions", "router_partitions", "orphans"])
+
+
+class LayoutError(ValueError):
+    """Topologie dont le graphe de connectivité prévu est partitionné."""
+
+
+#------------------------------------------------------------------------------------------
+# Coordonnées
+
+def fed_offsets(groups):
+    """
+    Clés et décalages (K, 2) par rapport au routeur de tous les end devices
+    d'un tuple de groupes (FedCircle ou FedLine).
+    """
+    keys = []
+    offsets = []
+    for group in groups:
+        if hasattr(group, "positions"):
+            positions = np.asarray(group.positions, dtype=float)
+            angles = 2 * np.pi * positions / group.total
+            keys.extend(f"c{pos}" for pos in group.positions)
+            offsets.append(group.radius * np.column_stack((np.cos(angles), np.sin(angles))))
+        else:
+            j = np.arange(group.count, dtype=float)[:, None]
+            keys.extend(f"{group.name}{k}" for k in range(group.count))
+            offsets.append(np.asarray(group.offset, dtype=float) + j * np.asarray(group.step, dtype=float))
+    if not offsets:
+        return keys, np.empty((0, 2))
+    return keys, np.concatenate(offsets)
+
+
+def place(centers, offsets):
+    """
+    Coordonnées entières (R, K, 2) de K end devices autour de R routeurs.
+    Les valeurs sont tronquées vers zéro, comme int() dans les anciens scripts.
+    """
+    centers = np.asarray(centers, dtype=float)
+    return np.trunc(centers[:, None, :] + offsets[None, :, :]).astype(np.int64)
+
+
+#------------------------------------------------------------------------------------------
+# Graphe de connectivité (disque unité)
+
+# Demi-voisinage d'une cellule : chaque paire de cellules voisines n'est vue qu'une fois
+_HALF_NEIGHBOURS = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+
+def unit_disk_edges(xy, ranges):
+    """
+    Paires (i, j), i < j, de nœuds à portée l'un de l'autre : distance
+    strictement inférieure à la plus petite des deux portées radio. Une
+    distance égale à la portée est une liaison marginale dans OTNS.
+
+    Les nœuds sont rangés dans une grille de cellules de la taille de la plus
+    grande portée : seules les cellules voisines sont comparées.
+    """
+    xy = np.asarray(xy, dtype=float)
+    ranges = np.asarray(ranges, dtype=float)
+    n = len(xy)
+    if n < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    cell_size = ranges.max()
+    cells = np.floor((xy - xy.min(axis=0)) / cell_size).astype(np.int64)
+    width = cells[:, 1].max() + 3
+    keys = (cells[:, 0] + 1) * width + (cells[:, 1] + 1)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    all_i = []
+    all_j = []
+    for dx, dy in _HALF_NEIGHBOURS:
+        target = keys + dx * width + dy
+        start = np.searchsorted(sorted_keys, target, side="left")
+        end = np.searchsorted(sorted_keys, target, side="right")
+        counts = end - start
+        total = counts.sum()
+        if total == 0:
+            continue
+        i = np.repeat(np.arange(n), counts)
+        first = np.repeat(start - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+        j = order[first + np.arange(total)]
+        if (dx, dy) == (0, 0):
+            keep = i < j
+            i, j = i[keep], j[keep]
+        all_i.append(i)
+        all_j.append(j)
+
+    i = np.concatenate(all_i) if all_i else np.empty(0, dtype=np.int64)
+    j = np.concatenate(all_j) if all_j else np.empty(0, dtype=np.int64)
+    dist = np.hypot(*(xy[i] - xy[j]).T)
+    keep = dist < np.minimum(ranges[i], ranges[j])
+    i, j = i[keep], j[keep]
+    swap = i > j
+    i[swap], j[swap] = j[swap], i[swap]
+    return i, j
+
+
+def components(n, i, j):
+    """Numéro de composante connexe de chaque nœud (plus petit indice de la composante)."""
+    labels = np.arange(n)
+    while True:
+        new = labels.copy()
+        np.minimum.at(new, i, labels[j])
+        np.minimum.at(new, j, labels[i])
+        new = new[new]
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+
+def _groups(ids, labels):
+    groups = collections.defaultdict(list)
+    for node_id, label in zip(ids, labels.tolist()):
+        groups[label].append(node_id)
+    return sorted(groups.values(), key=len, reverse=True)
+
+
+#------------------------------------------------------------------------------------------
+# Vérification avant envoi à OTNS
+
+def check_layout(nodes, strict=False):
+    """
+    Vérifie le graphe de connectivité prévu d'une liste de PlannedNode :
+    réseau d'un seul tenant, routeurs reliés entre eux, et chaque end device
+    avec au moins un routeur à portée. Affiche un avertissement, ou lève
+    LayoutError si `strict`. Retourne un LayoutReport.
+    """
+    nodes = list(nodes)
+    if not nodes:
+        return LayoutReport(0, [], [], [])
+    ids = np.array([node.id for node in nodes])
+    xy = np.array([(node.x, node.y) for node in nodes], dtype=float)
+    ranges = np.array([node.radio_range or DEFAULT_RADIO_RANGE for node in nodes], dtype=float)
+    is_router = np.array([node.type in ROUTER_TYPES for node in nodes])
+
+    i, j = unit_disk_edges(xy, ranges)
+    # Deux end devices ne relaient pas le trafic l'un de l'autre
+    routed = is_router[i] | is_router[j]
+    i, j = i[routed], j[routed]
+    partitions = _groups(ids.tolist(), components(len(nodes), i, j))
+
+    both_routers = is_router[i] & is_router[j]
+    router_index = np.flatnonzero(is_router)
+    remap = np.full(len(nodes), -1)
+    remap[router_index] = np.arange(len(router_index))
+    router_labels = components(len(router_index), remap[i[both_routers]], remap[j[both_routers]])
+    router_partitions = _groups(ids[router_index].tolist(), router_labels)
+
+    has_router = np.zeros(len(nodes), dtype=bool)
+    has_router[i[is_router[j]]] = True
+    has_router[j[is_router[i]]] = True
+    orphans = ids[~is_router & ~has_router].tolist()
+
+    report = LayoutReport(len(i), partitions, router_partitions, orphans)
+    problems = []
+    if len(partitions) > 1:
+        problems.append(f"réseau partitionné en {len(partitions)} composantes "
+                        f"(tailles {[len(p) for p in partitions]})")
+    if len(router_partitions) > 1:
+        problems.append(f"routeurs hors de portée les uns des autres : {router_partitions}")
+    if orphans:
+        problems.append(f"end devices sans routeur à portée : {orphans}")
+    if problems:
+        message = "Topologie non connexe : " + " ; ".join(problems)
+        if strict:
+            raise LayoutError(message)
+        print(f"WARNING: {message}")
+    return report
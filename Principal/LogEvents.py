@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+import argparse
+import bisect
+import collections
+import json
+import mmap
+import re
+import sys
+
+from Utils import ANSI_ESCAPE_RE
+
+#==============================================================================================
+# LogEvents.py : événements typés extraits d'un log OTNS -log debug
+#==============================================================================================
+#
+# En direct (le TeeLogger reste le logfile principal, l'extracteur lit en parallèle) :
+#   extractor = EventExtractor(on_event=print)
+#   proc.logfile_read = extractor
+#   ...
+#   extractor.timelines.roles[3]        # [(temps simulé, rôle), ...] du nœud 3
+#
+# Sur un fichier (mmap, mémoire bornée quelle que soit la taille du log) :
+#   timelines = NodeTimelines(history=100)
+#   for event in scan_file("otns_log_20250101_120000.txt", kinds=("role",)):
+#       timelines.add(event)
+#
+# Les mots-clés (KEYWORDS) sont d'abord cherchés dans la projection du fichier
+# (mmap.find, par fenêtres de 64 Mo) ; seules les lignes qui en contiennent un
+# sont décodées et classées par les motifs (PATTERNS). Les
+# motifs reprennent les messages d'OpenThread ("Role detached -> child",
+# "Partition ID 0x...", "16 bytes from ...: icmp_seq=1 ... time=12ms") et le
+# préfixe de nœud / de temps simulé d'OTNS ; `patterns` permet d'en ajouter.
+
+# Un événement ; sim_time en s (dernier temps connu si la ligne n'en a pas),
+# offset : position de la ligne dans le fichier (ou dans le flux en direct)
+Event = collections.namedtuple("Event", ["kind", "node", "sim_time", "offset", "fields"])
+
+# (type, motif) : les groupes nommés deviennent les champs de l'événement
+PATTERNS = (
+    ("role", r"Role\s+(?P<old>\w+)\s*->\s*(?P<new>\w+)"),
+    ("role", r"role changed to (?P<new>\w+)"),
+    ("partition_merge", r"(?i)(?:partition\s+merge|merg\w*\s+partition|better\s*partition)"),
+    ("partition", r"Partition\s*I[dD]\s*[:=]?\s*(?P<partition>0x[0-9a-fA-F]+|\d+)"),
+    ("parent", r"(?i)(?:new\s+parent|parent\s+(?:changed|selected|is)|child\s+id\s+response)"
+               r".{0,80}?(?P<parent>0x[0-9a-fA-F]{4})\b"),
+    ("ping_recv", r"(?P<size>\d+) bytes from (?P<src>[0-9a-fA-F:]+?):\s.*?icmp_seq=(?P<seq>\d+)"
+                  r".*?time=(?P<rtt>[\d.]+)\s*ms"),
+    ("ping_send", r"(?i)(?:send(?:ing)?\s+echo\s+request|ping\s+request)"
+                  r"(?:.*?(?P<dst>[0-9a-fA-F]{1,4}(?::[0-9a-fA-F]{0,4}){2,7}))?"),
+)
+
+# Préfiltre par type : une ligne sans aucun de ces mots ne peut pas produire
+# l'événement (sous-chaînes communes aux variantes de casse : chaque mot coûte
+# un passage sur le fichier). Un type absent (motif ajouté) est cherché par sa
+# regex, plus lentement.
+KEYWORDS = {
+    "role": ("ole ",),
+    "partition_merge": ("artition",),
+    "partition": ("artition",),
+    "parent": ("arent", "hild I", "hild i"),
+    "ping_recv": ("bytes from",),
+    "ping_send": ("cho r", "cho R", "ing request", "ing Request"),
+}
+RELEASE_BYTES = 64 << 20                # Pages de la projection rendues au système par 64 Mo
+
+NODE_RE = re.compile(r"(?i)\bnode\s*[<=#]?\s*(\d+)")
+# Temps simulé : entier en µs en tête de ligne (après l'horodatage éventuel du TeeLogger)
+SIM_US_RE = re.compile(r"^(?:\[\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\] )?\s*(\d{4,})\b")
+# ... ou horloge OpenThread [hh:mm:ss.mmm]
+UPTIME_RE = re.compile(r"\[(\d+):(\d\d):(\d\d)\.(\d{3})\]")
+
+
+def _sim_time(line):
+    match = SIM_US_RE.match(line)
+    if match:
+        return int(match.group(1)) / 1e6
+    match = UPTIME_RE.search(line)
+    if match:
+        h, m, s, ms = map(int, match.groups())
+        return h * 3600 + m * 60 + s + ms / 1000
+    return None
+
+
+def _number(value):
+    if value is None:
+        return None
+    if value.startswith("0x"):
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+def _prefilter(patterns, keywords):
+    """Mots-clés littéraux des types retenus et regex des types qui n'en ont pas."""
+    words, regexes = [], []
+    for kind, pattern in patterns:
+        if kind in keywords:
+            words.extend(word for word in keywords[kind] if word not in words)
+        else:
+            regexes.append(pattern)
+    return words, regexes
+
+
+class Classifier:
+    """Transforme une ligne de log en événements ; garde le dernier temps simulé vu."""
+
+    def __init__(self, patterns=PATTERNS, kinds=None):
+        self.sources = [(kind, pattern) for kind, pattern in patterns
+                        if kinds is None or kind in kinds]
+        self.patterns = [(kind, re.compile(pattern)) for kind, pattern in self.sources]
+        self.sim_time = None
+
+    def classify(self, line, offset=0):
+        line = ANSI_ESCAPE_RE.sub("", line)
+        sim_time = _sim_time(line)
+        if sim_time is not None:
+            self.sim_time = sim_time
+        events = []
+        node = None
+        for kind, pattern in self.patterns:
+            match = pattern.search(line)
+            if match is None:
+                continue
+            if node is None:
+                found = NODE_RE.search(line)
+                node = int(found.group(1)) if found else -1
+            fields = {k: _number(v) for k, v in match.groupdict().items() if v is not None}
+            events.append(Event(kind, node, self.sim_time, offset, fields))
+            if kind == "role":
+                break                  # les deux formulations de changement de rôle s'excluent
+        return events
+
+
+class NodeTimelines:
+    """
+    Démultiplexage par nœud : les `history` derniers événements de chaque
+    nœud (deque bornée) et la chronologie complète des rôles, qui ne grandit
+    qu'à chaque changement de rôle.
+    """
+
+    def __init__(self, history=1000):
+        self.events = collections.defaultdict(lambda: collections.deque(maxlen=history))
+        self.roles = collections.defaultdict(list)         # nœud -> [(temps simulé, rôle)]
+        self.counts = collections.Counter()                # (nœud, type) -> nombre
+
+    def add(self, event):
+        self.events[event.node].append(event)
+        self.counts[event.node, event.kind] += 1
+        if event.kind == "role":
+            timeline = self.roles[event.node]
+            if not timeline or timeline[-1][1] != event.fields["new"]:
+                timeline.append((event.sim_time, event.fields["new"]))
+
+    def role_at(self, node, sim_time):
+        """Rôle du nœud au temps simulé donné, None avant le premier changement connu."""
+        timeline = self.roles.get(node, [])
+        times = [t if t is not None else float("-inf") for t, _ in timeline]
+        k = bisect.bisect_right(times, sim_time)
+        return timeline[k - 1][1] if k else None
+
+
+class EventExtractor:
+    """
+    Extracteur en direct, utilisable comme fichier (write/flush) : à brancher
+    sur proc.logfile_read, à côté du TeeLogger (proc.logfile). Les lignes incomplètes
+    attendent l'écriture suivante ; chaque événement est ajouté à
+    `timelines` puis passé à `on_event`.
+    """
+
+    def __init__(self, patterns=PATTERNS, kinds=None, on_event=None, history=1000,
+                 keywords=KEYWORDS):
+        self.classifier = Classifier(patterns, kinds)
+        words, regexes = _prefilter(self.classifier.sources, keywords)
+        self.keywords = re.compile("|".join([re.escape(word) for word in words] + regexes))
+        self.timelines = NodeTimelines(history)
+        self.on_event = on_event
+        self._partial = ""
+        self._offset = 0
+
+    def feed(self, data):
+        """Traite un morceau de sortie ; retourne les événements des lignes complétées."""
+        if isinstance(data, bytes):
+            data = data.decode("utf-8", errors="replace")
+        lines = (self._partial + data).split("\n")
+        self._partial = lines.pop()
+        events = []
+        for line in lines:
+            offset = self._offset
+            self._offset += len(line) + 1
+            if self.keywords.search(line):
+                events.extend(self.classifier.classify(line, offset))
+            else:                      # en direct, toute ligne horodatée fait avancer le temps
+                sim_time = _sim_time(line)
+                if sim_time is not None:
+                    self.classifier.sim_time = sim_time
+        for event in events:
+            self.timelines.add(event)
+            if self.on_event is not None:
+                self.on_event(event)
+        return events
+
+    def write(self, data):
+        self.feed(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def scan_file(path, patterns=PATTERNS, kinds=None, start=0, keywords=KEYWORDS):
+    """
+    Événements d'un fichier de log, à partir de l'octet `start`, sans le
+    charger : le fichier est projeté en mémoire (mmap), les mots-clés sont
+    cherchés directement dans la projection et seules les lignes qui en
+    contiennent un sont décodées. Les pages déjà parcourues sont rendues au
+    système au fil de la lecture. Le temps simulé est repris de la dernière
+    ligne classée qui en portait un.
+    """
+    classifier = Classifier(patterns, kinds)
+    words, regexes = _prefilter(classifier.sources, keywords)
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:                              # fichier vide
+            return
+        with mm:
+            # Prochaine occurrence de chaque mot-clé commençant avant `end`
+            finders = [lambda pos, end, word=word.encode(): mm.find(word, pos, end + len(word) - 1)
+                       for word in words]
+            finders += [lambda pos, end, rx=re.compile(regex.encode()): _regex_find(rx, mm, pos, end)
+                        for regex in regexes]
+            pos = start
+            released = start - start % mmap.PAGESIZE
+            # Fenêtres de RELEASE_BYTES : seules les pages de la fenêtre courante sont touchées
+            while pos < len(mm):
+                end = min(len(mm), pos + RELEASE_BYTES)
+                hits = [find(pos, end) for find in finders]
+                while True:
+                    pending = [hit for hit in hits if hit >= 0]
+                    if not pending:
+                        break
+                    hit = min(pending)
+                    line_start = mm.rfind(b"\n", 0, hit) + 1
+                    line_end = mm.find(b"\n", hit)
+                    if line_end < 0:
+                        line_end = len(mm)
+                    line = mm[line_start:line_end].decode("utf-8", errors="replace").rstrip("\r")
+                    yield from classifier.classify(line, line_start)
+                    pos = line_end + 1
+                    hits = [find(pos, end) if 0 <= h < pos else h for h, find in zip(hits, finders)]
+                pos = max(pos, end)
+                if hasattr(mm, "madvise"):
+                    upto = min(pos, len(mm)) - min(pos, len(mm)) % mmap.PAGESIZE
+                    if upto > released:
+                        mm.madvise(mmap.MADV_DONTNEED, released, upto - released)
+                        released = upto
+
+
+def _regex_find(regex, mm, pos, end):
+    match = regex.search(mm, pos, end + 4096)
+    return match.start() if match and match.start() < end else -1
+
+
+def role_timelines(path, history=0):
+    """Chronologie des rôles de chaque nœud d'un fichier de log : {nœud: [(temps, rôle)]}."""
+    timelines = NodeTimelines(history)
+    for event in scan_file(path, kinds=("role",)):
+        timelines.add(event)
+    return dict(timelines.roles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Événements d'un log OTNS -log debug")
+    parser.add_argument("path")
+    parser.add_argument("--kinds", default=None, help="types séparés par des virgules (role,partition,...)")
+    parser.add_argument("--node", type=int, default=None)
+    parser.add_argument("--timeline", action="store_true", help="chronologie des rôles par nœud")
+    args = parser.parse_args()
+
+    if args.timeline:
+        for node, timeline in sorted(role_timelines(args.path).items()):
+            if args.node is None or node == args.node:
+                print(f"node {node}: " + " -> ".join(f"{role}@{t}" for t, role in timeline))
+        return
+    kinds = tuple(args.kinds.split(",")) if args.kinds else None
+    for event in scan_file(args.path, kinds=kinds):
+        if args.node is None or event.node == args.node:
+            sys.stdout.write(json.dumps(event._asdict()) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 from Class_TeeLogger import TeeLogger
+from LogEvents import EventExtractor
 from Utils import send_cmd, get_node_ipaddr, ping_async, extract_node_id, wait_for_network_stability, check_node_state
 import os
 import pexpect
@@ -16,6 +17,9 @@ def main():
     print("Lancement d'OTNS en mode debug...")
     proc = pexpect.spawn('otns -log debug', encoding='utf-8', timeout=30)
     proc.logfile = tee_logger
+    # Changements de rôle, partitions, pings... extraits au fil de la sortie debug
+    extractor = EventExtractor()
+    proc.logfile_read = extractor
     proc.expect('>')
     
     # Création d'un réseau simple avec 3 routeurs et 2 end devices
@@ -127,6 +131,10 @@ def main():
     else:
         print("Impossible de réaliser le ping: adresses non disponibles")
     
+    print("\nChronologie des rôles (log debug) :")
+    for node_id, timeline in sorted(extractor.timelines.roles.items()):
+        print(f"  Nœud {node_id}: " + " -> ".join(f"{role} ({t}s)" for t, role in timeline))
+
     print("\nFin des tests. La session OTNS reste interactive.")
     print("Vous pouvez maintenant interagir avec le réseau.")
     
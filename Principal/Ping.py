@@ -0,0 +1,116 @@
+import collections
+import re
+
+from Utils import is_ns, advance_time, send_many
+from Class_NodeCache import NodeCache
+
+#==============================================================================================
+# Ping.py : rafales de ping planifiées en un seul aller-retour
+#==============================================================================================
+#
+# Au lieu de ns.ping(src, dst) suivi de ns.go(1) pour chaque écho, toutes les
+# rafales sont confiées aux nœuds ("ping ... count N interval I"), le temps
+# simulé avance une seule fois, puis les réponses sont relevées en bloc.
+#
+#   records = ping_burst(ns, [(src, dst)], count=10, interval=1)
+#   rtts = [r.rtt for r in records if not r.lost]
+
+# Un écho par enregistrement ; rtt en ms, None si perdu
+PingRecord = collections.namedtuple("PingRecord", ["src", "dst", "seq", "rtt", "lost"])
+# Réponse relevée mais attribuée à aucun écho de la rafale ; rtt en ms
+PingReply = collections.namedtuple("PingReply", ["src", "dst_addr", "datasize", "rtt"])
+
+# Ligne de "pings" : node=1 dst=fdde:ad00:beef:0:... datasize=4 delay=12.345ms
+PINGS_LINE_RE = re.compile(r"=(\d+)\s+\S+?=(\S+)\s+\S+?=(\d+)\s+\S+?=([\d.]+)ms")
+
+
+def _ping_cmd(src, dst, count, interval, datasize):
+    return f"ping {src} {dst} datasize {datasize} count {count} interval {interval}"
+
+
+def _pings(proc_or_ns):
+    """Réponses reçues depuis le dernier relevé : [(src, adresse dst, taille, délai ms), ...]."""
+    if is_ns(proc_or_ns):
+        return proc_or_ns.pings()
+    output = send_many(proc_or_ns, ["pings"])[0]
+    return [(int(m.group(1)), m.group(2), int(m.group(3)), float(m.group(4)))
+            for m in PINGS_LINE_RE.finditer(output)]
+
+
+def _dst_addrs(cache, dst):
+    if isinstance(dst, str):
+        return {dst}
+    return set(cache.get_ipaddrs(dst))
+
+
+def ping_burst(proc_or_ns, pairs, count=10, interval=1, datasize=4, wait=None, loss_after=None,
+               unmatched=None):
+    """
+    Envoie `count` échos toutes les `interval` secondes simulées pour chaque
+    paire (src, dst) de `pairs` (dst : id de nœud ou adresse), avance le temps
+    simulé une seule fois puis relève toutes les réponses.
+
+    Le temps simulé avance de (count - 1) * interval + wait secondes (wait
+    vaut interval par défaut, comme l'ancienne boucle ping + go(1)). Un écho
+    sans réponse dans ce délai, ou avec un délai >= `loss_after` ms, est
+    compté perdu.
+
+    OTNS ne donnant pas le numéro de séquence ICMP, les réponses d'une paire
+    sont numérotées dans leur ordre d'arrivée : un écho perdu au milieu de la
+    rafale décale les suivants vers les premières séquences, et une réponse
+    arrivée après la fin de la rafale n'est relevée qu'au relevé suivant.
+    Les réponses en attente sont donc relevées avant l'envoi, et ne sont
+    jamais comptées dans cette rafale. Ces réponses, comme celles d'une
+    source absente de `pairs` ou en surnombre, sont ajoutées à la liste
+    `unmatched` (PingReply) si elle est donnée, et ignorées sinon.
+
+    Retourne une liste de PingRecord, paire par paire, séquence par séquence.
+    """
+    pairs = list(pairs)
+    if wait is None:
+        wait = interval
+    stale = [PingReply(*reply) for reply in _pings(proc_or_ns)]
+    if unmatched is not None:
+        unmatched.extend(stale)
+    for src, dst in pairs:
+        if is_ns(proc_or_ns):
+            proc_or_ns.ping(src, dst, datasize=datasize, count=count, interval=interval)
+        else:
+            send_many(proc_or_ns, [_ping_cmd(src, dst, count, interval, datasize)])
+    advance_time(proc_or_ns, (count - 1) * interval + wait)
+
+    # Réponses regroupées par source ; une source pingant plusieurs
+    # destinations est départagée par les adresses de chaque destination.
+    by_src = collections.defaultdict(list)
+    for src, dst_addr, size, delay in _pings(proc_or_ns):
+        by_src[src].append((dst_addr, delay, size))
+    shared = collections.Counter(src for src, _ in pairs)
+
+    # Plus de "go" jusqu'à la fin du relevé : une destination commune à
+    # plusieurs paires n'est lue qu'une fois (cache de l'appelant s'il en a un)
+    cache = proc_or_ns if isinstance(proc_or_ns, NodeCache) else NodeCache(proc_or_ns)
+    records = []
+    used = set()
+    for src, dst in pairs:
+        replies = by_src[src]
+        if shared[src] > 1:
+            addrs = _dst_addrs(cache, dst)
+            matched = [k for k, reply in enumerate(replies) if reply[0] in addrs]
+        else:
+            matched = list(range(len(replies)))
+        matched = matched[:count]
+        used.update((src, k) for k in matched)
+        for seq in range(count):
+            rtt = replies[matched[seq]][1] if seq < len(matched) else None
+            lost = rtt is None or (loss_after is not None and rtt >= loss_after)
+            records.append(PingRecord(src, dst, seq, None if lost else rtt, lost))
+    if unmatched is not None:
+        unmatched.extend(PingReply(src, dst_addr, size, delay)
+                         for src, replies in by_src.items()
+                         for k, (dst_addr, delay, size) in enumerate(replies) if (src, k) not in used)
+    return records
+
+
+def received_rtts(records, skip_first=False):
+    """RTT (ms) des échos reçus, sans le premier de chaque paire si `skip_first`."""
+    return [r.rtt for r in records if not r.lost and not (skip_first and r.seq == 0)]
@@ -0,0 +1,86 @@
+import concurrent.futures
+import json
+import os
+import random
+import tempfile
+import time
+import traceback
+
+#==============================================================================================
+# Repetitions.py : répétitions indépendantes d'un scénario OTNS sur un pool de processus
+#==============================================================================================
+#
+# Chaque répétition tourne dans son propre processus, avec sa propre instance
+# OTNS : port d'écoute distinct (-listen), répertoire de travail distinct
+# (fichiers des nœuds) et graine distincte (-seed). Le scénario est une
+# fonction de module (donc sérialisable) appelée avec `otns_args`.
+#
+#   runs = run_repetitions(scenario_incremental_ping, repetitions=20, cpu_budget=8)
+#
+# Les échos de toutes les répétitions se regroupent ensuite dans un PingStore
+# (PingStore.concat, voir Scenario_1.py).
+
+
+def otns_args_for(port, seed):
+    """Arguments de ligne de commande OTNS isolant une répétition."""
+    return ["-listen", f"localhost:{port}", "-seed", str(seed)]
+
+
+def _run_repetition(scenario, index, seed, port, workdir):
+    """Exécutée dans un processus du pool : une répétition complète."""
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    start = time.perf_counter()
+    record = {"index": index, "seed": seed, "port": port, "workdir": workdir,
+              "delays": [], "error": None}
+    try:
+        record["delays"] = list(scenario(otns_args=otns_args_for(port, seed)))
+    except Exception:
+        record["error"] = traceback.format_exc()
+    record["elapsed"] = time.perf_counter() - start
+    return record
+
+
+def run_repetitions(scenario, repetitions, cpu_budget=None, cpus_per_run=1,
+                    base_seed=None, base_port=9000, port_stride=10, workdir_root=None):
+    """
+    Lance `repetitions` exécutions de `scenario` sur un pool de processus.
+
+    Le nombre de processus simultanés est `cpu_budget // cpus_per_run`
+    (cpu_budget vaut par défaut le nombre de cœurs). La répétition k reçoit la
+    graine base_seed + k (base_seed tiré au hasard si None) et le port
+    base_port + k * port_stride. Les enregistrements (index, graine, port,
+    répertoire, délais, durée, erreur éventuelle) sont retournés dans l'ordre
+    des répétitions et écrits dans repetitions.json, pour pouvoir rejouer une
+    répétition à l'identique.
+    """
+    cpu_budget = cpu_budget or os.cpu_count() or 1
+    workers = max(1, min(repetitions, cpu_budget // max(1, cpus_per_run)))
+    if base_seed is None:
+        base_seed = random.SystemRandom().randrange(1, 2 ** 31 - repetitions)
+    if workdir_root is None:
+        workdir_root = tempfile.mkdtemp(prefix="otns_runs_")
+    workdir_root = os.path.abspath(workdir_root)
+
+    print(f"[Répétitions] {repetitions} répétitions sur {workers} processus "
+          f"(graine de base {base_seed}, répertoire {workdir_root})")
+    records = [None] * repetitions
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_run_repetition, scenario, k, base_seed + k,
+                        base_port + k * port_stride,
+                        os.path.join(workdir_root, f"run_{k:03d}")): k
+            for k in range(repetitions)
+        }
+        for future in concurrent.futures.as_completed(futures):
+            record = future.result()
+            records[record["index"]] = record
+            status = "échec" if record["error"] else f"{len(record['delays'])} délais"
+            print(f"[Répétitions] #{record['index']} (graine {record['seed']}) : "
+                  f"{status} en {record['elapsed']:.1f} s")
+            if record["error"]:
+                print(record["error"])
+
+    with open(os.path.join(workdir_root, "repetitions.json"), "w") as f:
+        json.dump(records, f, indent=2)
+    return records
@@ -3,16 +3,25 @@ import sys
 sys.path.insert(0, '/home/jbonn/ot-ns/pylibs')
 
 from otns.cli import OTNS              # ou depuis otns.OTNS selon votre version
+from Utils import wait_for_convergence, ConvergenceTimeout
+from Repetitions import run_repetitions
+from Ping import ping_burst
+from Class_PingStore import PingStore
+import functools
+import os
 import time
 import logging
 import matplotlib.pyplot as plt
 
+PINGS_CSV = "pings.csv"                # Échos de chaque répétition (dans son répertoire de travail)
 
-def scenario_incremental_ping():
-    ns = OTNS()                        # Démarre OTNS en arrière-plan
 
+def scenario_incremental_ping(otns_args=None, web=True, store_path=None):
+    ns = OTNS(otns_args=otns_args)     # Démarre OTNS en arrière-plan
 
-    ns.web()                           # Lance la visualisation web (si disponible)
+
+    if web:
+        ns.web()                       # Lance la visualisation web (si disponible)
     ns.go(1, speed=4)                  # Avance le temps de simulation pour assurer le démarrage
 
     num_routers = 16                   # Nombre total de routeurs à générer
@@ -20,16 +29,16 @@ def scenario_incremental_ping():
     base_y = 500                       # Coordonnée Y pour les routeurs
     ping_delays = []                   # Liste pour stocker les délais de ping (en secondes)
     router_counts = []                 # Liste pour stocker le nombre de routeurs correspondant
+    convergence_times = []             # Temps simulé de convergence après chaque ajout (s)
+    store = PingStore()                # Tous les échos, par taille de topologie
 
     first_router_bottom_fed = None     # Source pour les tests ping (FED inférieur du premier routeur)
     last_router_top_fed = None         # Destination pour les tests ping (FED supérieur du routeur actuel)
 
 
     def ping(src: int, dst: int, duration: float):
-        while duration > 0:
-            ns.ping(src, dst)
-            ns.go(1)
-            duration -= 1
+        """Un écho par seconde simulée pendant `duration` s, en une seule rafale."""
+        return ping_burst(ns, [(src, dst)], count=int(duration), interval=1)
             
 
     for i in range(num_routers):
@@ -60,15 +69,22 @@ def scenario_incremental_ping():
         ns.node_cmd(fed_top_id, "thread start")
         ns.node_cmd(fed_bottom_id, "thread start")
 
-                                       # Avance le temps de simulation pour permettre au réseau de converger
-        ns.go(duration=40, speed=1000)
+                                       # Avance le temps de simulation jusqu'à la convergence du réseau
+        try:
+            convergence_times.append(wait_for_convergence(ns, speed=1000))
+        except ConvergenceTimeout as e:
+                                       # Étape non convergée : notée None, sans ping
+            print(f"WARNING: {e}")
+            convergence_times.append(None)
+            continue
 
 
                                        # Effectue un test ping: 1 ping avec un intervalle de 1 seconde
         print (f"ici on ping({first_router_bottom_fed}, {last_router_top_fed}, 10)")
-        ping(first_router_bottom_fed, last_router_top_fed, 10)
-        TabPing = ns.pings()
-        print(f"Résultats des pings: {TabPing}")
+        records = ping(first_router_bottom_fed, last_router_top_fed, 10)
+        store.append(records, size=i + 1)
+        TabPing = [record for record in records if not record.lost]
+        print(f"Résultats des pings: {records}")
 
                                        # Récupère les résultats de ping mis à jour
         
@@ -78,13 +94,16 @@ def scenario_incremental_ping():
             continue
         else:
             ItemPing = TabPing[new_count - 1]
-            node, Adresse, ect, delay = ItemPing
+            delay = ItemPing.rtt
             print(f"ItemPing: {ItemPing}")
             print(f"Le délai est: {delay}")
 
             router_counts.append(i + 1)
             ping_delays.append(delay)
+    print(f"Temps de convergence (s simulées) : {convergence_times}")
     ns.close()  
+    if store_path is not None:
+        store.export(store_path)
 
     return ping_delays
    
@@ -92,45 +111,38 @@ def scenario_incremental_ping():
     
 
 if __name__ == "__main__":
-    Tab2Delays = []
-    for i in range(2):
-        ping_delays = scenario_incremental_ping()
-        if ping_delays:
-            Tab2Delays.append(ping_delays)
-        time.sleep(5)
+                                       # Usage : python Scenario_1.py [répétitions] [budget_cpu]
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    cpu_budget = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+                                       # Répétitions indépendantes réparties sur un pool de processus,
+                                       # chacune avec sa propre instance OTNS (ports, répertoire, graine)
+    runs = run_repetitions(functools.partial(scenario_incremental_ping, web=False,
+                                             store_path=PINGS_CSV),
+                           repetitions, cpu_budget=cpu_budget)
+    store = PingStore.concat(PingStore.read_csv(os.path.join(run["workdir"], PINGS_CSV), rep=run["index"])
+                             for run in runs
+                             if run["error"] is None and os.path.exists(os.path.join(run["workdir"], PINGS_CSV)))
     
                                        # Vérifie si nous avons des résultats de simulation
-    if not Tab2Delays:
+    if len(store) == 0:
         print("Aucune donnée de simulation n'a été collectée")
         exit(1)
         
-                                       # Trouve la longueur maximale de tout tableau de délais
-    max_length = max(len(delays) for delays in Tab2Delays)
-    
-                                       # Crée une liste pour stocker les moyennes
-    average_delays = [0] * max_length
-    count_per_index = [0] * max_length
-    
-                                       # Additionne toutes les valeurs à chaque index
-    for delays in Tab2Delays:
-        for i, delay in enumerate(delays):
-            average_delays[i] += delay
-            count_per_index[i] += 1
-    
-                                       # Divise par le nombre pour obtenir la moyenne
-    for i in range(max_length):
-        if count_per_index[i] > 0:
-            average_delays[i] = average_delays[i] / count_per_index[i]
-        else:
-            average_delays[i] = 0      # Gère le cas où aucune donnée n'existe pour cet index
+                                       # Statistiques par nombre de routeurs, toutes répétitions confondues
+                                       # (le premier écho de chaque rafale est exclu)
+    stats = store.stats(by=("size",), skip_first=True)
+    average_delays = stats["mean"]
     
                                        # Affiche les délais moyens pour chaque nombre de routeurs
-    for i, avg_delay in enumerate(average_delays, start=1):
-        print(f"Délai moyen pour {i} routeurs: {avg_delay:.2f} secondes")
+    for size, avg_delay, p50, p95, p99, loss in zip(stats["size"], stats["mean"], stats["p50"],
+                                                    stats["p95"], stats["p99"], stats["loss"]):
+        print(f"Délai moyen pour {size} routeurs: {avg_delay:.2f} ms "
+              f"(p50 {p50:.2f}, p95 {p95:.2f}, p99 {p99:.2f}, perte {loss:.1%})")
     
                                        # Trace le graphique: axe x = nombre de routeurs, axe y = délai moyen de ping
     plt.figure(figsize=(8, 5))
-    router_counts = list(range(1, len(average_delays) + 1))
+    router_counts = stats["size"]
     plt.plot(router_counts, average_delays, marker='o', linestyle='-', color='blue')
     plt.xlabel("Nombre de Routeurs")
     plt.ylabel("Délai Moyen de Ping (secondes)")
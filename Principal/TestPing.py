@@ -31,12 +31,18 @@ sys.path.insert(0, '/home/jbonn/ot-ns/pylibs')
 from otns.cli import OTNS
 from otns.cli.errors import OTNSExitedError
 
+from Class_JsonlLog import JsonlLog
+from Ping import ping_burst
+
 RADIO_RANGE = 460
+LOG_DIR = "testping_logs"              # Journal JSONL tourné et compressé (boucle sans fin)
 
 
 def main():
     logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.DEBUG)
 
+    # Pas de NodeCache : C1 est supprimé puis réinséré à chaque tour et le
+    # temps avance entre deux lectures de sa RLOC, qui serait toujours à relire.
     ns = OTNS()
     ns.set_title("Ping Example")
     ns.set_network_info(version="Latest", commit="main", real=False)
@@ -44,6 +50,9 @@ def main():
 
     ns.speed = 4
 
+    # Segments de 64 Mo, les 50 derniers conservés : au plus ~3,2 Go avant compression
+    log = JsonlLog(LOG_DIR, prefix="testping", max_bytes=64 << 20, keep=50)
+
     def add_node(*args, **kwargs):
         return ns.add(*args, **kwargs, radio_range=RADIO_RANGE)
 
@@ -75,33 +84,44 @@ def main():
     C2 = add_node("router", 800, 700)
     C3 = add_node("router", 1100, 700)
 
-    def ping(src: int, dst: int, duration: float):
-        while duration > 0:
-            ns.ping(src, dst)
-            ns.go(1)
-            duration -= 1
-            resultats = ns.pings()
-            print(f"Résultats des pings: {resultats}")
-
-    while True:
-        ping(1, 11, 30)
-        c1_rlocs = ns.get_ipaddrs(C1, "rloc")
-        if c1_rlocs:
-            for i in range(4):
-                for id in (6, 7, 8, 9, 16, 17, 18, 19, C2, C3):
-                    ns.ping(id, c1_rlocs[0])
-
-        ns.delete(C1)
-        ping(1, 11, 30)
-        ns.delete(C2)
-        ns.delete(C3)
-        ns.go(130)
-
-
-        add_node("router", 950, 300, id=C1)
-        add_node("router", 800, 700, id=C2)
-        add_node("router", 1100, 700, id=C3)
-        ns.go(10)
+    def ping(pairs, duration: float):
+        # Un écho par seconde simulée, planifiés en une seule rafale ; les
+        # réponses d'une rafale précédente arrivées en retard sont à part
+        unmatched = []
+        interval = 1
+        start = ns.time / 1e6          # Écho n envoyé à start + n * interval (temps simulé)
+        resultats = ping_burst(ns, pairs, count=int(duration), interval=interval, unmatched=unmatched)
+        print(f"Résultats des pings: {resultats}")
+        for record in resultats:
+            log.log("ping", sim_time=start + record.seq * interval, **record._asdict())
+        sim_time = ns.time / 1e6
+        for reply in unmatched:
+            log.log("ping_unmatched", sim_time=sim_time, **reply._asdict())
+
+    try:
+        while True:
+            ping([(1, 11)], 30)
+            c1_rlocs = ns.get_ipaddrs(C1, "rloc")
+            if c1_rlocs:
+                # Trafic vers C1 avant sa suppression : 4 échos par routeur
+                ping([(id, c1_rlocs[0]) for id in (6, 7, 8, 9, 16, 17, 18, 19, C2, C3)], 4)
+
+            ns.delete(C1)
+            log.log("delete", sim_time=ns.time / 1e6, nodes=[C1])
+            ping([(1, 11)], 30)
+            ns.delete(C2)
+            ns.delete(C3)
+            log.log("delete", sim_time=ns.time / 1e6, nodes=[C2, C3])
+            ns.go(130)
+
+
+            add_node("router", 950, 300, id=C1)
+            add_node("router", 800, 700, id=C2)
+            add_node("router", 1100, 700, id=C3)
+            log.log("add", sim_time=ns.time / 1e6, nodes=[C1, C2, C3])
+            ns.go(10)
+    finally:
+        log.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,194 @@
+import collections
+import functools
+
+import numpy as np
+
+from Layout import check_layout, fed_offsets, place
+from Utils import ConvergenceTimeout, is_ns, send_many, wait_for_convergence
+
+#==============================================================================================
+# Topology.py : description déclarative des topologies et création en un seul lot
+#==============================================================================================
+#
+# Une topologie est décrite par des tuples nommés (donc hachables) : elle peut
+# servir de clé de cache, et sa compilation en liste de nœuds est mémorisée.
+#
+#   spec = TopologySpec(parts=(row(row_y=250, num_routers=3, fed_total=6, delta_x=150,
+#                                  pattern_first=[2, 4], pattern_last=[2, 4],
+#                                  marks=CORNER_MARKS),),
+#                       radio_range=150)
+#   nodes = build(proc_or_ns, spec)
+#   labels = labelled(nodes)       # {"left_bottom": 2, "right_top": 9, ...}
+
+# End devices placés sur un cercle autour du routeur : angle = 2π * position / total
+FedCircle = collections.namedtuple("FedCircle", ["positions", "total", "radius"],
+                                   defaults=(6, 150))
+
+# `count` end devices alignés : (x, y) = routeur + offset + j * step
+FedLine = collections.namedtuple("FedLine", ["count", "offset", "step", "name"],
+                                 defaults=((0, 0), "l"))
+
+# Ligne de routeurs ; first/intermediate/last sont des tuples de groupes d'end devices
+Row = collections.namedtuple("Row", ["y", "num_routers", "delta_x", "start_x",
+                                     "first", "intermediate", "last", "marks"],
+                             defaults=(500, (), (), (), ()))
+
+# Grille de routeurs (lignes x colonnes), chaque routeur avec les mêmes end devices
+Grid = collections.namedtuple("Grid", ["num_routers", "spacing", "margin", "feds", "marks"],
+                              defaults=(0, (), ()))
+
+TopologySpec = collections.namedtuple("TopologySpec",
+                                      ["parts", "radio_range", "router_type", "fed_type"],
+                                      defaults=(None, "router", "fed"))
+
+PlannedNode = collections.namedtuple("PlannedNode",
+                                     ["id", "type", "x", "y", "label", "group", "radio_range"])
+
+# Marques (index du routeur, clé, étiquette) : la clé "cN" désigne l'end device
+# en position N sur le cercle, "<nom>N" le N-ième d'un FedLine, None le routeur.
+# Un index négatif compte depuis la fin de la ligne.
+CORNER_MARKS = ((0, "c4", "left_bottom"), (-1, "c2", "right_top"))
+
+
+def _circle(pattern, fed_total, radius=150):
+    if pattern is None:
+        return ()
+    return (FedCircle(tuple(pattern), fed_total, radius),)
+
+
+def row(row_y, num_routers, fed_total, delta_x, start_x=500, pattern_first=None,
+        pattern_intermediate=None, pattern_last=None, marks=()):
+    """
+    Ligne de routeurs avec end devices sur un cercle, avec les mêmes
+    paramètres que l'ancien generate_row_topology (None = pas d'end devices).
+    """
+    return Row(y=row_y, num_routers=num_routers, delta_x=delta_x, start_x=start_x,
+               first=_circle(pattern_first, fed_total),
+               intermediate=_circle(pattern_intermediate, fed_total),
+               last=_circle(pattern_last, fed_total),
+               marks=tuple(marks))
+
+
+def _router_centers(part):
+    """Coordonnées (R, 2) de tous les routeurs d'une partie."""
+    i = np.arange(part.num_routers)
+    if isinstance(part, Row):
+        return np.column_stack((part.start_x + i * part.delta_x, np.full(len(i), part.y)))
+    n_cols = max(1, int(np.sqrt(part.num_routers)))
+    return part.margin + np.column_stack((i % n_cols, i // n_cols)) * part.spacing
+
+
+def _fed_groups(part, i):
+    if isinstance(part, Grid):
+        return part.feds
+    if i == 0:
+        return part.first
+    if i == part.num_routers - 1:
+        return part.last
+    return part.intermediate
+
+
+def _fed_positions(part, centers):
+    """
+    [(clé, x, y), ...] des end devices de chaque routeur. Les routeurs qui
+    partagent les mêmes groupes sont placés ensemble en une opération NumPy.
+    """
+    groups = [_fed_groups(part, i) for i in range(len(centers))]
+    positions = [None] * len(centers)
+    for fed_groups in set(groups):
+        selected = [i for i, g in enumerate(groups) if g == fed_groups]
+        keys, offsets = fed_offsets(fed_groups)
+        for i, coords in zip(selected, place(centers[selected], offsets).tolist()):
+            positions[i] = [(key, x, y) for key, (x, y) in zip(keys, coords)]
+    return positions
+
+
+@functools.lru_cache(maxsize=64)
+def compile_topology(spec, first_id=1):
+    """
+    Compile une TopologySpec en tuple ordonné de PlannedNode : chaque routeur
+    suivi de ses end devices, avec des ids attribués à partir de `first_id`.
+    Le champ `group` numérote les routeurs dans toute la topologie.
+    """
+    nodes = []
+    next_id = first_id
+    group = 0
+    for p, part in enumerate(spec.parts):
+        centers = _router_centers(part)
+        fed_positions = _fed_positions(part, centers)
+        marks = {(index % (len(centers) or 1), key): label for index, key, label in part.marks}
+        for i, (center_x, center_y) in enumerate(np.trunc(centers).astype(np.int64).tolist()):
+            label = marks.get((i, None), f"{p}:r{i}")
+            nodes.append(PlannedNode(next_id, spec.router_type, center_x, center_y,
+                                     label, group, spec.radio_range))
+            next_id += 1
+            for key, fed_x, fed_y in fed_positions[i]:
+                label = marks.get((i, key), f"{p}:r{i}:{key}")
+                nodes.append(PlannedNode(next_id, spec.fed_type, fed_x, fed_y,
+                                         label, group, spec.radio_range))
+                next_id += 1
+            group += 1
+    return tuple(nodes)
+
+
+def add_commands(nodes):
+    """Commandes CLI OTNS "add" avec id imposé, dans l'ordre de création."""
+    cmds = []
+    for node in nodes:
+        cmd = f"add {node.type} x {node.x} y {node.y} id {node.id}"
+        if node.radio_range is not None:
+            cmd += f" rr {node.radio_range}"
+        cmds.append(cmd)
+    return cmds
+
+
+def build(proc_or_ns, spec_or_nodes, first_id=1, check=True, strict=False):
+    """
+    Crée les nœuds d'une TopologySpec (ou d'une liste de PlannedNode déjà
+    compilée) et les retourne. Les ids étant imposés, aucune réponse n'a
+    besoin d'être analysée : avec un processus pexpect, tout part en un lot.
+
+    Avant tout envoi, le graphe de connectivité prévu est vérifié
+    (check_layout) : avertissement, ou LayoutError si `strict`.
+    """
+    if isinstance(spec_or_nodes, TopologySpec):
+        nodes = compile_topology(spec_or_nodes, first_id)
+    else:
+        nodes = tuple(spec_or_nodes)
+    if check:
+        check_layout(nodes, strict=strict)
+    if is_ns(proc_or_ns):
+        for node in nodes:
+            kwargs = {} if node.radio_range is None else {"radio_range": node.radio_range}
+            proc_or_ns.add(node.type, x=node.x, y=node.y, id=node.id, **kwargs)
+    else:
+        send_many(proc_or_ns, add_commands(nodes))
+    return nodes
+
+
+def wait_for_nodes(proc_or_ns, nodes, **kwargs):
+    """
+    wait_for_convergence sur les nœuds créés `nodes` (PlannedNode), d'après
+    leur graphe de connectivité prévu : les end devices sans routeur à
+    portée ne sont pas attendus, et chaque composante de routeurs a son
+    leader. Retourne le temps de convergence, ou None si le délai est
+    dépassé (message affiché) : l'étape est alors à noter non convergée.
+    """
+    report = check_layout(nodes)
+    orphans = set(report.orphans)
+    try:
+        return wait_for_convergence(proc_or_ns, [node.id for node in nodes if node.id not in orphans],
+                                    leaders=max(1, len(report.router_partitions)), **kwargs)
+    except ConvergenceTimeout as e:
+        print(f"WARNING: {e}")
+        return None
+
+
+def labelled(nodes):
+    """{étiquette: id} pour tous les nœuds."""
+    return {node.label: node.id for node in nodes}
+
+
+def node_ids(nodes, node_type=None):
+    """Ids des nœuds, éventuellement filtrés par type."""
+    return [node.id for node in nodes if node_type is None or node.type == node_type]
@@ -1,61 +1,170 @@
 #Class initialization
 
+import collections
 import time
 import re
 import pexpect
 import sys
 
+#==============================================================================================
+# Découpage des réponses de la CLI OpenThread / OTNS
+
+# Une réponse se termine par "Done", par "Error N: ..." (ot-cli) / "Error: ..."
+# (OTNS), ou à défaut par le prompt seul sur sa ligne. Un '>' au milieu d'une
+# ligne de sortie ne termine donc jamais la réponse.
+DONE_PATTERN = r"(?:^|\n)[> ]*Done\r?\n"
+ERROR_PATTERN = r"(?:^|\n)[> ]*Error(?: (\d+))?: ?([^\r\n]*)\r?\n"
+PROMPT_PATTERN = r"\n> ?$"
+ANSI_ESCAPE_RE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+
+
+class CommandError(Exception):
+    """Réponse "Error" de la CLI, ou absence de réponse complète."""
+
+    def __init__(self, cmd, message, code=None, lines=None):
+        self.cmd = cmd
+        self.message = message
+        self.code = code
+        self.lines = lines or []
+        if code is None:
+            super().__init__(f"'{cmd}' : {message}")
+        else:
+            super().__init__(f"'{cmd}' : Error {code}: {message}")
+
+
+class CommandTimeout(CommandError):
+    """Aucun terminateur reçu avant l'expiration du délai."""
+
+
+class CommandResult(str):
+    """
+    Sortie d'une commande réussie. Se comporte comme la chaîne des lignes de
+    réponse (sans écho, prompt ni "Done") pour rester compatible avec les
+    anciens appelants de send_cmd.
+    """
+
+    def __new__(cls, cmd, lines):
+        result = super().__new__(cls, "\n".join(lines))
+        result.cmd = cmd
+        result.lines = lines
+        return result
+
+
+def _patterns(proc, allow_prompt):
+    """Motifs de fin de réponse, en bytes si le processus n'a pas d'encodage."""
+    patterns = [DONE_PATTERN, ERROR_PATTERN]
+    if allow_prompt:
+        patterns.append(PROMPT_PATTERN)
+    if getattr(proc, "encoding", None) is None:
+        patterns = [p.encode() for p in patterns]
+    return patterns
+
+
+def _to_text(data):
+    if isinstance(data, bytes):
+        return data.decode("utf-8", errors="replace")
+    return data
+
+
+def _clean_response(raw, pending):
+    """
+    Nettoie le texte brut reçu pour une commande : supprime les séquences ANSI,
+    les prompts '> ' et l'écho des commandes encore en vol (`pending`).
+    """
+    pending = list(pending)
+    lines = []
+    for line in ANSI_ESCAPE_RE.sub("", raw).replace("\r", "").split("\n"):
+        line = line.lstrip("> ").rstrip()
+        if not line:
+            continue
+        if line in pending:
+            pending.remove(line)
+            continue
+        lines.append(line)
+    return lines
+
+
+def read_response(proc, cmd, timeout=5, pending=None, allow_prompt=True):
+    """
+    Lit la réponse à `cmd` et rend la main dès qu'elle est complète.
+    Retourne un CommandResult, ou lève CommandError ("Error ...") /
+    CommandTimeout (pas de terminateur dans le délai).
+
+    `pending` liste les commandes dont l'écho peut encore apparaître (par
+    défaut `cmd` seule). En pipeline, le prompt ne sert pas de terminateur
+    (`allow_prompt=False`) car il réapparaît entre deux réponses.
+    """
+    try:
+        index = proc.expect(_patterns(proc, allow_prompt), timeout=timeout)
+    except pexpect.TIMEOUT:
+        raise CommandTimeout(cmd, f"pas de réponse après {timeout} s",
+                             lines=_clean_response(_to_text(proc.before), [cmd])) from None
+    lines = _clean_response(_to_text(proc.before), pending or [cmd])
+    if index == 1:
+        code = proc.match.group(1)
+        raise CommandError(cmd, _to_text(proc.match.group(2)).strip(),
+                           code=int(code) if code else None, lines=lines)
+    return CommandResult(cmd, lines)
+
 #==============================================================================================
 # Envoi de commandes à OTNS
 
-def send_cmd(proc, cmd, timeout=5, retries=2):
+def send_cmd(proc, cmd, timeout=5):
     """
-    Send a command to the OTNS process and return the output.
-    Includes retry logic and better error handling.
+    Envoie une commande à la CLI et retourne sa sortie (CommandResult).
+    Lève CommandError si la CLI répond "Error ...", CommandTimeout si la
+    réponse n'est pas complète dans le délai.
     """
-    for attempt in range(retries + 1):
+    print(f"\n[Envoi] {cmd}")
+    sys.stdout.flush()
+    proc.delaybeforesend = None  # pexpect attend 50 ms avant chaque envoi par défaut
+    proc.sendline(cmd)
+    output = read_response(proc, cmd, timeout=timeout)
+    print(f"[Réponse] {output}")
+    sys.stdout.flush()
+    return output
+
+#==============================================================================================
+# Envoi de commandes en lot (pipeline)
+
+def send_many(proc, cmds, timeout=5, window=64, check=True):
+    """
+    Envoie un lot de commandes à OTNS sans attendre la réponse de chacune,
+    puis redécoupe la sortie entrelacée en une réponse par commande grâce aux
+    terminateurs "Done"/"Error".
+
+    Au plus `window` commandes sont en vol à la fois : le PTY a un tampon
+    d'entrée limité et OTNS doit pouvoir vider sa sortie pendant l'envoi.
+    Retourne la liste des CommandResult, dans l'ordre des commandes. Toutes
+    les réponses sont lues avant de lever la première CommandError ; avec
+    `check=False`, les erreurs sont laissées dans la liste à la place du
+    résultat.
+    """
+    cmds = list(cmds)
+    outputs = []
+    sent = 0
+    proc.delaybeforesend = None  # pas d'attente de 50 ms avant chaque tranche
+    while len(outputs) < len(cmds):
+        # Une seule écriture par tranche, et seulement quand la fenêtre est à
+        # moitié vide : moins d'appels système qu'une ligne par commande.
+        chunk = cmds[sent:len(outputs) + window]
+        if chunk and sent - len(outputs) <= window // 2:
+            proc.send("".join(cmd + "\n" for cmd in chunk))
+            sent += len(chunk)
+        cmd = cmds[len(outputs)]
         try:
-            print(f"\n[Envoi] aaaaaaaaaaaaa : {cmd}")
-            sys.stdout.flush()
-            proc.sendline(cmd)
-            print("dexuieme ligne")
-            sys.stdout.flush()
-            proc.expect('>', timeout=timeout)
-            print("troisieme ligne")
-            sys.stdout.flush()
-            output = proc.before.strip()
-            print("[Réponse] bbbbbbbbbbbbb : " + output)
-            sys.stdout.flush()
-            
-            # Debug: afficher la longueur et le contenu brut de proc.before
-            print("DEBUG: proc.before repr =", repr(proc.before))
-            sys.stdout.flush()
-            
-            # If we're expecting a node ID, add extra validation
-            if cmd.startswith("add"):
-                time.sleep(0.5)  # Give a bit more time for the complete response
-                proc.sendline("")  # Send an empty line to get a fresh prompt
-                proc.expect('>', timeout=1)
-                additional_output = proc.before.strip()
-                print("DEBUG: additional_output =", additional_output)
-                sys.stdout.flush()
-                if additional_output and re.search(r'\d+', additional_output):
-                    output += "\n" + additional_output
-            
-            return output
-        except pexpect.TIMEOUT:
-            print(f"Command timed out (attempt {attempt+1}/{retries+1}): {cmd}")
-            sys.stdout.flush()
-            if attempt == retries:
-                return "TIMEOUT"
-        except pexpect.EOF:
-            print(f"EOF encountered while executing command: {cmd}")
-            sys.stdout.flush()
-            return "EOF"
-        except Exception as e:
-            print(f"Error executing command '{cmd}': {e}")
-            sys.stdout.flush()
-            return "ERROR"
+            outputs.append(read_response(proc, cmd, timeout=timeout,
+                                         pending=cmds[len(outputs):sent],
+                                         allow_prompt=False))
+        except CommandTimeout:
+            raise
+        except CommandError as e:
+            outputs.append(e)
+    if check:
+        for output in outputs:
+            if isinstance(output, CommandError):
+                raise output
+    return outputs
 
 #==============================================================================================
 # Récupération de l'adresse IP d'un noeud
@@ -63,7 +172,7 @@ def send_cmd(proc, cmd, timeout=5, retries=2):
 def get_node_ipaddr(proc, node_id):
     """Récupère l'adresse IPv6 d'un nœud"""
     send_cmd(proc, f"node {node_id}")
-    output = send_cmd(proc, "ipaddr", wait=1)
+    output = send_cmd(proc, "ipaddr")
     addrs = re.findall(r"([0-9a-fA-F:]{20,})", output)
     if addrs:
         for addr in addrs:
@@ -161,13 +270,188 @@ def get_simulation_speed(proc):
         return int(match.group(1))
     return 1  # Retourne la valeur par défaut si non trouvée
 
+#==============================================================================================
+# Détection de la convergence du réseau
+
+ATTACHED_ROLES = ("leader", "router", "child")
+
+
+class ConvergenceTimeout(Exception):
+    """Le réseau n'a pas convergé avant la fin du délai (temps simulé)."""
+
+    def __init__(self, timeout, roles):
+        self.timeout = timeout
+        self.roles = roles
+        detached = sorted(n for n, role in roles.items() if role not in ATTACHED_ROLES)
+        super().__init__(f"pas de convergence après {timeout} s simulées "
+                         f"(nœuds non attachés : {detached})")
+
+
+def is_ns(proc_or_ns):
+    """Vrai pour une instance otns.cli.OTNS, faux pour un processus pexpect."""
+    return hasattr(proc_or_ns, "nodes") and hasattr(proc_or_ns, "go")
+
+
+def parse_nodes(output):
+    """
+    Analyse la sortie de la commande OTNS "nodes" (une ligne "clé=valeur"
+    séparées par des tabulations par nœud) en {id: {clé: valeur}}.
+    """
+    nodes = {}
+    for line in output.splitlines():
+        fields = dict(kv.split("=", 1) for kv in line.split() if "=" in kv)
+        if "id" in fields:
+            nodes[int(fields["id"])] = fields
+    return nodes
+
+
+def get_node_roles(proc_or_ns):
+    """Rôle de tous les nœuds, en une seule commande "nodes"."""
+    if is_ns(proc_or_ns):
+        nodes = proc_or_ns.nodes()
+    else:
+        nodes = parse_nodes(send_many(proc_or_ns, ["nodes"])[0])
+    return {node_id: info.get("state", "unknown") for node_id, info in nodes.items()}
+
+
+def advance_time(proc_or_ns, seconds):
+    """Avance le temps simulé de `seconds` secondes."""
+    if is_ns(proc_or_ns):
+        proc_or_ns.go(seconds)
+    else:
+        send_many(proc_or_ns, [f"go {seconds}"], timeout=max(5, seconds * 2))
+
+
+def sim_time(proc_or_ns):
+    """Temps simulé courant d'OTNS (s), lu par la commande "time" (µs)."""
+    if is_ns(proc_or_ns):
+        return proc_or_ns.time / 1e6
+    return int(send_many(proc_or_ns, ["time"])[0].lines[0]) / 1e6
+
+
+def wait_for_convergence(proc_or_ns, node_ids=None, step=1, window=10, timeout=300, speed=None,
+                         leaders=1):
+    """
+    Avance la simulation par pas de `step` secondes simulées jusqu'à ce que
+    tous les nœuds (ou seulement `node_ids`) soient attachés, avec `leaders`
+    leaders (un par partition attendue) et des rôles inchangés pendant
+    `window` secondes.
+
+    Fonctionne avec un processus pexpect comme avec une instance OTNS.
+    Retourne le temps simulé (s) au bout duquel l'état final a été atteint,
+    ou lève ConvergenceTimeout après `timeout` secondes simulées. Les durées
+    sont lues sur l'horloge d'OTNS et non comptées en pas : un OTNS lancé
+    sans -autogo=false avance aussi entre deux pas.
+    """
+    if speed is not None:
+        if is_ns(proc_or_ns):
+            proc_or_ns.speed = speed
+        else:
+            send_many(proc_or_ns, [f"speed {speed}"])
+
+    start = sim_time(proc_or_ns)
+    stable_since = None
+    last_roles = None
+    while True:
+        roles = get_node_roles(proc_or_ns)
+        elapsed = round(sim_time(proc_or_ns) - start, 6)
+        if node_ids is not None:
+            roles = {n: roles.get(n, "unknown") for n in node_ids}
+        converged = (bool(roles)
+                     and all(role in ATTACHED_ROLES for role in roles.values())
+                     and list(roles.values()).count("leader") == leaders)
+        if not converged:
+            stable_since = None
+        elif roles != last_roles or stable_since is None:
+            stable_since = elapsed
+        elif elapsed - stable_since >= window:
+            print(f"[Réseau] Convergence atteinte en {stable_since} s simulées "
+                  f"({len(roles)} nœuds)")
+            return stable_since
+        if elapsed >= timeout:
+            raise ConvergenceTimeout(timeout, roles)
+        last_roles = roles
+        advance_time(proc_or_ns, step)
+
+#==============================================================================================
+# Photographie de tout le réseau en quelques commandes
+
+NodeRow = collections.namedtuple(
+    "NodeRow", ["id", "type", "x", "y", "role", "partition", "rloc16", "addrs"])
+
+
+def parse_partitions(output):
+    """Analyse la sortie de "partitions" ("partition=XXXX nodes=1,2,3") en {id nœud: partition}."""
+    partition_of = {}
+    for line in output.splitlines():
+        fields = dict(kv.split("=", 1) for kv in line.split() if "=" in kv)
+        if "partition" in fields and fields.get("nodes"):
+            for node_id in fields["nodes"].split(","):
+                partition_of[int(node_id)] = fields["partition"]
+    return partition_of
+
+
+def snapshot(proc_or_ns, addresses=True, plan=None):
+    """
+    Retourne l'état de tous les nœuds sous forme d'une liste de NodeRow triée
+    par id : type, coordonnées, rôle, partition, RLOC16 et adresses IPv6.
+
+    Les listes globales "nodes" et "partitions" donnent l'essentiel ; seules
+    les adresses demandent une commande par nœud, envoyées en un seul lot.
+    "nodes" ne donnant pas le type du nœud (router, fed, ...), il vient du
+    plan d'ajout `plan` (PlannedNode de Topology.build) ; None sans plan ou
+    pour un nœud absent du plan.
+    """
+    type_of = {node.id: node.type for node in plan} if plan is not None else {}
+    if is_ns(proc_or_ns):
+        nodes = proc_or_ns.nodes()
+        partition_of = {n: par for par, members in proc_or_ns.partitions().items()
+                        for n in members}
+        addrs = ({n: list(proc_or_ns.get_ipaddrs(n)) for n in nodes}
+                 if addresses else {})
+    else:
+        nodes_out, partitions_out = send_many(proc_or_ns, ["nodes", "partitions"])
+        nodes = parse_nodes(nodes_out)
+        partition_of = parse_partitions(partitions_out)
+        addrs = {}
+        if addresses:
+            ids = sorted(nodes)
+            outputs = send_many(proc_or_ns, [f'node {n} "ipaddr"' for n in ids], check=False)
+            for node_id, output in zip(ids, outputs):
+                if not isinstance(output, CommandError):
+                    addrs[node_id] = re.findall(r"([0-9a-fA-F:]{20,})", output)
+
+    rows = []
+    for node_id in sorted(nodes):
+        info = nodes[node_id]
+        rows.append(NodeRow(
+            id=node_id,
+            type=type_of.get(node_id),
+            x=int(info["x"]) if "x" in info else None,
+            y=int(info["y"]) if "y" in info else None,
+            role=info.get("state", "unknown"),
+            partition=partition_of.get(node_id),
+            rloc16=info.get("rloc16"),
+            addrs=addrs.get(node_id, []),
+        ))
+    return rows
+
+
+def print_snapshot(rows):
+    """Affiche une photographie du réseau sous forme de tableau."""
+    print(f"{'id':>4} {'type':<7} {'x':>6} {'y':>6} {'rôle':<9} {'partition':<10} {'rloc16':<6} adresses")
+    for row in rows:
+        print(f"{row.id:>4} {row.type or '-':<7} {row.x if row.x is not None else '-':>6} "
+              f"{row.y if row.y is not None else '-':>6} {row.role:<9} {row.partition or '-':<10} "
+              f"{row.rloc16 if row.rloc16 is not None else '-':<6} {' '.join(map(str, row.addrs))}")
+
 #==============================================================================================
 # Vérification du statut réseau d'un nœud
 
 def check_node_state(proc, node_id):
     """Vérifie l'état d'un nœud et retourne son rôle (router, child, leader, etc.)"""
     send_cmd(proc, f"node {node_id}")
-    output = send_cmd(proc, "state", wait=1)
+    output = send_cmd(proc, "state")
     state_lines = output.strip().splitlines()
     
     # Recherche la ligne contenant l'état (généralement la deuxième ligne après "state")
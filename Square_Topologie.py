@@ -4,105 +4,113 @@ sys.path.insert(0, '/home/jbonn/ot-ns/pylibs')
 
 import os
 os.environ["PATH"] += os.pathsep + "/home/imerir/go/bin"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Principal"))
 from otns.cli import OTNS  # ou from otns.OTNS selon votre version
+from Topology import TopologySpec, Grid, FedLine, compile_topology, build, labelled, wait_for_nodes
+from Layout import check_layout
+from Class_ReplayCache import ReplayCache
+from Ping import ping_burst
 import time
 import matplotlib.pyplot as plt
 from datetime import datetime
 import math
 
 RADIO_RANGE = 500
+SEED = 1                               # Graine OTNS : même graine => même état, rejouable depuis le cache
+CACHE_DIR = "replay_cache"             # Journaux de rejeu des réseaux déjà formés
 
 def scenario_grid_ping():
-    ns = OTNS()                        # Démarre OTNS en arrière-plan
-    ns.web()                           # Lance la visualisation web (si disponible)
-    ns.go(1, speed=4)                  # Avance le temps de simulation pour assurer le démarrage
-
     num_routers = 16                   # Nombre total de routeurs
     num_fed_top = 50                   # Nombre de nœuds FED au-dessus du routeur
     spacing = 500                      # Espacement de base entre les routeurs (pour la grille)
     margin = 700                       # Marge augmentée pour éviter des coordonnées négatives
     
-    # Calcul du nombre de lignes et colonnes pour la grille
-    n_cols = int(math.sqrt(num_routers))
-    n_rows = math.ceil(num_routers / n_cols)
-    
     ping_delays = []                   # Liste pour stocker les délais de ping (en secondes)
     router_counts = []                 # Liste pour stocker le nombre de routeurs correspondant
+    convergence_times = []             # Temps simulé de convergence après chaque ajout (s)
     
     # On va stocker le FED bottom de chaque routeur pour réaliser les tests de ping
     routers_bottom_feds = []
 
     first_router_bottom_fed = None     # FED bottom du premier routeur (source du ping)
     
-    router_index = 0
-    # Parcours en grille (lignes x colonnes)
-    for row in range(n_rows):
-        for col in range(n_cols):
-            if router_index >= num_routers:
-                break
-            # Calcul des coordonnées du routeur dans la grille
-            router_x = margin + col * spacing
-            router_y = margin + row * spacing
-            
-            # Ajout du routeur
-            router_id = ns.add("router", x=router_x, y=router_y, radio_range=RADIO_RANGE)
-            
-            # Création des nœuds FED "top" (positionnés au-dessus du routeur)
-            fed_top_ids = []
-            fed_top_spacing = spacing / (num_fed_top*10)
-            for j in range(num_fed_top):
-                fed_x = int(router_x + (j - num_fed_top/2) * fed_top_spacing * 0.3)
-                fed_y = int(router_y - spacing + j * (spacing / num_fed_top))
-                fed_id = ns.add("fed", x=fed_x, y=fed_y, radio_range=RADIO_RANGE)
-                fed_top_ids.append(fed_id)
-            
-            # Création d'un nœud FED "bottom" (positionné sous le routeur) qui sera utilisé pour les pings
-            fed_bottom_id = ns.add("fed", x=router_x, y=router_y + spacing, radio_range=RADIO_RANGE)
-            
-            routers_bottom_feds.append(fed_bottom_id)
-            
-            if router_index == 0:
-                first_router_bottom_fed = fed_bottom_id
-                ns.node_cmd(router_id, "thread start")
-                for fed in fed_top_ids:
-                    ns.node_cmd(fed, "thread start")
-                ns.node_cmd(fed_bottom_id, "thread start")
-                
-                ns.go(duration=40, speed=1000)
-                print(f"Ping initial du premier routeur: ping({first_router_bottom_fed}, {fed_top_ids[0]})")
-                ping(first_router_bottom_fed, fed_top_ids[0], ns)
-                TabPing = ns.pings()
-            else:
-                ns.node_cmd(router_id, "thread start")
-                for fed in fed_top_ids:
-                    ns.node_cmd(fed, "thread start")
-                ns.node_cmd(fed_bottom_id, "thread start")
-                
-                ns.go(duration=40, speed=1000)
-                print(f"Ping: ping({first_router_bottom_fed}, {fed_bottom_id})")
-                ping(first_router_bottom_fed, fed_bottom_id, ns)
-                TabPing = ns.pings()
-            
-            new_count = len(TabPing)
-            if new_count == 0:
-                continue
-            else:
-                delays = [item[3] for item in TabPing[1:]]
-                avg_delay = sum(delays) / len(delays) if delays else 0
-                print(f"Délai moyen (excluant le premier ping): {avg_delay}")
-                router_counts.append(router_index + 1)
-                ping_delays.append(avg_delay)
-            
-            router_index += 1
+    # Grille décrite une seule fois (routeurs en lignes x colonnes) ; les
+    # routeurs sont ensuite ajoutés un par un avec leurs FED pour mesurer le
+    # délai à chaque taille de réseau.
+    fed_top_spacing = spacing / (num_fed_top*10)
+    spec = TopologySpec(parts=(Grid(num_routers=num_routers, spacing=spacing, margin=margin, feds=(
+        # FED "top" : alignés au-dessus du routeur
+        FedLine(num_fed_top,
+                offset=(-num_fed_top/2 * fed_top_spacing * 0.3, -spacing),
+                step=(fed_top_spacing * 0.3, spacing / num_fed_top),
+                name="top"),
+        # FED "bottom" : sous le routeur, utilisé pour les pings
+        FedLine(1, offset=(0, spacing), name="bottom"),
+    )),), radio_range=RADIO_RANGE)
+    nodes = compile_topology(spec)
+    # Graphe de connectivité de la grille complète vérifié avant le premier ajout
+    check_layout(nodes)
+    first_router_bottom_fed = labelled(nodes)["0:r0:bottom0"]
+
+    # Démarre OTNS en arrière-plan ; les commandes sont enregistrées pour
+    # pouvoir rejouer plus tard les étapes déjà mesurées (même spec, même graine)
+    ns = ReplayCache(CACHE_DIR).recorder(OTNS(otns_args=["-seed", str(SEED)]), spec, SEED)
+    restored = ns.restore(upto=num_routers - 1)
+    for stage, data in restored:
+        convergence_times.append(data["convergence"])
+        if data["delay"] is not None:
+            router_counts.append(stage + 1)
+            ping_delays.append(data["delay"])
+
+    ns.web()                           # Lance la visualisation web (si disponible)
+    if not restored:
+        ns.go(1, speed=4)              # Avance le temps de simulation pour assurer le démarrage
+
+    first_stage = restored[-1][0] + 1 if restored else 0
+    for router_index in range(first_stage, num_routers):
+        group = [node for node in nodes if node.group == router_index]
+        build(ns, group, check=False)
+        for node in group:
+            ns.node_cmd(node.id, "thread start")
+
+        ids = labelled(group)
+        fed_top_ids = [ids[f"0:r{router_index}:top{j}"] for j in range(num_fed_top)]
+        fed_bottom_id = ids[f"0:r{router_index}:bottom0"]
+        routers_bottom_feds.append(fed_bottom_id)
+
+        convergence_times.append(wait_for_nodes(ns, [node for node in nodes if node.group <= router_index],
+                                                speed=1000))
+        if convergence_times[-1] is None:
+            # Étape non convergée : pas de mesure de délai
+            ns.checkpoint(router_index, {"convergence": None, "delay": None})
+            continue
+        if router_index == 0:
+            print(f"Ping initial du premier routeur: ping({first_router_bottom_fed}, {fed_top_ids[0]})")
+            TabPing = ping(first_router_bottom_fed, fed_top_ids[0], ns)
+        else:
+            print(f"Ping: ping({first_router_bottom_fed}, {fed_bottom_id})")
+            TabPing = ping(first_router_bottom_fed, fed_bottom_id, ns)
+
+        new_count = len(TabPing)
+        if new_count == 0:
+            ns.checkpoint(router_index, {"convergence": convergence_times[-1], "delay": None})
+            continue
+        else:
+            delays = [item.rtt for item in TabPing[1:]]
+            avg_delay = sum(delays) / len(delays) if delays else 0
+            print(f"Délai moyen (excluant le premier ping): {avg_delay}")
+            router_counts.append(router_index + 1)
+            ping_delays.append(avg_delay)
+            ns.checkpoint(router_index, {"convergence": convergence_times[-1], "delay": avg_delay})
 
+    print(f"Temps de convergence (s simulées) : {convergence_times}")
     ns.close()  
     return ping_delays
 
 def ping(src: int, dst: int, ns, count: int = 10, interval: float = 1):
-    """Envoie 'count' pings depuis src vers dst avec un intervalle donné."""
-    for _ in range(count):
-        ns.ping(src, dst)
-        ns.go(interval)
+    """Envoie 'count' pings depuis src vers dst avec un intervalle donné ; retourne les échos reçus."""
+    records = ping_burst(ns, [(src, dst)], count=count, interval=interval)
+    return [record for record in records if not record.lost]
 
 if __name__ == "__main__":
     ping_delays = scenario_grid_ping()
@@ -0,0 +1,169 @@
+import asyncio
+import atexit
+import collections
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+# Exceptions de la CLI partagées avec Principal/Utils.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Principal"))
+from Utils import CommandError
+
+#==============================================================================================
+# fleet.py : une commande CLI sur tous les conteneurs, en asyncio
+#==============================================================================================
+#
+#   import fleet
+#   results = fleet.run("state", parser=fleet.last_line)
+#   results.values()            # {"ot-node1": "leader", "ot-node2": "child", ...}
+#   results.print()             # tableau trié par numéro de nœud
+#
+#   async for result in fleet.get_fleet().stream("ipaddr"): ...     # au fil des réponses
+#
+# Les commandes passent par le multiplexeur partagé (multiplexer.py) : un
+# seul thread lit les PTY de tous les conteneurs et découpe les réponses ;
+# Fleet en attend les Future dans sa boucle asyncio. Les attaches restent
+# ouvertes d'un appel à l'autre ; un nœud qui ne répond pas dans `timeout`
+# est marqué en échec, sa réponse en retard part aux abonnés du
+# multiplexeur, et une attache terminée (conteneur redémarré) est rouverte à
+# l'appel suivant.
+
+# Charge les variables du fichier .env
+load_dotenv()
+nb_nodes = int(os.getenv("NB_NODES", 5))  # Utilise 5 par défaut si NB_NODES n'est pas défini
+# Attaches (ATTACH_CMD, NODES_BACKEND de sessions.py) lues par un seul thread
+from sessions import SessionError
+from multiplexer import PtyMultiplexer, get_mux
+
+# Réponse d'un nœud : value = parser(sortie) si ok, error = message sinon ; elapsed en s
+NodeResult = collections.namedtuple("NodeResult", ["node", "ok", "value", "error", "elapsed"])
+
+
+def node_index(name):
+    """Numéro du conteneur ot-nodeN (tri numérique)."""
+    return int(name[len("ot-node"):])
+
+
+#------------------------------------------------------------------------------------------
+# Analyseurs de sortie usuels
+
+def last_line(output):
+    """Ligne juste avant "Done" ("state", "eui64", ...)."""
+    return output.lines[-1].strip() if output.lines else ""
+
+
+def link_local(output):
+    """Adresses IPv6 qui commencent par "fe80:"."""
+    return [line.strip() for line in output.lines if line.strip().startswith("fe80:")]
+
+
+class FleetResults(list):
+    """Table des NodeResult, triée par numéro de nœud."""
+
+    def __init__(self, results):
+        super().__init__(sorted(results, key=lambda r: node_index(r.node)))
+
+    def values(self):
+        return {r.node: r.value for r in self if r.ok}
+
+    def failed(self):
+        return {r.node: r.error for r in self if not r.ok}
+
+    def table(self):
+        """{nœud: valeur, ou "Erreur: ..."}, comme les anciens dictionnaires des scripts."""
+        return {r.node: r.value if r.ok else f"Erreur: {r.error}" for r in self}
+
+    def print(self):
+        for node, value in self.table().items():
+            print(f"{node}: {value}")
+
+
+#------------------------------------------------------------------------------------------
+# Session asyncio vers un conteneur
+
+class Fleet:
+    """
+    Vue asyncio du multiplexeur sur les conteneurs ot-node1..N. Sans `mux`,
+    la Fleet a le sien, qui lance au plus `max_attach` attaches à la fois
+    (ouverture de sessions), sans borner les commandes en vol.
+    """
+
+    def __init__(self, nodes=None, timeout=10, connect_timeout=30, max_attach=64, mux=None):
+        self.nodes = nodes or [f"ot-node{i}" for i in range(1, nb_nodes + 1)]
+        self.timeout = timeout
+        self._own_mux = mux is None
+        self.mux = mux or PtyMultiplexer(connect_timeout=connect_timeout, max_attach=max_attach)
+        self._loop = asyncio.new_event_loop()
+
+    async def query(self, name, cmd, parser=None, timeout=None):
+        """Une commande sur un nœud ; ne lève pas : l'échec est dans le NodeResult."""
+        start = time.monotonic()
+        try:
+            output = await asyncio.wrap_future(self.mux.submit(name, cmd, timeout or self.timeout))
+            value = parser(output) if parser is not None else output
+            return NodeResult(name, True, value, None, time.monotonic() - start)
+        except (CommandError, SessionError) as e:     # "Error ...", timeout, attache perdue
+            return NodeResult(name, False, None, str(e), time.monotonic() - start)
+
+    async def stream(self, cmd, nodes=None, parser=None, timeout=None):
+        """Les NodeResult au fur et à mesure des réponses."""
+        tasks = [asyncio.ensure_future(self.query(name, cmd, parser, timeout))
+                 for name in (nodes or self.nodes)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def arun(self, cmd, nodes=None, parser=None, timeout=None, on_result=None):
+        results = []
+        async for result in self.stream(cmd, nodes, parser, timeout):
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+        return FleetResults(results)
+
+    def run(self, cmd, nodes=None, parser=None, timeout=None, on_result=None):
+        """
+        Exécute `cmd` sur `nodes` (tous par défaut) et retourne la FleetResults ;
+        `on_result` est appelé pour chaque nœud dès sa réponse.
+        """
+        return self._loop.run_until_complete(self.arun(cmd, nodes, parser, timeout, on_result))
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        if self._own_mux:
+            self.mux.close()
+        self._loop.close()
+
+
+_fleet = None
+
+
+def get_fleet():
+    """Fleet partagée du processus (ot-node1..NB_NODES) sur le multiplexeur partagé, fermée à la sortie."""
+    global _fleet
+    if _fleet is None:
+        _fleet = Fleet(mux=get_mux())
+        atexit.register(_fleet.close)
+    return _fleet
+
+
+def run(cmd, nodes=None, parser=None, timeout=None, on_result=None):
+    """fleet.run("state", parser=fleet.last_line) : voir Fleet.run."""
+    return get_fleet().run(cmd, nodes, parser, timeout, on_result)
+
+
+def main():
+    # python fleet.py <commande> : sortie de la commande sur chaque nœud
+    cmd = " ".join(sys.argv[1:]) or "state"
+    run(cmd, parser=lambda output: str(output).replace("\n", " | "),
+        on_result=lambda r: print(f"{r.node}: {r.value if r.ok else 'Erreur: ' + r.error}"))
+
+
+if __name__ == "__main__":
+    main()
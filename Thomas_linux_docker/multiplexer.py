@@ -0,0 +1,483 @@
+import atexit
+import collections
+import os
+import re
+import selectors
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, wait
+
+import pexpect
+
+# Sessions persistantes (commande d'attache) ; ajoute aussi Principal/ au chemin
+from sessions import attach_cmd, SessionError
+from Utils import ANSI_ESCAPE_RE, CommandError, CommandResult, CommandTimeout
+
+#==============================================================================================
+# multiplexer.py : les PTY de tous les nœuds lus par un seul thread (selectors / epoll)
+#==============================================================================================
+#
+#   mux = get_mux()
+#   mux.cmd("ot-node3", "state")                          # bloquant
+#   results = mux.broadcast("state", [f"ot-node{i}" for i in range(1, 501)])
+#   mux.subscribe(print, pattern=r"Join success|Role ")   # (nœud, ligne) à chaque événement
+#   node = mux.node("ot-node4")                           # vue bloquante, avec réattachement :
+#   node.cmd("joiner start THREAD"); node.expect("Join success")
+#
+# Un processus d'attache (ATTACH_CMD : docker attach ou native_nodes.py
+# attach) par nœud, sur un PTY dont ce module garde le descripteur. Le thread
+# d'E/S découpe la sortie de chaque nœud en lignes ; une commande reçoit les
+# lignes qui suivent son écho jusqu'à "Done" / "Error ..." (ou le prompt
+# seul), les autres lignes vont aux abonnés. Les commandes d'un même nœud
+# sont envoyées l'une après l'autre (file par nœud) ; celles de nœuds
+# différents sont toutes en vol en même temps, sans thread par nœud.
+#
+# Les attaches sont lancées par le thread d'E/S, au plus `max_attach` à la
+# fois, et les processus terminés y sont attendus : ni Popen ni wait() ne se
+# font sous le verrou global. Le délai d'une commande court depuis son envoi
+# (comme un expect() après l'envoi), pas depuis sa mise en file.
+#
+# fleet.py (Fleet en est une vue asyncio) et setp_nodesv1.py (MuxNode)
+# passent par ce multiplexeur ; sessions.py ne garde que la commande
+# d'attache et SessionError.
+
+_ERROR_LINE = re.compile(r"Error(?: (\d+))?: ?(.*)")
+_PROMPT = re.compile(r"^[> ]*>\s*$")
+
+
+class _Pending:
+    """Commande en file sur un nœud ; `echoed` : son écho a été vu, ses lignes suivent."""
+    __slots__ = ("command", "future", "timeout", "deadline", "sent", "echoed", "lines")
+
+    def __init__(self, command, timeout):
+        self.command = command
+        self.future = Future()
+        self.timeout = timeout
+        self.deadline = None            # fixée à l'envoi
+        self.sent = False
+        self.echoed = False
+        self.lines = []
+
+
+class _Node:
+    def __init__(self, name, history):
+        self.name = name
+        self.proc = None
+        self.fd = None
+        self.spawning = False           # attache en cours de lancement (thread d'E/S)
+        self.ready = False
+        self.ready_deadline = None
+        self.settle_until = None        # invites en trop ignorées jusqu'à cet instant
+        self.partial = ""
+        self.queue = collections.deque()
+        self.recent = collections.deque(maxlen=history)    # (numéro, ligne)
+        self.seq = 0
+        self.error = None               # raison de la dernière fermeture
+
+
+class MuxNode:
+    """
+    Vue bloquante d'un nœud du multiplexeur (cmd, expect). Un conteneur en
+    cours de redémarrage (attache impossible ou sans prompt) est réattaché
+    jusqu'à `reattach_tries` fois avec une attente croissante ; une commande
+    interrompue par la fin de l'attache est renvoyée une seule fois.
+    """
+
+    def __init__(self, mux, name, reattach_tries=5):
+        self.mux = mux
+        self.name = name
+        self.reattach_tries = reattach_tries
+        self._cursor = 0                # expect() ne regarde que les lignes reçues après
+
+    def submit(self, command, timeout=5):
+        return self.mux.submit(self.name, command, timeout)
+
+    def cmd(self, command, timeout=5):
+        """Retourne un CommandResult ; lève CommandError, CommandTimeout ou SessionError."""
+        attaches = 0
+        resent = False
+        while True:
+            future = self.mux.submit(self.name, command, timeout)
+            try:
+                return future.result()
+            except SessionError:
+                if getattr(future, "sent", False):
+                    if resent:
+                        raise
+                    resent = True       # Nœud redémarré pendant la commande : nouvel envoi
+                else:
+                    attaches += 1
+                    if attaches >= self.reattach_tries:
+                        raise
+                    time.sleep(min(8.0, 0.5 * 2 ** (attaches - 1)))   # Conteneur en cours de redémarrage
+            finally:
+                # Lignes reçues après la réponse (même avant ce retour) : visibles par expect()
+                self._cursor = getattr(future, "seq", self._cursor)
+
+    def expect(self, pattern, timeout=30):
+        """Attend une ligne contenant `pattern` ; lève pexpect.TIMEOUT comme un expect() pexpect."""
+        seq, line = self.mux.wait_line(self.name, pattern, self._cursor, timeout)
+        if line is None:
+            raise pexpect.TIMEOUT(f"{self.name} : '{pattern}' non reçu après {timeout} s")
+        self._cursor = seq
+        return 0
+
+
+class PtyMultiplexer:
+    """
+    Multiplexeur : un thread d'E/S (selectors) pour tous les PTY. `submit`
+    retourne un Future ; `cmd` l'attend. Un nœud dont l'attache se termine
+    (conteneur redémarré) est réattaché à la commande suivante.
+    """
+
+    def __init__(self, attach=None, connect_timeout=30, history=200, max_attach=64):
+        self.attach_cmd = attach or attach_cmd
+        self.connect_timeout = connect_timeout
+        self.history = history
+        self.max_attach = max_attach
+        self._nodes = {}
+        self._subscribers = {}
+        self._next_token = 0
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)     # nouvelle ligne (wait_line)
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self._reap = []                 # processus tués, attendus par le thread d'E/S
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="PtyMultiplexer", daemon=True)
+        self._thread.start()
+
+    #------------------------------------------------------------------------------------------
+    # API
+
+    def node(self, name, reattach_tries=5):
+        with self._lock:
+            if name not in self._nodes:
+                self._nodes[name] = _Node(name, self.history)
+        return MuxNode(self, name, reattach_tries)
+
+    def submit(self, name, command, timeout=5):
+        """Met `command` en file sur le nœud ; le Future donne un CommandResult ou l'exception."""
+        with self._lock:
+            if self._stopping:
+                raise SessionError(f"{name} : multiplexeur fermé")
+            node = self._nodes.get(name)
+            if node is None:
+                node = self._nodes[name] = _Node(name, self.history)
+            pending = _Pending(command, timeout)
+            node.queue.append(pending)
+            if len(node.queue) == 1 and node.ready:
+                self._send(node)
+            self._wake()                # attache à lancer, ou nouveau délai
+
+        return pending.future
+
+    def cmd(self, name, command, timeout=5):
+        return self.submit(name, command, timeout).result()
+
+    def broadcast(self, command, names, timeout=5):
+        """Même commande sur tous les nœuds ; {nœud: CommandResult ou exception}."""
+        futures = {name: self.submit(name, command, timeout) for name in names}
+        wait(futures.values())
+        return {name: f.exception() or f.result() for name, f in futures.items()}
+
+    def subscribe(self, callback, pattern=None, names=None):
+        """
+        callback(nœud, ligne) pour chaque ligne hors réponse correspondant à
+        `pattern`, des nœuds `names` (tous par défaut). Appelé depuis le thread
+        d'E/S : il doit rendre la main vite. Retourne un jeton pour unsubscribe.
+        """
+        with self._lock:
+            self._next_token += 1
+            self._subscribers[self._next_token] = (
+                callback, re.compile(pattern) if pattern else None, set(names) if names else None)
+            return self._next_token
+
+    def unsubscribe(self, token):
+        with self._lock:
+            self._subscribers.pop(token, None)
+
+    def wait_line(self, name, pattern, after=0, timeout=30):
+        """Première ligne du nœud postérieure au numéro `after` contenant `pattern` : (numéro, ligne)."""
+        regex = re.compile(pattern)
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            node = self._nodes[name]
+            while True:
+                for seq, line in node.recent:
+                    if seq > after and regex.search(line):
+                        return seq, line
+                after = max(after, node.seq)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return after, None
+                self._changed.wait(remaining)
+
+    def close(self):
+        with self._lock:
+            if self._stopping:
+                return
+            self._stopping = True
+            self._wake()
+        self._thread.join()
+        with self._lock:
+            for node in self._nodes.values():
+                self._closed(node, "multiplexeur fermé", unregister=False)
+        self._reap_procs()
+        self._selector.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    #------------------------------------------------------------------------------------------
+    # Processus d'attache (thread d'E/S, hors verrou)
+
+    def _take_spawns(self):
+        """Nœuds à attacher (commandes en file, pas de PTY), dans la limite de max_attach (sous verrou)."""
+        attaching = sum(1 for node in self._nodes.values()
+                        if node.spawning or (node.fd is not None and not node.ready))
+        spawns = []
+        for node in self._nodes.values():
+            if attaching >= self.max_attach:
+                break
+            if node.queue and node.fd is None and not node.spawning:
+                node.spawning = True
+                spawns.append(node)
+                attaching += 1
+        return spawns
+
+    def _spawn(self, node):
+        master, slave = os.openpty()
+        index = node.name[len("ot-node"):]
+        try:
+            proc = subprocess.Popen(shlex.split(self.attach_cmd.format(name=node.name, index=index)),
+                                    stdin=slave, stdout=slave, stderr=slave, start_new_session=True)
+        except OSError as e:
+            os.close(master)
+            with self._lock:
+                node.spawning = False
+                self._closed(node, f"attache impossible : {e}")
+            return
+        finally:
+            os.close(slave)
+        os.set_blocking(master, False)
+        with self._lock:
+            node.spawning = False
+            node.proc = proc
+            node.fd = master
+            node.ready = False
+            node.settle_until = None
+            node.partial = ""
+            node.ready_deadline = time.monotonic() + self.connect_timeout
+            os.write(master, b"\n")     # Déclenchement du prompt
+            self._selector.register(master, selectors.EVENT_READ, node)
+
+    def _reap_procs(self):
+        with self._lock:
+            procs, self._reap = self._reap, []
+        for proc in procs:
+            proc.wait()
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b"x")
+        except BlockingIOError:         # déjà réveillé
+            pass
+
+    def _send(self, node):
+        head = node.queue[0]
+        head.sent = True
+        head.deadline = time.monotonic() + head.timeout
+        try:
+            os.write(node.fd, (head.command + "\n").encode())
+        except OSError as e:
+            self._closed(node, f"écriture impossible : {e}")
+
+    def _resolve(self, node, result=None, error=None):
+        head = node.queue.popleft()
+        head.future.seq = node.seq
+        if error is not None:
+            head.future.set_exception(error)
+        else:
+            head.future.set_result(result)
+        if node.queue and node.ready:
+            self._send(node)
+
+    def _closed(self, node, reason, unregister=True):
+        if node.fd is not None:
+            if unregister:
+                try:
+                    self._selector.unregister(node.fd)
+                except (KeyError, ValueError):
+                    pass
+            os.close(node.fd)
+            node.fd = None
+        if node.proc is not None:
+            if node.proc.poll() is None:
+                node.proc.kill()
+            self._reap.append(node.proc)
+            node.proc = None
+            self._wake()
+        node.ready = False
+        node.error = reason
+        while node.queue:
+            pending = node.queue.popleft()
+            pending.future.sent = pending.sent      # MuxNode : renvoi ou réattachement
+            pending.future.set_exception(SessionError(f"{node.name} : {reason}"))
+
+    #------------------------------------------------------------------------------------------
+    # Thread d'E/S
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._stopping:
+                    return
+                spawns = self._take_spawns()
+            for node in spawns:
+                self._spawn(node)
+            self._reap_procs()
+            with self._lock:
+                timeout = self._next_deadline()
+            for key, _ in self._selector.select(timeout):
+                if key.data is None:
+                    os.read(self._wake_r, 4096)
+                else:
+                    self._on_readable(key.data)
+            self._expire()
+
+    def _next_deadline(self):
+        deadlines = [node.queue[0].deadline for node in self._nodes.values()
+                     if node.queue and node.queue[0].sent]
+        deadlines += [node.settle_until or node.ready_deadline for node in self._nodes.values()
+                      if node.fd is not None and not node.ready]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.monotonic())
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._lock:
+            for node in self._nodes.values():
+                if node.fd is not None and not node.ready:
+                    if node.settle_until is not None and node.settle_until <= now:
+                        node.ready = True
+                        if node.queue:
+                            self._send(node)
+                    elif node.settle_until is None and node.ready_deadline <= now:
+                        self._closed(node, "pas de prompt")
+                        continue
+                while node.queue and node.queue[0].sent and node.queue[0].deadline <= now:
+                    head = node.queue[0]
+                    # Une réponse en retard n'a plus d'écho attendu : elle ira aux abonnés
+                    self._resolve(node, error=CommandTimeout(
+                        head.command, "pas de réponse dans le délai", lines=head.lines))
+
+    def _on_readable(self, node):
+        with self._lock:
+            if node.fd is None:
+                return
+            try:
+                data = os.read(node.fd, 65536)
+            except BlockingIOError:
+                return
+            except OSError:             # EIO : processus d'attache terminé
+                data = b""
+            if not data:
+                self._closed(node, "session fermée")
+                return
+            text = ANSI_ESCAPE_RE.sub("", node.partial + data.decode("utf-8", errors="replace"))
+            lines = text.replace("\r", "").split("\n")
+            node.partial = lines.pop()
+            events = []
+            for raw in lines:
+                line = raw.lstrip("> ").rstrip()
+                if line and self._on_line(node, line):
+                    events.append(line)
+            if _PROMPT.match(node.partial):
+                self._on_prompt(node)
+            if lines:
+                self._changed.notify_all()  # toute ligne compte pour wait_line
+            if events:
+                subscribers = list(self._subscribers.values())
+        if events:
+            for line in events:
+                for callback, pattern, names in subscribers:
+                    if (names is None or node.name in names) and (pattern is None or pattern.search(line)):
+                        callback(node.name, line)
+
+    def _on_line(self, node, line):
+        """
+        Traite une ligne complète ; retourne True si c'est un événement, False
+        si elle appartient à la commande en cours (écho, réponse, terminateur).
+        Toutes restent dans node.recent pour wait_line.
+        """
+        node.seq += 1
+        node.recent.append((node.seq, line))
+        head = node.queue[0] if node.queue else None
+        if head is None or not head.sent:
+            return True
+        if not head.echoed:
+            if line == head.command:
+                head.echoed = True
+                return False
+            return True                 # sortie non sollicitée ou réponse en retard
+        if line == "Done":
+            self._resolve(node, CommandResult(head.command, head.lines))
+        else:
+            error = _ERROR_LINE.fullmatch(line)
+            if error:
+                code = error.group(1)
+                self._resolve(node, error=CommandError(head.command, error.group(2).strip(),
+                                                       code=int(code) if code else None,
+                                                       lines=head.lines))
+            else:
+                head.lines.append(line)
+        return False
+
+    def _on_prompt(self, node):
+        if not node.ready:
+            # Premier prompt après l'attache : les commandes partent après un court
+            # délai, le temps que les invites en trop (démarrage, ligne vide) arrivent
+            if node.settle_until is None:
+                node.settle_until = time.monotonic() + 0.2
+            return
+        head = node.queue[0] if node.queue else None
+        if head is not None and head.echoed:
+            # Réponse terminée par le prompt seul (factoryreset, ...), comme read_response
+            self._resolve(node, CommandResult(head.command, head.lines))
+
+
+_mux = None
+_mux_lock = threading.Lock()
+
+
+def get_mux():
+    """Multiplexeur partagé du processus, fermé à la sortie."""
+    global _mux
+    with _mux_lock:
+        if _mux is None:
+            _mux = PtyMultiplexer()
+            atexit.register(_mux.close)
+        return _mux
+
+
+def main():
+    # python multiplexer.py <commande> : la commande sur ot-node1..NB_NODES
+    nb_nodes = int(os.getenv("NB_NODES", 5))
+    cmd = " ".join(sys.argv[1:]) or "state"
+    names = [f"ot-node{i}" for i in range(1, nb_nodes + 1)]
+    start = time.monotonic()
+    results = get_mux().broadcast(cmd, names)
+    for name in names:
+        result = results[name]
+        print(f"{name}: {' | '.join(result.lines) if isinstance(result, CommandResult) else f'Erreur: {result}'}")
+    print(f"({len(names)} nœuds en {time.monotonic() - start:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import selectors
+import shlex
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from dotenv import load_dotenv
+
+#==============================================================================================
+# native_nodes.py : nœuds ot-cli-ftd / ot-cli-radio lancés sur l'hôte, sans docker
+#==============================================================================================
+#
+#   python native_nodes.py up -n 20          # ≈ docker-compose up -d (rend la main quand tout tourne)
+#   python native_nodes.py ps
+#   python native_nodes.py attach ot-node3   # ≈ docker attach ot-node3
+#   python native_nodes.py restart ot-node3  # ≈ docker restart ot-node3
+#   python native_nodes.py down
+#
+# Un superviseur (processus détaché) lance chaque nœud sur son propre PTY,
+# dans son répertoire de travail <NODES_DIR>/ot-nodeN (les fichiers de
+# paramètres de la simulation y restent séparés), et le relance s'il
+# s'arrête. Chaque nœud a une socket Unix <NODES_DIR>/ot-nodeN.sock : comme
+# pour "docker attach", plusieurs clients peuvent s'y attacher, ils reçoivent
+# tous la sortie du nœud et ce qu'ils écrivent va sur son entrée. Quand le
+# nœud s'arrête, les clients voient la fin de fichier et se réattachent
+# (multiplexer.py) comme après le redémarrage d'un conteneur.
+#
+# Avec NODES_BACKEND=native dans le .env, le multiplexeur (et donc fleet.py)
+# utilise "native_nodes.py attach {name}" au lieu de "docker attach {name}", et
+# setp_nodesv1.py démarre les nœuds par up() au lieu de docker-compose.
+
+# Charge les variables du fichier .env
+load_dotenv()
+nb_nodes = int(os.getenv("NB_NODES", 5))  # Utilise 5 par défaut si NB_NODES n'est pas défini
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+NODES_DIR = os.path.abspath(os.getenv("NODES_DIR", "nodes"))
+# Binaire de simulation : ot-cli-ftd (racine du dépôt) ou Principal/ot-cli-radio
+OT_CLI = os.getenv("OT_CLI", os.path.join(ROOT, "ot-cli-ftd"))
+# Commande d'un nœud ({binary} : OT_CLI, {index} : N, {name} : ot-nodeN)
+NODE_CMD = os.getenv("NODE_CMD", "{binary} {index}")
+# Commande d'attache à utiliser dans ATTACH_CMD
+ATTACH_CMD = f"{sys.executable} {os.path.abspath(__file__)} attach {{name}}"
+
+LOG_BYTES = 8 << 20                     # output.log tourne en output.log.1 au-delà
+CLIENT_BUFFER = 1 << 20                 # sortie en attente pour un client ; au-delà, il est détaché
+INPUT_BUFFER = 1 << 20                  # entrée en attente pour un nœud qui ne lit plus
+
+
+def _status_path(directory):
+    return os.path.join(directory, "status.json")
+
+
+def _pid_path(directory):
+    return os.path.join(directory, "supervisor.pid")
+
+
+class NativeNode:
+    """Un nœud supervisé : processus sur PTY, socket d'attache et clients attachés."""
+
+    def __init__(self, index, directory, binary, node_cmd):
+        self.index = index
+        self.name = f"ot-node{index}"
+        self.workdir = os.path.join(directory, self.name)
+        self.sock_path = os.path.join(directory, f"{self.name}.sock")
+        self.cmd = shlex.split(node_cmd.format(binary=binary, index=index, name=self.name))
+        self.proc = None
+        self.fd = None
+        self.clients = {}               # socket -> sortie pas encore envoyée (bytearray)
+        self.input = bytearray()        # entrée des clients pas encore écrite sur le PTY
+        self.restarts = 0
+        self.failures = []              # instants des arrêts non demandés
+        self.next_start = None
+        self.state = "created"
+        os.makedirs(self.workdir, exist_ok=True)
+        self.log = open(os.path.join(self.workdir, "output.log"), "ab", buffering=0)
+
+    def start(self):
+        master, slave = os.openpty()
+        try:
+            self.proc = subprocess.Popen(self.cmd, cwd=self.workdir, stdin=slave, stdout=slave,
+                                         stderr=slave, start_new_session=True)
+        except OSError as e:
+            os.close(master)
+            self.state = f"failed: {e}"
+            return False
+        finally:
+            os.close(slave)
+        os.set_blocking(master, False)
+        self.fd = master
+        self.input = bytearray()
+        self.state = "running"
+        self.next_start = None
+        return True
+
+    def write_log(self, data):
+        self.log.write(data)
+        if self.log.tell() > LOG_BYTES:
+            self.log.close()
+            path = os.path.join(self.workdir, "output.log")
+            os.replace(path, path + ".1")
+            self.log = open(path, "ab", buffering=0)
+
+    def status(self):
+        return {"pid": self.proc.pid if self.proc and self.state == "running" else None,
+                "state": self.state, "restarts": self.restarts, "clients": len(self.clients)}
+
+
+class Supervisor:
+    """
+    Boucle unique (selectors) : sorties des PTY, connexions et entrées des
+    clients, relances. Rien n'y bloque : PTY et sockets sont non bloquants,
+    ce qui n'a pas pu être écrit attend dans un tampon borné et part quand
+    le descripteur redevient inscriptible ; un client qui ne lit plus est
+    détaché quand son tampon dépasse CLIENT_BUFFER. Un nœud qui s'arrête est relancé après une attente
+    exponentielle ; au-delà de `max_restarts` arrêts en `window` s, il reste
+    en état "failed".
+    """
+
+    def __init__(self, count, directory=NODES_DIR, binary=OT_CLI, node_cmd=NODE_CMD,
+                 max_restarts=5, window=60):
+        self.directory = directory
+        self.max_restarts = max_restarts
+        self.window = window
+        os.makedirs(directory, exist_ok=True)
+        self.nodes = [NativeNode(i, directory, binary, node_cmd) for i in range(1, count + 1)]
+        self.selector = selectors.DefaultSelector()
+        self.listeners = {}
+        self._stopping = False
+        self._dirty = True
+
+    #------------------------------------------------------------------------------------------
+    # Boucle
+
+    def serve(self):
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for node in self.nodes:
+            if os.path.exists(node.sock_path):
+                os.remove(node.sock_path)
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            listener.bind(node.sock_path)
+            listener.listen(16)
+            listener.setblocking(False)
+            self.listeners[node.name] = listener
+            self.selector.register(listener, selectors.EVENT_READ, ("accept", node))
+            self._start(node)
+        try:
+            while not self._stopping:
+                self._write_status()
+                for key, events in self.selector.select(timeout=self._next_timeout()):
+                    kind, node = key.data
+                    if kind == "accept":
+                        self._on_connect(node, key.fileobj)
+                    elif kind == "pty":
+                        if events & selectors.EVENT_READ:
+                            self._on_output(node)
+                        if events & selectors.EVENT_WRITE and node.fd == key.fd:
+                            self._flush_input(node)
+                    else:
+                        if events & selectors.EVENT_READ:
+                            self._on_input(node, key.fileobj)
+                        if events & selectors.EVENT_WRITE and key.fileobj in node.clients:
+                            self._flush_client(node, key.fileobj)
+                now = time.monotonic()
+                for node in self.nodes:
+                    if node.next_start is not None and node.next_start <= now:
+                        self._start(node)
+        finally:
+            self._shutdown()
+
+    def _stop(self, *_):
+        self._stopping = True
+
+    def _next_timeout(self):
+        starts = [node.next_start for node in self.nodes if node.next_start is not None]
+        if not starts:
+            return 0.5                  # réveil régulier pour voir _stopping
+        return max(0.0, min(0.5, min(starts) - time.monotonic()))
+
+    def _start(self, node):
+        if node.start():
+            self.selector.register(node.fd, selectors.EVENT_READ, ("pty", node))
+        self._dirty = True
+
+    def _on_output(self, node):
+        try:
+            data = os.read(node.fd, 65536)
+        except OSError:                 # EIO : le nœud s'est arrêté
+            data = b""
+        if data:
+            node.write_log(data)
+            for client in list(node.clients):
+                self._send(node, client, data)
+            return
+        self._exited(node)
+
+    def _send(self, node, client, data):
+        """Sortie du nœud vers un client, sans bloquer : le reste attend EVENT_WRITE."""
+        pending = node.clients[client]
+        if not pending:
+            try:
+                data = data[client.send(data):]
+            except BlockingIOError:
+                pass
+            except OSError:
+                self._drop(node, client)
+                return
+            if not data:
+                return
+        if len(pending) + len(data) > CLIENT_BUFFER:
+            self._drop(node, client)        # client qui ne lit plus : il ne ralentit pas les autres
+            return
+        if not pending:
+            self.selector.modify(client, selectors.EVENT_READ | selectors.EVENT_WRITE, ("client", node))
+        pending += data
+
+    def _flush_client(self, node, client):
+        pending = node.clients[client]
+        try:
+            del pending[:client.send(pending)]
+        except BlockingIOError:
+            return
+        except OSError:
+            self._drop(node, client)
+            return
+        if not pending:
+            self.selector.modify(client, selectors.EVENT_READ, ("client", node))
+
+    def _exited(self, node):
+        """Le nœud s'est arrêté : clients détachés (comme docker attach) puis relance."""
+        self.selector.unregister(node.fd)
+        os.close(node.fd)
+        node.fd = None
+        node.proc.wait()
+        for client in list(node.clients):
+            self._drop(node, client)
+        if self._stopping:
+            return
+        now = time.monotonic()
+        node.failures = [t for t in node.failures if now - t < self.window] + [now]
+        if len(node.failures) > self.max_restarts:
+            node.state = f"failed (code {node.proc.returncode})"
+        else:
+            node.state = "restarting"
+            node.restarts += 1
+            node.next_start = now + min(10.0, 0.5 * 2 ** (len(node.failures) - 1))
+        self._dirty = True
+
+    def _on_connect(self, node, listener):
+        client, _ = listener.accept()
+        if node.fd is None:             # nœud arrêté : comme docker attach, refus immédiat
+            client.close()
+            return
+        client.setblocking(False)
+        node.clients[client] = bytearray()
+        self.selector.register(client, selectors.EVENT_READ, ("client", node))
+        self._dirty = True
+
+    def _on_input(self, node, client):
+        try:
+            data = client.recv(65536)
+        except OSError:
+            data = b""
+        if not data:
+            self._drop(node, client)
+        elif node.fd is not None:
+            if len(node.input) + len(data) > INPUT_BUFFER:
+                self._drop(node, client)    # le nœud ne lit plus son entrée
+                return
+            waiting = bool(node.input)
+            node.input += data
+            if not waiting:
+                self._flush_input(node)
+
+    def _flush_input(self, node):
+        """Entrée en attente vers le PTY du nœud, sans bloquer."""
+        try:
+            del node.input[:os.write(node.fd, node.input)]
+        except BlockingIOError:
+            pass
+        except OSError:                 # EIO : l'arrêt sera vu à la lecture
+            node.input.clear()
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if node.input else 0)
+        if self.selector.get_key(node.fd).events != events:
+            self.selector.modify(node.fd, events, ("pty", node))
+
+    def _drop(self, node, client):
+        del node.clients[client]
+        self.selector.unregister(client)
+        client.close()
+        self._dirty = True
+
+    def _write_status(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        status = {"pid": os.getpid(), "nodes": {node.name: node.status() for node in self.nodes}}
+        tmp = _status_path(self.directory) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(status, f, indent=2)
+        os.replace(tmp, _status_path(self.directory))
+
+    def _shutdown(self, grace=3.0):
+        """Arrêt propre : SIGTERM aux nœuds, SIGKILL après `grace` s, sockets supprimées."""
+        self._stopping = True
+        running = [node for node in self.nodes if node.proc is not None and node.proc.poll() is None]
+        for node in running:
+            node.proc.terminate()
+        deadline = time.monotonic() + grace
+        for node in running:
+            try:
+                node.proc.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                node.proc.kill()
+                node.proc.wait()
+        for node in self.nodes:
+            for client in list(node.clients):
+                self._drop(node, client)
+            if node.fd is not None:
+                os.close(node.fd)
+                node.fd = None
+            node.state = "stopped"
+            node.log.close()
+        for name, listener in self.listeners.items():
+            listener.close()
+            os.remove(os.path.join(self.directory, f"{name}.sock"))
+        self._dirty = True
+        self._write_status()
+
+
+#==============================================================================================
+# Commandes (même rôle que docker-compose up/down, docker ps/attach/restart)
+#==============================================================================================
+
+def read_status(directory=NODES_DIR):
+    try:
+        with open(_status_path(directory)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _supervisor_pid(directory):
+    try:
+        with open(_pid_path(directory)) as f:
+            pid = int(f.read())
+        os.kill(pid, 0)
+        return pid
+    except (OSError, ValueError):
+        return None
+
+
+def up(count=nb_nodes, directory=NODES_DIR, binary=OT_CLI, node_cmd=NODE_CMD, timeout=30):
+    """Démarre le superviseur en arrière-plan ; rend la main quand tous les nœuds tournent."""
+    if _supervisor_pid(directory) is not None:
+        raise RuntimeError(f"des nœuds tournent déjà dans {directory} (native_nodes.py down)")
+    os.makedirs(directory, exist_ok=True)
+    if os.path.exists(_status_path(directory)):
+        os.remove(_status_path(directory))
+    with open(os.path.join(directory, "supervisor.log"), "ab") as log:
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", "-n", str(count),
+                                 "--dir", directory, "--binary", binary, "--node-cmd", node_cmd],
+                                stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True)
+    with open(_pid_path(directory), "w") as f:
+        f.write(str(proc.pid))
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"le superviseur s'est arrêté (voir {directory}/supervisor.log)")
+        status = read_status(directory)
+        if status:
+            failed = {name: node["state"] for name, node in status["nodes"].items()
+                      if node["state"].startswith("failed")}
+            if failed:
+                down(directory)
+                raise RuntimeError(f"nœuds non démarrés : {failed}")
+            if all(node["state"] == "running" for node in status["nodes"].values()):
+                return status
+        time.sleep(0.05)
+    raise RuntimeError(f"les nœuds ne tournent pas après {timeout} s (native_nodes.py ps)")
+
+
+def down(directory=NODES_DIR, timeout=10):
+    """Arrête les nœuds et le superviseur."""
+    pid = _supervisor_pid(directory)
+    if pid is None:
+        return False
+    os.kill(pid, signal.SIGTERM)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and _supervisor_pid(directory) is not None:
+        try:
+            os.waitpid(pid, os.WNOHANG)   # superviseur lancé par up() dans ce processus
+        except ChildProcessError:
+            pass
+        time.sleep(0.05)
+    os.remove(_pid_path(directory))
+    return True
+
+
+def restart(name, directory=NODES_DIR):
+    """Arrête le processus du nœud ; le superviseur le relance (clients détachés)."""
+    status = read_status(directory) or {"nodes": {}}
+    pid = status["nodes"].get(name, {}).get("pid")
+    if pid is None:
+        raise RuntimeError(f"{name} ne tourne pas")
+    os.kill(pid, signal.SIGTERM)
+
+
+def attach(name, directory=NODES_DIR):
+    """Relie l'entrée et la sortie standard au nœud, comme "docker attach"."""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(os.path.join(directory, f"{name}.sock"))
+    except OSError as e:
+        print(f"Error: cannot attach to {name}: {e}", file=sys.stderr)
+        return 1
+    stdin, stdout = sys.stdin.fileno(), sys.stdout.fileno()
+    saved = None
+    if os.isatty(stdin):
+        import termios
+        import tty
+        saved = termios.tcgetattr(stdin)
+        # L'écho et l'édition de ligne sont ceux du PTY du nœud ; TCSANOW garde
+        # ce qui a déjà été tapé (TCSAFLUSH, par défaut, le jetterait)
+        tty.setraw(stdin, termios.TCSANOW)
+    selector = selectors.DefaultSelector()
+    selector.register(stdin, selectors.EVENT_READ, "stdin")
+    selector.register(client, selectors.EVENT_READ, "node")
+    try:
+        while True:
+            for key, _ in selector.select():
+                if key.data == "node":
+                    data = client.recv(65536)
+                    if not data:
+                        return 0        # nœud arrêté ou redémarré
+                    while data:
+                        data = data[os.write(stdout, data):]
+                else:
+                    data = os.read(stdin, 65536)
+                    if not data:
+                        return 0
+                    client.sendall(data)
+    finally:
+        if saved is not None:
+            termios.tcsetattr(stdin, termios.TCSADRAIN, saved)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nœuds OpenThread simulés lancés sur l'hôte")
+    parser.add_argument("--dir", default=NODES_DIR, help="répertoire des nœuds (NODES_DIR)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("up", "serve"):
+        command = commands.add_parser(name)
+        command.add_argument("-n", "--nodes", type=int, default=nb_nodes)
+        command.add_argument("--dir", default=argparse.SUPPRESS)
+        command.add_argument("--binary", default=OT_CLI, help="ot-cli-ftd ou ot-cli-radio (OT_CLI)")
+        command.add_argument("--node-cmd", default=NODE_CMD, help="commande d'un nœud (NODE_CMD)")
+    for name in ("down", "ps"):
+        commands.add_parser(name).add_argument("--dir", default=argparse.SUPPRESS)
+    for name in ("attach", "restart"):
+        command = commands.add_parser(name)
+        command.add_argument("name")
+        command.add_argument("--dir", default=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        Supervisor(args.nodes, args.dir, args.binary, args.node_cmd).serve()
+    elif args.command == "up":
+        start = time.monotonic()
+        up(args.nodes, args.dir, args.binary, args.node_cmd)
+        print(f"✅ {args.nodes} nœuds démarrés en {time.monotonic() - start:.2f} s "
+              f"(ATTACH_CMD=\"{ATTACH_CMD}\")")
+    elif args.command == "down":
+        print("✅ nœuds arrêtés" if down(args.dir) else "aucun nœud en cours")
+    elif args.command == "ps":
+        status = read_status(args.dir)
+        if status is None or _supervisor_pid(args.dir) is None:
+            print("aucun nœud en cours")
+            return
+        print(f"{'nœud':<12}{'pid':>8}  {'état':<20}{'relances':>9}{'clients':>9}")
+        for name, node in sorted(status["nodes"].items(), key=lambda kv: int(kv[0][len("ot-node"):])):
+            print(f"{name:<12}{node['pid'] or '-':>8}  {node['state']:<20}{node['restarts']:>9}"
+                  f"{node['clients']:>9}")
+    elif args.command == "restart":
+        restart(args.name, args.dir)
+    elif args.command == "attach":
+        sys.exit(attach(args.name, args.dir))
+
+
+if __name__ == "__main__":
+    main()
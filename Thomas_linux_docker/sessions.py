@@ -0,0 +1,23 @@
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# Principal/ sur le chemin : Utils (découpage des réponses de la CLI) pour les modules des nœuds
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Principal"))
+from native_nodes import ATTACH_CMD as NATIVE_ATTACH_CMD
+
+#==============================================================================================
+# sessions.py : attache aux nœuds, commune au multiplexeur et à la fleet
+#==============================================================================================
+
+# Charge les variables du fichier .env
+load_dotenv()
+# Nœuds en conteneurs (docker) ou lancés sur l'hôte par native_nodes.py (native)
+backend = os.getenv("NODES_BACKEND", "docker")
+# Commande d'attache à un nœud ({name} : ot-nodeN, {index} : N)
+attach_cmd = os.getenv("ATTACH_CMD") or (NATIVE_ATTACH_CMD if backend == "native" else "docker attach {name}")
+
+
+class SessionError(Exception):
+    """Le conteneur ne répond pas, même après réattachement."""
@@ -1,58 +1,130 @@
 import pexpect
 import time
 import sys
+import json
+import random
 import subprocess
+import threading
 import concurrent.futures
 import os
 from dotenv import load_dotenv
 
+# Attaches aux conteneurs (ajoute aussi Principal/ au chemin), toutes lues par le multiplexeur
+from sessions import SessionError, backend
+from multiplexer import get_mux
+import native_nodes
+from Utils import CommandError, CommandTimeout
+
 # Charge les variables du fichier .env
 load_dotenv()
 nb_nodes = int(os.getenv("NB_NODES", 5))  # Utilise 5 par défaut si NB_NODES n'est pas défini
+# Joiners commissionnés en même temps : valeur de départ et plafond (ajusté selon les NoBufs)
+concurrency = int(os.getenv("COMMISSION_CONCURRENCY", 4))
+max_concurrency = int(os.getenv("COMMISSION_MAX_CONCURRENCY", 8))
+TIMINGS_FILE = "commissioning_timings.json"
+
+
+class CommissioningError(Exception):
+    """Échec du commissioning d'un nœud (les autres nœuds continuent)."""
+
+
+class AdaptiveLimit:
+    """
+    Nombre de joiners en cours, ajusté comme une fenêtre de congestion :
+    divisé par deux quand le commissioner répond NoBufs, augmenté d'une
+    unité après `limit` joins réussis, entre 1 et `maximum`.
+    """
+
+    def __init__(self, initial, maximum):
+        self.maximum = max(1, maximum)
+        self.limit = max(1, min(initial, self.maximum))
+        self.active = 0
+        self._credit = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
 
-def send_cmd(proc, cmd, wait=1, prompt=">"):
-    """Envoie une commande à un processus interactif et attend le prompt."""
+    def __enter__(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def congested(self):
+        with self._cond:
+            # Une seule réduction par rafale de NoBufs (les joiners en cours les voient tous)
+            if time.monotonic() - self._last_decrease < 1:
+                return
+            self._last_decrease = time.monotonic()
+            self.limit = max(1, self.limit // 2)
+            self._credit = 0.0
+            print(f"📉 NoBufs : concurrence ramenée à {self.limit}")
+
+    def succeeded(self):
+        with self._cond:
+            self._credit += 1 / self.limit
+            if self._credit >= 1 and self.limit < self.maximum:
+                self._credit = 0.0
+                self.limit += 1
+                self._cond.notify_all()
+
+
+def backoff(attempt, base=0.5, cap=8.0):
+    """Attente avant la tentative suivante : exponentielle plafonnée, avec gigue complète."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def send_cmd(session, cmd, timeout=5):
+    """
+    Envoie une commande sur la session d'un nœud et retourne sa sortie dès
+    que la réponse est complète ("Done", "Error N: ..." ou prompt).
+    Lève CommandError si le nœud répond "Error".
+    """
     print(f"\n🟢 Envoi de la commande : {cmd}")
-    proc.sendline(cmd)
-    try:
-        proc.expect(prompt, timeout=5)
-        output = proc.before.decode('utf-8', errors='ignore')
-    except pexpect.TIMEOUT:
-        print(f"⚠️ Timeout sur la commande '{cmd}', envoi d'une ligne vide.")
-        proc.sendline("")
-        try:
-            proc.expect(prompt, timeout=5)
-            output = proc.before.decode('utf-8', errors='ignore')
-        except pexpect.TIMEOUT:
-            output = proc.before.decode('utf-8', errors='ignore')
+    output = session.cmd(cmd, timeout=timeout)
     print(f"🔹 Résultat de '{cmd}':\n{output}\n")
-    time.sleep(wait)
     return output
 
+def start_commissioner(leader):
+    """'commissioner start' ; un commissioner déjà actif ("Error 24: Already") n'est pas un échec."""
+    try:
+        send_cmd(leader, "commissioner start")
+    except CommandError as e:
+        if e.message != "Already":
+            raise
+        print("🔹 Commissioner déjà actif sur le leader.")
+
 def configure_leader():
     print("🚀 Configuration du leader (ot-node1)...")
-    leader = pexpect.spawn("docker attach ot-node1", timeout=30)
-    leader.sendline("")  # Déclenchement du prompt
+    # Vue partagée : les commandes des threads sont mises en file sur le nœud, dans l'ordre
+    leader = get_mux().node("ot-node1")
     try:
-        leader.expect(">", timeout=10)
-    except pexpect.TIMEOUT:
+        send_cmd(leader, "factoryreset")
+        send_cmd(leader, "dataset init new")
+        send_cmd(leader, "dataset commit active")
+        send_cmd(leader, "ifconfig up")
+        send_cmd(leader, "thread start")
+        time.sleep(5)
+        send_cmd(leader, "state")
+        start_commissioner(leader)
+    except SessionError:
         print("⚠️ Leader: Aucune réponse, vérifie le conteneur ot-node1.")
         sys.exit(1)
-    send_cmd(leader, "factoryreset", wait=1)
-    send_cmd(leader, "dataset init new", wait=1)
-    send_cmd(leader, "dataset commit active", wait=1)
-    send_cmd(leader, "ifconfig up", wait=1)
-    send_cmd(leader, "thread start", wait=5)
-    time.sleep(5)
-    send_cmd(leader, "state", wait=1)
-    send_cmd(leader, "commissioner start", wait=1)
+    except (CommandError, CommandTimeout) as e:
+        print(f"⚠️ Leader: commande en échec ({e}), vérifie le conteneur ot-node1.")
+        sys.exit(1)
     print("✅ ot-node1 est configuré comme leader et commissioner démarré.")
     return leader
 
 def get_eui64(container_name, prompt=">"):
     """
-    Récupère l'EUI64 du nœud en attachant au conteneur et en envoyant la commande "eui64".
-    On suppose que la sortie est au format :
+    Récupère l'EUI64 du nœud en envoyant la commande "eui64" par le multiplexeur
+    (attache ouverte une seule fois, puis réutilisée). On suppose que la sortie est au format :
       > eui64
       18b4300000000008
       Done
@@ -60,117 +132,158 @@ def get_eui64(container_name, prompt=">"):
     """
     # print(f"\n📌 Récupération de l'EUI64 pour {container_name}...")
     try:
-        proc = pexpect.spawn(f"docker attach {container_name}", timeout=30)
-    except Exception as e:
-        print(f"Erreur lors de l'attachement à {container_name}: {e}")
-        return None
-    proc.sendline("")
-    try:
-        proc.expect(prompt, timeout=10)
-    except pexpect.TIMEOUT:
+        output = get_mux().node(container_name).cmd("eui64", timeout=10)
+    except SessionError:
         print(f"⚠️ Timeout : Aucune réponse du prompt pour {container_name}.")
-        proc.close()
         return None
-    proc.sendline("eui64")
-    try:
-        proc.expect(prompt, timeout=10)
-        output = proc.before.decode('utf-8', errors='ignore')
-    except pexpect.TIMEOUT:
+    except CommandTimeout:
         print(f"⚠️ Timeout : Pas de sortie de la commande 'eui64' pour {container_name}.")
-        output = proc.before.decode('utf-8', errors='ignore')
-    proc.close()
-    lines = output.strip().splitlines()
-    if len(lines) >= 2:
-        eui = lines[-2].strip()
-    elif len(lines) == 1:
-        eui = lines[0].strip()
-    else:
-        eui = ""
+        return None
+    lines = output.lines
+    eui = lines[-1].strip() if lines else ""
     # print(f"🔹 {container_name} EUI64: {eui}")
     return eui
 
-def add_joiner(leader, joiner_eui, retries=3):
-    """Ajoute un joiner depuis le leader, avec retry en cas d'erreur de type NoBufs."""
+def add_joiner(leader, joiner_eui, retries=6, limit=None):
+    """
+    Ajoute un joiner depuis le leader. Sur NoBufs, signale la congestion à
+    `limit` et réessaie après une attente exponentielle avec gigue.
+    """
     for attempt in range(retries):
-        time.sleep(3)
         print(f"🛠 Tentative {attempt+1} pour ajouter le joiner {joiner_eui} depuis ot-node1...")
-        output = send_cmd(leader, f"commissioner joiner add {joiner_eui} THREAD 60", wait=3)
-        if "NoBufs" in output:
-            print(f"❌ Buffer saturé pour {joiner_eui} à la tentative {attempt+1}. Attente et réessai.")
+        try:
+            send_cmd(leader, f"commissioner joiner add {joiner_eui} THREAD 60")
+        except CommandError as e:
+            if e.message != "NoBufs":
+                raise
+            if limit is not None:
+                limit.congested()
+            delay = backoff(attempt)
+            print(f"❌ Buffer saturé pour {joiner_eui} à la tentative {attempt+1}. Réessai dans {delay:.1f} s.")
+            time.sleep(delay)
         else:
             print(f"✅ Joiner {joiner_eui} ajouté avec succès.")
             return True
-    print(f"❌ Échec : Impossible d'ajouter le joiner {joiner_eui} après {retries} tentatives.")
-    sys.exit(1)
+    raise CommissioningError(f"impossible d'ajouter le joiner {joiner_eui} après {retries} tentatives")
 
-def configure_joiner(leader, node_name, joiner_eui, retries=3):
+def configure_joiner(leader, node_name, joiner_eui, retries=3, timings=None, state_timeout=10):
     """
     Configure un joiner en envoyant 'joiner start THREAD' et en attendant 'Join success'
     puis en lançant 'thread start' et en vérifiant que l'état passe en 'child'.
-    Si l'état ne passe pas à 'child' après 5 vérifications espacées de 2 secondes,
-    relance le commissioner sur le leader et retente l'ajout.
+    L'état est relu à intervalles croissants (avec gigue) pendant `state_timeout` s.
+    Les instants atteints sont ajoutés à `timings` ; lève CommissioningError en cas d'échec.
     """
+    timings = timings if timings is not None else {}
+    start = timings.get("start", time.monotonic())
     print(f"🚀 Configuration du joiner ({node_name})...")
-    joiner = pexpect.spawn(f"docker attach {node_name}", timeout=30)
-    joiner.sendline("")
-    try:
-        joiner.expect(">", timeout=10)
-    except pexpect.TIMEOUT:
-        print(f"⚠️ {node_name} ne répond pas lors de l'obtention du prompt.")
-        joiner.close()
-        sys.exit(1)
-    
-    send_cmd(joiner, "factoryreset", wait=1)
-    send_cmd(joiner, "ifconfig up", wait=1)
-    
-    success = False
+    # Seul ce thread commande le joiner ; l'attache reste ouverte ensuite
+    joiner = get_mux().node(node_name)
+    send_cmd(joiner, "factoryreset")
+    send_cmd(joiner, "ifconfig up")
+
     for attempt in range(retries):
         print(f"🟢 Tentative {attempt+1} pour 'joiner start THREAD' sur {node_name}...")
-        send_cmd(joiner, "joiner start THREAD", wait=5)
+        try:
+            send_cmd(joiner, "joiner start THREAD")
+        except CommandError as e:
+            # "Busy" : le join de la tentative précédente est encore en cours, on attend son résultat
+            if e.message != "Busy":
+                print(f"❌ 'joiner start THREAD' refusé par {node_name} ({e}) à la tentative {attempt+1}.")
+                time.sleep(backoff(attempt, base=1))
+                continue
+        except CommandTimeout:
+            print(f"❌ Pas de réponse à 'joiner start THREAD' sur {node_name} à la tentative {attempt+1}.")
+            time.sleep(backoff(attempt, base=1))
+            continue
         try:
             joiner.expect("Join success", timeout=30)
             print(f"✅ {node_name} a renvoyé 'Join success'.")
-            success = True
+            timings["join_success"] = round(time.monotonic() - start, 3)
             break
         except pexpect.TIMEOUT:
             print(f"❌ Timeout sur 'joiner start THREAD' pour {node_name} à la tentative {attempt+1}.")
-            time.sleep(3)
-    if not success:
-        print(f"❌ Échec pour {node_name} après {retries} tentatives de join.")
-        joiner.close()
-        sys.exit(1)
-    
-    send_cmd(joiner, "thread start", wait=1)
-    
+            time.sleep(backoff(attempt, base=1))
+    else:
+        raise CommissioningError(f"échec pour {node_name} après {retries} tentatives de join")
+
+    send_cmd(joiner, "thread start")
+
     # Vérification répétée de l'état jusqu'à obtenir "child"
-    max_checks = 5
-    state_ok = False
-    for i in range(max_checks):
-        time.sleep(2)
-        output = send_cmd(joiner, "state", wait=1)
+    deadline = time.monotonic() + state_timeout
+    check = 0
+    while True:
+        check += 1
+        output = send_cmd(joiner, "state")
         if "child" in output.lower():
-            print(f"✅ {node_name} est bien configuré en child (vérification {i+1}/{max_checks}).")
-            state_ok = True
-            break
-        else:
-            print(f"🔄 {node_name} n'est pas encore en 'child' (vérification {i+1}/{max_checks}), attente 2 secondes...")
-    joiner.close()
-    if not state_ok:
-        print(f"❌ Erreur : {node_name} n'est toujours pas en 'child' après {max_checks} vérifications.")
-        print("Relancement du commissioner sur le leader et tentative de joiner add...")
-        send_cmd(leader, "commissioner start", wait=1)
-        add_joiner(leader, joiner_eui)
-        time.sleep(5)
-        # Optionnellement, on pourrait réessayer de configurer le joiner ici.
-        sys.exit(1)
+            print(f"✅ {node_name} est bien configuré en child (vérification {check}).")
+            timings["child"] = round(time.monotonic() - start, 3)
+            return True
+        if time.monotonic() >= deadline:
+            raise CommissioningError(f"{node_name} n'est toujours pas en 'child' après {check} vérifications")
+        delay = min(backoff(check, base=0.25, cap=2.0), max(0.0, deadline - time.monotonic()))
+        print(f"🔄 {node_name} n'est pas encore en 'child' (vérification {check}), attente {delay:.1f} s...")
+        time.sleep(delay)
+
+def commission_node(leader, node_name, joiner_eui, limit, timings, attempts=2):
+    """
+    Ajoute puis configure un joiner, dans la limite de concurrence. Si le
+    nœud n'atteint pas l'état child (ou qu'une commande échoue), le
+    commissioner est relancé sur le leader et le nœud est repris une fois.
+    """
+    with limit:
+        for attempt in range(attempts):
+            timings["attempts"] = attempt + 1
+            try:
+                add_joiner(leader, joiner_eui, limit=limit)
+                timings["joiner_added"] = round(time.monotonic() - timings["start"], 3)
+                configure_joiner(leader, node_name, joiner_eui, timings=timings)
+            except (CommissioningError, SessionError, CommandError, CommandTimeout) as e:
+                if attempt + 1 == attempts:
+                    raise
+                print(f"❌ {e}. Relancement du commissioner sur le leader et nouvelle tentative...")
+                start_commissioner(leader)
+                time.sleep(backoff(attempt, base=1))
+            else:
+                limit.succeeded()
+                return timings
+
+def commission_all(leader, joiner_euis, timings):
+    """Commissionne tous les joiners en parallèle ; retourne la liste des nœuds en échec."""
+    limit = AdaptiveLimit(concurrency, max_concurrency)
+    failed = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=limit.maximum) as executor:
+        futures = {executor.submit(commission_node, leader, node, eui, limit, timings[node]): node
+                   for node, eui in joiner_euis.items()}
+        for future in concurrent.futures.as_completed(futures):
+            node = futures[future]
+            try:
+                future.result()
+            except Exception as exc:
+                timings[node]["error"] = str(exc)
+                failed.append(node)
+                print(f"❌ {node} : {exc}")
+    return failed
+
+def print_timings(timings):
+    """Instants (s depuis le début du commissioning) de chaque étape, par nœud."""
+    print(f"\n{'nœud':<12}{'eui64':>8}{'ajouté':>9}{'join':>8}{'child':>8}{'essais':>8}")
+    for node in sorted(timings, key=lambda name: int(name[len("ot-node"):])):
+        t = timings[node]
+        cells = [f"{t[k]:8.1f}" if k in t else f"{'-':>8}" for k in ("eui", "joiner_added", "join_success", "child")]
+        print(f"{node:<12}{''.join(cells)}{t.get('attempts', 0):>8}  {t.get('error', '')}")
 
 def main():
-    # Lancer docker-compose pour démarrer les conteneurs
-    print("🚀 Lancement de docker-compose up -d...")
-    subprocess.run(["docker-compose", "up", "-d"], check=True)
-    
-    print("⏳ Attente de 10 secondes pour que les conteneurs démarrent...")
-    time.sleep(10)
+    if backend == "native":
+        # Nœuds lancés directement sur l'hôte : up() rend la main dès qu'ils tournent
+        print(f"🚀 Lancement de {nb_nodes} nœuds natifs...")
+        native_nodes.up(nb_nodes)
+    else:
+        # Lancer docker-compose pour démarrer les conteneurs
+        print("🚀 Lancement de docker-compose up -d...")
+        subprocess.run(["docker-compose", "up", "-d"], check=True)
+
+        print("⏳ Attente de 10 secondes pour que les conteneurs démarrent...")
+        time.sleep(10)
     
     # Configurer le leader (ot-node1)
     leader = configure_leader()
@@ -180,6 +293,8 @@ def main():
     joiner_euis = {}
     
     # Phase 1 : Récupérer les EUI64 pour chaque joiner (en parallèle)
+    start = time.monotonic()
+    timings = {node: {"start": start} for node in joiner_nodes}
     with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
         future_to_node = {executor.submit(get_eui64, node): node for node in joiner_nodes}
         for future in concurrent.futures.as_completed(future_to_node):
@@ -187,6 +302,7 @@ def main():
             try:
                 eui = future.result()
                 joiner_euis[node] = eui
+                timings[node]["eui"] = round(time.monotonic() - start, 3)
             except Exception as exc:
                 print(f"{node} a généré une exception: {exc}")
     
@@ -194,12 +310,20 @@ def main():
     for node, eui in joiner_euis.items():
         print(f"{node}: {eui}")
     
-    # Phase 2 : Ajouter et configurer chaque joiner séquentiellement
-    for node in joiner_nodes:
-        eui = joiner_euis[node]
-        add_joiner(leader, eui)
-        configure_joiner(leader, node, eui)
-    
+    # Phase 2 : Ajouter et configurer les joiners en parallèle, concurrence adaptée aux NoBufs
+    failed = commission_all(leader, {node: joiner_euis[node] for node in joiner_nodes if joiner_euis.get(node)},
+                            timings)
+    failed += [node for node in joiner_nodes if not joiner_euis.get(node)]
+
+    print_timings(timings)
+    with open(TIMINGS_FILE, "w") as f:
+        json.dump({node: {k: v for k, v in t.items() if k != "start"} for node, t in timings.items()},
+                  f, indent=2)
+    print(f"Temps de commissioning : {time.monotonic() - start:.1f} s (détail dans {TIMINGS_FILE})")
+
+    if failed:
+        print(f"❌ Nœuds non configurés : {', '.join(sorted(failed))}")
+        sys.exit(1)
     print("🎉 Configuration complète du réseau Thread.")
 
 if __name__ == "__main__":
@@ -1,74 +1,39 @@
 import pexpect
 import time
 import subprocess
-import concurrent.futures
 import os
+import sys
 from dotenv import load_dotenv
 
+# Relevés en parallèle sur les sessions persistantes des conteneurs
+import fleet
+
 # Charge les variables du fichier .env
 load_dotenv()
 nb_nodes = int(os.getenv("NB_NODES", 5))  # Utilise 5 par défaut si NB_NODES n'est pas défini
 
-def get_state(container_name, prompt=">"):
+def poll_states(containers):
+    """État de chaque conteneur ; les sessions de la fleet sont réutilisées d'un relevé à l'autre."""
+    return fleet.run("state", nodes=containers, parser=fleet.last_line)
+
+def main(interval=None):
     """
-    Récupère l'état d'un nœud en se connectant via docker attach et en envoyant la commande "state".
-    On suppose que la sortie est au format :
-      state
-      router
-      Done
-    On renvoie donc la ligne juste avant "Done" (par exemple "router").
+    Affiche l'état de tous les nœuds ; avec `interval` (s), recommence
+    indéfiniment sans réattacher les conteneurs : python state.py 5
     """
-    try:
-        proc = pexpect.spawn(f"docker attach {container_name}", timeout=30)
-    except Exception as e:
-        print(f"Erreur lors de l'attachement à {container_name}: {e}")
-        return None
-
-    proc.sendline("")
-    try:
-        proc.expect(prompt, timeout=10)
-    except pexpect.TIMEOUT:
-        print(f"⚠️ Timeout : Aucune réponse du prompt pour {container_name}.")
-        proc.close()
-        return None
-
-    proc.sendline("state")
-    try:
-        proc.expect(prompt, timeout=10)
-        output = proc.before.decode('utf-8', errors='ignore')
-    except pexpect.TIMEOUT:
-        print(f"⚠️ Timeout : Pas de sortie pour la commande 'state' sur {container_name}.")
-        output = proc.before.decode('utf-8', errors='ignore')
-    proc.close()
-
-    lines = output.strip().splitlines()
-    state_val = ""
-    if len(lines) >= 2:
-        state_val = lines[-2].strip()
-    elif lines:
-        state_val = lines[0].strip()
-    return state_val
-
-def main():
     # Générer la liste des conteneurs (exemple : ot-node1 à ot-nodeN)
     containers = [f"ot-node{i}" for i in range(1, nb_nodes+1)]
-    state_dict = {}
-
-    # Récupérer les états en parallèle
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_container = {executor.submit(get_state, container): container for container in containers}
-        for future in concurrent.futures.as_completed(future_to_container):
-            container = future_to_container[future]
-            try:
-                state = future.result()
-                state_dict[container] = state
-            except Exception as exc:
-                state_dict[container] = f"Erreur: {exc}"
-
-    print("\n🎉 État simplifié de tous les nœuds :")
-    # Tri par ordre numérique en extrayant le nombre après "ot-node"
-    for container, state in sorted(state_dict.items(), key=lambda kv: int(kv[0][len("ot-node"):])):
-        print(f"{container}: {state}")
+    while True:
+        start = time.monotonic()
+        results = poll_states(containers)
+
+        print("\n🎉 État simplifié de tous les nœuds :")
+        # Triés par ordre numérique du nom ot-nodeN
+        results.print()
+        if interval is None:
+            return results.table()
+        print(f"(relevé en {time.monotonic() - start:.2f} s)")
+        time.sleep(max(0.0, interval - (time.monotonic() - start)))
 
 if __name__ == "__main__":
-    main()
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else None)